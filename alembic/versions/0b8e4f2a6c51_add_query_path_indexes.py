@@ -0,0 +1,37 @@
+"""add query path indexes
+
+Revision ID: 0b8e4f2a6c51
+Revises: f1a7d3c8e924
+Create Date: 2026-10-17 17:20:43.906115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b8e4f2a6c51'
+down_revision = 'f1a7d3c8e924'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Serves blob lookups as before, and per-user reference counts without touching the table
+    op.create_index('ix_files_blob_user', 'files', ['blob_id', 'user_id'], unique=False)
+    op.drop_index('ix_files_blob_id', table_name='files')
+    op.create_index(
+        'ix_files_pending', 'files', ['created_at', 'id'], unique=False,
+        postgresql_where=sa.text("status = 'PENDING'"),
+        sqlite_where=sa.text("status = 'PENDING'"),
+    )
+    op.create_index('ix_message_files_message_file', 'message_files', ['message_id', 'file_id'], unique=False)
+    op.create_index('ix_message_files_file_id', 'message_files', ['file_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_message_files_file_id', table_name='message_files')
+    op.drop_index('ix_message_files_message_file', table_name='message_files')
+    op.drop_index('ix_files_pending', table_name='files')
+    op.create_index('ix_files_blob_id', 'files', ['blob_id'], unique=False)
+    op.drop_index('ix_files_blob_user', table_name='files')
@@ -0,0 +1,24 @@
+"""add message token counts
+
+Revision ID: a3f1c9d27b40
+Revises: 58b55f773e15
+Create Date: 2026-10-17 09:12:04.118532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f1c9d27b40'
+down_revision = '58b55f773e15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('token_counts', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('messages', 'token_counts')
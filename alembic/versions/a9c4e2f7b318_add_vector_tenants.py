@@ -0,0 +1,38 @@
+"""add vector tenants
+
+Revision ID: a9c4e2f7b318
+Revises: b2d6e8f41c37
+Create Date: 2026-10-17 15:02:19.337460
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c4e2f7b318'
+down_revision = 'b2d6e8f41c37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('vector_tenants',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('collection_name', sa.String(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('dedicated_collection', sa.String(), nullable=False),
+    sa.Column('state', sa.Enum('COPYING', 'DEDICATED', 'PURGED', name='vectortenantstate'), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('promoted_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_vector_tenants_id'), 'vector_tenants', ['id'], unique=False)
+    op.create_index('ix_vector_tenants_collection_user', 'vector_tenants', ['collection_name', 'user_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_vector_tenants_collection_user', table_name='vector_tenants')
+    op.drop_index(op.f('ix_vector_tenants_id'), table_name='vector_tenants')
+    op.drop_table('vector_tenants')
+    sa.Enum(name='vectortenantstate').drop(op.get_bind(), checkfirst=True)
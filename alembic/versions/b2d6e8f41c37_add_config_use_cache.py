@@ -0,0 +1,24 @@
+"""add config use_cache
+
+Revision ID: b2d6e8f41c37
+Revises: 0b8e4f2a6c51
+Create Date: 2026-10-17 14:21:47.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d6e8f41c37'
+down_revision = '0b8e4f2a6c51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('conversation_configs', sa.Column('use_cache', sa.Boolean(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('conversation_configs', 'use_cache')
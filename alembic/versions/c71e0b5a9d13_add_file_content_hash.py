@@ -0,0 +1,28 @@
+"""add file content hash
+
+Revision ID: c71e0b5a9d13
+Revises: a3f1c9d27b40
+Create Date: 2026-10-17 10:02:47.553190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c71e0b5a9d13'
+down_revision = 'a3f1c9d27b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('files', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_files_content_hash'), 'files', ['content_hash'], unique=False)
+    op.alter_column('files', 'file_size', existing_type=sa.Integer(), type_=sa.BigInteger(), existing_nullable=False)
+
+
+def downgrade() -> None:
+    op.alter_column('files', 'file_size', existing_type=sa.BigInteger(), type_=sa.Integer(), existing_nullable=False)
+    op.drop_index(op.f('ix_files_content_hash'), table_name='files')
+    op.drop_column('files', 'content_hash')
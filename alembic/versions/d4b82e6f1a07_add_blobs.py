@@ -0,0 +1,43 @@
+"""add content-addressed blobs
+
+Revision ID: d4b82e6f1a07
+Revises: c71e0b5a9d13
+Create Date: 2026-10-17 11:20:13.402817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b82e6f1a07'
+down_revision = 'c71e0b5a9d13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('blobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('file_path', sa.String(), nullable=False),
+    sa.Column('file_size', sa.BigInteger(), nullable=False),
+    sa.Column('extracted_text', sa.Text(), nullable=True),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_blobs_content_hash'), 'blobs', ['content_hash'], unique=True)
+    op.create_index(op.f('ix_blobs_id'), 'blobs', ['id'], unique=False)
+    op.add_column('files', sa.Column('blob_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_files_blob_id'), 'files', ['blob_id'], unique=False)
+    op.create_foreign_key('files_blob_id_fkey', 'files', 'blobs', ['blob_id'], ['id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('files_blob_id_fkey', 'files', type_='foreignkey')
+    op.drop_index(op.f('ix_files_blob_id'), table_name='files')
+    op.drop_column('files', 'blob_id')
+    op.drop_index(op.f('ix_blobs_id'), table_name='blobs')
+    op.drop_index(op.f('ix_blobs_content_hash'), table_name='blobs')
+    op.drop_table('blobs')
@@ -0,0 +1,47 @@
+"""add document chunks for lexical search
+
+Revision ID: e5c9a3b7d210
+Revises: d4b82e6f1a07
+Create Date: 2026-10-17 13:05:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c9a3b7d210'
+down_revision = 'd4b82e6f1a07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('document_chunks',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('collection_name', sa.String(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('file_id', sa.Integer(), nullable=True),
+    sa.Column('blob_id', sa.Integer(), nullable=True),
+    sa.Column('chunk_index', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_document_chunks_file_id'), 'document_chunks', ['file_id'], unique=False)
+    op.create_index('ix_document_chunks_user_collection', 'document_chunks', ['user_id', 'collection_name'], unique=False)
+    op.create_index('ix_document_chunks_user_blob', 'document_chunks', ['user_id', 'blob_id'], unique=False)
+    op.create_index(
+        'ix_document_chunks_content_fts',
+        'document_chunks',
+        [sa.text("to_tsvector('simple'::regconfig, content)")],
+        unique=False,
+        postgresql_using='gin',
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_chunks_content_fts', table_name='document_chunks')
+    op.drop_index('ix_document_chunks_user_blob', table_name='document_chunks')
+    op.drop_index('ix_document_chunks_user_collection', table_name='document_chunks')
+    op.drop_index(op.f('ix_document_chunks_file_id'), table_name='document_chunks')
+    op.drop_table('document_chunks')
@@ -0,0 +1,44 @@
+"""add keyset pagination indexes
+
+Revision ID: f1a7d3c8e924
+Revises: e5c9a3b7d210
+Create Date: 2026-10-17 16:41:09.218374
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a7d3c8e924'
+down_revision = 'e5c9a3b7d210'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Conversations are paged by (updated_at, id), which needs updated_at set on every row
+    op.execute("UPDATE conversations SET updated_at = created_at WHERE updated_at IS NULL")
+    op.alter_column(
+        'conversations', 'updated_at',
+        existing_type=sa.DateTime(timezone=True),
+        server_default=sa.text('now()'),
+        nullable=False,
+    )
+    op.create_index('ix_conversations_user_updated', 'conversations', ['user_id', 'updated_at', 'id'], unique=False)
+    op.create_index('ix_messages_conversation_created', 'messages', ['conversation_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_messages_branch_created', 'messages', ['branch_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_files_user_created', 'files', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_files_user_created', table_name='files')
+    op.drop_index('ix_messages_branch_created', table_name='messages')
+    op.drop_index('ix_messages_conversation_created', table_name='messages')
+    op.drop_index('ix_conversations_user_updated', table_name='conversations')
+    op.alter_column(
+        'conversations', 'updated_at',
+        existing_type=sa.DateTime(timezone=True),
+        server_default=None,
+        nullable=True,
+    )
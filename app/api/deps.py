@@ -1,17 +1,25 @@
-from typing import Generator, Optional
+from typing import AsyncGenerator, Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError
-from app.core.database import SessionLocal
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.core.principals import cache_principal, get_cached_principal, principal_generation
 from app.core.security import decode_access_token
-from app.crud import user as crud_user
-from app.models.models import User
+from app.crud import async_user as crud_user
+from app.schemas.user import UserSnapshot
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 
-def get_db() -> Generator:
+async def get_db() -> AsyncGenerator:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_sync_db() -> Generator:
+    """A sync Session, for routes that run blocking file or vector store work in the threadpool."""
     db = SessionLocal()
     try:
         yield db
@@ -19,10 +27,21 @@ def get_db() -> Generator:
         db.close()
 
 
-def get_current_user(
-    db: Session = Depends(get_db),
+async def get_current_user(
+    db: AsyncSession = Depends(get_db),
     token: str = Depends(oauth2_scheme)
-) -> User:
+) -> UserSnapshot:
+    """
+    Resolve the bearer token to a snapshot of its user.
+
+    Snapshots are cached by token for AUTH_CACHE_TTL seconds, so most requests
+    skip both the JWT decode and the user query.
+    """
+    if settings.AUTH_CACHE_SIZE:
+        principal = get_cached_principal(token)
+        if principal is not None:
+            return principal
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -37,16 +56,20 @@ def get_current_user(
     if user_id is None:
         raise credentials_exception
 
-    user = crud_user.get(db, id=int(user_id))
+    generation = principal_generation(int(user_id))
+    user = await crud_user.get(db, id=int(user_id))
     if user is None:
         raise credentials_exception
 
-    return user
+    principal = UserSnapshot.model_validate(user)
+    if settings.AUTH_CACHE_SIZE:
+        cache_principal(token, principal, generation, expires_at=payload.get("exp"))
+    return principal
 
 
-def get_current_active_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+async def get_current_active_user(
+    current_user: UserSnapshot = Depends(get_current_user)
+) -> UserSnapshot:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
@@ -1,26 +1,28 @@
 from datetime import timedelta
 from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.deps import get_db, get_current_active_user
 from app.core.config import settings
 from app.core.security import create_access_token, verify_password, get_password_hash
-from app.crud import user as crud_user
-from app.schemas.user import UserCreate, UserResponse, Token, LoginRequest
+from app.crud import async_user as crud_user
+from app.schemas.user import UserCreate, UserResponse, UserSnapshot, Token, LoginRequest
 from app.models.models import User
 
 router = APIRouter()
 
 
-def _authenticate_user(db: Session, email: str, password: str) -> User:
-    user = crud_user.get_by_email(db, email=email)
+async def _authenticate_user(db: AsyncSession, email: str, password: str) -> User:
+    user = await crud_user.get_by_email(db, email=email)
     if not user or not user.hashed_password:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
-    if not verify_password(password, user.hashed_password):
+    # bcrypt is deliberately slow; keep it off the event loop
+    if not await run_in_threadpool(verify_password, password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -48,12 +50,12 @@ def _create_token_response(user_id: int) -> dict:
     summary="Register a new user",
     responses={400: {"description": "Email or username already taken"}},
 )
-def register(
+async def register(
     user_in: UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Any:
     """Register a new user."""
-    user = crud_user.get_by_email(db, email=user_in.email)
+    user = await crud_user.get_by_email(db, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -61,7 +63,7 @@ def register(
         )
 
     if user_in.username:
-        existing_username = crud_user.get_by_username(db, username=user_in.username)
+        existing_username = await crud_user.get_by_username(db, username=user_in.username)
         if existing_username:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -69,12 +71,12 @@ def register(
             )
 
     user_data = user_in.model_dump()
-    user_data["hashed_password"] = get_password_hash(user_data.pop("password"))
+    user_data["hashed_password"] = await run_in_threadpool(get_password_hash, user_data.pop("password"))
 
     db_user = User(**user_data)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
 
     return db_user
 
@@ -85,12 +87,12 @@ def register(
     summary="Login with OAuth2 form",
     responses={401: {"description": "Incorrect email or password"}},
 )
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Any:
     """OAuth2 compatible token login."""
-    user = _authenticate_user(db, email=form_data.username, password=form_data.password)
+    user = await _authenticate_user(db, email=form_data.username, password=form_data.password)
     return _create_token_response(user.id)
 
 
@@ -100,12 +102,12 @@ def login(
     summary="Login with JSON body",
     responses={401: {"description": "Incorrect email or password"}},
 )
-def login_json(
+async def login_json(
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Any:
     """JSON-based login endpoint."""
-    user = _authenticate_user(db, email=login_data.email, password=login_data.password)
+    user = await _authenticate_user(db, email=login_data.email, password=login_data.password)
     return _create_token_response(user.id)
 
 
@@ -114,8 +116,8 @@ def login_json(
     response_model=UserResponse,
     summary="Get current user",
 )
-def read_users_me(
-    current_user: User = Depends(get_current_active_user)
+async def read_users_me(
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ) -> Any:
     """Get current user."""
     return current_user
@@ -127,9 +129,9 @@ def read_users_me(
     summary="Google OAuth callback",
     responses={501: {"description": "Not yet implemented"}},
 )
-def oauth_google(
+async def oauth_google(
     code: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Any:
     """Google OAuth callback - placeholder for implementation."""
     # TODO: Implement Google OAuth flow
@@ -149,9 +151,9 @@ def oauth_google(
     summary="GitHub OAuth callback",
     responses={501: {"description": "Not yet implemented"}},
 )
-def oauth_github(
+async def oauth_github(
     code: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Any:
     """GitHub OAuth callback - placeholder for implementation."""
     # TODO: Implement GitHub OAuth flow
@@ -1,18 +1,26 @@
-from typing import Any, List
+from typing import Any, Dict, List, Optional, Tuple
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.deps import get_db, get_current_active_user
-from app.crud import conversation as crud_conversation
-from app.crud import message as crud_message
+from app.core.config import settings
+from app.core.database import async_unit_of_work
+from app.crud import async_conversation as crud_conversation
+from app.crud import async_message as crud_message
+from app.crud import async_config as crud_config
 from app.schemas.branch import BranchCreate, BranchUpdate, BranchResponse
-from app.schemas.message import MessageCreate, MessageResponse
-from app.models.models import User, Branch
+from app.schemas.message import MessageResponse
+from app.models.models import Branch, Message
+from app.schemas.user import UserSnapshot
+from app.services.context import build_context, context_token_budget, load_history, message_token_count
+from app.services.llm import achat_completion
 
 router = APIRouter()
 
 
-def _verify_conversation_access(db: Session, conversation_id: int, user_id: int):
-    conv = crud_conversation.get(db, id=conversation_id)
+async def _verify_conversation_access(db: AsyncSession, conversation_id: int, user_id: int):
+    conv = await crud_conversation.get(db, id=conversation_id)
     if not conv or conv.user_id != user_id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
     return conv
@@ -27,13 +35,13 @@ def _verify_conversation_access(db: Session, conversation_id: int, user_id: int)
         401: {"description": "Not authenticated"},
     },
 )
-def list_branches(
+async def list_branches(
     conversation_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
-    _verify_conversation_access(db, conversation_id, current_user.id)
-    return db.query(Branch).filter(Branch.conversation_id == conversation_id).all()
+    await _verify_conversation_access(db, conversation_id, current_user.id)
+    return (await db.scalars(select(Branch).where(Branch.conversation_id == conversation_id))).all()
 
 
 @router.post(
@@ -47,19 +55,19 @@ def list_branches(
         401: {"description": "Not authenticated"},
     },
 )
-def create_branch(
+async def create_branch(
     conversation_id: int,
     branch_in: BranchCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
-    _verify_conversation_access(db, conversation_id, current_user.id)
+    await _verify_conversation_access(db, conversation_id, current_user.id)
     if branch_in.conversation_id != conversation_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Conversation ID mismatch")
     branch = Branch(**branch_in.model_dump())
     db.add(branch)
-    db.commit()
-    db.refresh(branch)
+    await db.commit()
+    await db.refresh(branch)
     return branch
 
 
@@ -72,21 +80,21 @@ def create_branch(
         401: {"description": "Not authenticated"},
     },
 )
-def update_branch(
+async def update_branch(
     branch_id: int,
     branch_in: BranchUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
-    branch = db.query(Branch).filter(Branch.id == branch_id).first()
+    branch = await db.get(Branch, branch_id)
     if not branch:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Branch not found")
-    _verify_conversation_access(db, branch.conversation_id, current_user.id)
+    await _verify_conversation_access(db, branch.conversation_id, current_user.id)
     update_data = branch_in.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(branch, field, value)
-    db.commit()
-    db.refresh(branch)
+    await db.commit()
+    await db.refresh(branch)
     return branch
 
 
@@ -99,27 +107,82 @@ def update_branch(
         401: {"description": "Not authenticated"},
     },
 )
-def switch_active_branch(
+async def switch_active_branch(
     branch_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
     """Set this branch as active and deactivate all others in the conversation."""
-    branch = db.query(Branch).filter(Branch.id == branch_id).first()
+    branch = await db.get(Branch, branch_id)
     if not branch:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Branch not found")
-    _verify_conversation_access(db, branch.conversation_id, current_user.id)
+    await _verify_conversation_access(db, branch.conversation_id, current_user.id)
     # Deactivate all branches in this conversation
-    db.query(Branch).filter(
-        Branch.conversation_id == branch.conversation_id
-    ).update({"is_active": False})
+    await db.execute(
+        update(Branch).where(Branch.conversation_id == branch.conversation_id).values(is_active=False)
+    )
     # Activate the selected one
     branch.is_active = True
-    db.commit()
-    db.refresh(branch)
+    await db.commit()
+    await db.refresh(branch)
     return branch
 
 
+async def _prepare_regeneration(
+    db: AsyncSession, conversation_id: int, parent_message_id: int, user_id: int
+) -> Tuple[List[Dict[str, str]], str]:
+    """Build the message thread to regenerate from."""
+    await _verify_conversation_access(db, conversation_id, user_id)
+    parent = await crud_message.get(db, id=parent_message_id)
+    if not parent or parent.conversation_id != conversation_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid parent message")
+    saved_config = await crud_config.get_by_conversation(db, conversation_id=conversation_id)
+    model = saved_config.model if saved_config and saved_config.model else settings.DEFAULT_MODEL
+    system_prompt = saved_config.system_prompt if saved_config and saved_config.system_prompt else None
+    thread = await crud_message.get_thread(db, message_id=parent_message_id)
+    # Tokenizing is CPU-bound, so it runs in the threadpool
+    messages = await run_in_threadpool(_thread_context, thread, model, system_prompt)
+    return messages, model
+
+
+def _thread_context(thread: List[Message], model: str, system_prompt: Optional[str]) -> List[Dict[str, str]]:
+    """The thread up to the parent message, trimmed to the model's window."""
+    raw_messages, token_counts = load_history(thread, model=model, token_budget=context_token_budget(model))
+    return build_context(
+        messages=raw_messages,
+        system_prompt=system_prompt,
+        model=model,
+        token_counts=token_counts,
+    )
+
+
+async def _save_regenerated(
+    db: AsyncSession, conversation_id: int, parent_message_id: int, model: str, response: Any
+) -> Message:
+    """Create the new branch and its reply in one transaction."""
+    prompt_tokens = response.usage.prompt_tokens
+    completion_tokens = response.usage.completion_tokens
+    assistant_msg = Message(
+        conversation_id=conversation_id,
+        parent_message_id=parent_message_id,
+        role="assistant",
+        content=response.choices[0].message.content,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+    )
+    await run_in_threadpool(message_token_count, assistant_msg, model)
+
+    async with async_unit_of_work(db):
+        branch = Branch(conversation_id=conversation_id, name=f"Branch from message {parent_message_id}")
+        db.add(branch)
+        await db.flush()
+        # Save as new message on the branch
+        assistant_msg.branch_id = branch.id
+        (saved_msg,) = await crud_message.insert_all(db, db_objs=[assistant_msg], commit=False)
+    return saved_msg
+
+
 @router.post(
     "/{conversation_id}/regenerate",
     response_model=MessageResponse,
@@ -130,50 +193,17 @@ def switch_active_branch(
         401: {"description": "Not authenticated"},
     },
 )
-def regenerate_from_message(
+async def regenerate_from_message(
     conversation_id: int,
     parent_message_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
     """Create a new branch from a specific message (swipe/regenerate)."""
-    conv = _verify_conversation_access(db, conversation_id, current_user.id)
-    parent = crud_message.get(db, id=parent_message_id)
-    if not parent or parent.conversation_id != conversation_id:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid parent message")
-    # Create a new branch
-    branch = Branch(conversation_id=conversation_id, name=f"Branch from message {parent_message_id}")
-    db.add(branch)
-    db.commit()
-    db.refresh(branch)
-    # Get the thread up to the parent message
-    thread = crud_message.get_thread(db, message_id=parent_message_id)
-    messages = [{"role": msg.role, "content": msg.content} for msg in thread]
+    messages, model = await _prepare_regeneration(db, conversation_id, parent_message_id, current_user.id)
     # Call LLM for a new response
-    from app.services.llm import chat_completion
-    from app.crud import config as crud_config
-    from app.core.config import settings
-    saved_config = crud_config.get_by_conversation(db, conversation_id=conversation_id)
-    model = saved_config.model if saved_config and saved_config.model else settings.DEFAULT_MODEL
-    system_prompt = saved_config.system_prompt if saved_config and saved_config.system_prompt else None
-    if system_prompt:
-        messages.insert(0, {"role": "system", "content": system_prompt})
-    response = chat_completion(messages=messages, model=model)
-    assistant_content = response.choices[0].message.content
-    # Save as new message on the branch
-    assistant_msg = crud_message.create(db, obj_in=MessageCreate(
-        conversation_id=conversation_id,
-        branch_id=branch.id,
-        parent_message_id=parent_message_id,
-        role="assistant",
-        content=assistant_content,
-    ))
-    crud_message.update_token_usage(
-        db, db_obj=assistant_msg,
-        prompt_tokens=response.usage.prompt_tokens,
-        completion_tokens=response.usage.completion_tokens,
-    )
-    return assistant_msg
+    response = await achat_completion(messages=messages, model=model)
+    return await _save_regenerated(db, conversation_id, parent_message_id, model, response)
 
 
 @router.delete(
@@ -185,14 +215,14 @@ def regenerate_from_message(
         401: {"description": "Not authenticated"},
     },
 )
-def delete_branch(
+async def delete_branch(
     branch_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> None:
-    branch = db.query(Branch).filter(Branch.id == branch_id).first()
+    branch = await db.get(Branch, branch_id)
     if not branch:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Branch not found")
-    _verify_conversation_access(db, branch.conversation_id, current_user.id)
-    db.delete(branch)
-    db.commit()
+    await _verify_conversation_access(db, branch.conversation_id, current_user.id)
+    await db.delete(branch)
+    await db.commit()
@@ -1,17 +1,31 @@
-from typing import Any, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.deps import get_db, get_current_active_user
-from app.crud import conversation as crud_conversation
-from app.crud import message as crud_message
-from app.crud import config as crud_config
-from app.services.llm import chat_completion, chat_completion_stream, count_tokens
-from app.services.context import build_context
+from app.core.database import AsyncSessionLocal, async_unit_of_work
+from app.crud import async_conversation as crud_conversation
+from app.crud import async_message as crud_message
+from app.crud import async_config as crud_config
+from app.services.llm import achat_completion, achat_completion_stream, count_tokens
+from app.services.context import (
+    build_context_with_usage,
+    context_token_budget,
+    load_history,
+    message_token_count,
+)
 from app.services.rag import query as rag_query
-from app.schemas.message import MessageCreate, MessageResponse
-from app.models.models import User
+from app.services.streams import StreamEvent, StreamGone, new_stream_id, run_detached
+from app.services.streams import buffer as stream_buffer
+from app.schemas.message import MessageResponse
+from app.schemas.user import UserSnapshot
+from app.models.models import Message
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -26,29 +40,25 @@ class ChatRequest(BaseModel):
     system_prompt: Optional[str] = None
     use_rag: bool = False
     rag_results: int = 3
+    use_cache: Optional[bool] = None  # defaults to the conversation's setting, else on
 
 
-@router.post(
-    "/",
-    response_model=MessageResponse,
-    summary="Send a chat message and get an AI response",
-    responses={
-        404: {"description": "Conversation not found"},
-        401: {"description": "Not authenticated"},
-    },
-)
-def chat(
-    request: ChatRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
-) -> Any:
+async def _prepare_turn(
+    db: AsyncSession, request: ChatRequest, user_id: int
+) -> Tuple[Message, List[Dict[str, str]], int]:
+    """
+    Save the user message and build the LLM context for a chat turn.
+
+    The message is committed before the model is called, so a failed call
+    doesn't lose it; only the reply's writes wait for the answer.
+    """
     # Verify conversation access
-    conv = crud_conversation.get(db, id=request.conversation_id)
-    if not conv or conv.user_id != current_user.id:
+    conv = await crud_conversation.get(db, id=request.conversation_id)
+    if not conv or conv.user_id != user_id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
 
     # Load saved config as defaults
-    saved_config = crud_config.get_by_conversation(db, conversation_id=request.conversation_id)
+    saved_config = await crud_config.get_by_conversation(db, conversation_id=request.conversation_id)
     if saved_config:
         if request.model is None:
             request.model = saved_config.model
@@ -61,24 +71,44 @@ def chat(
         if not request.use_rag and saved_config.use_rag:
             request.use_rag = saved_config.use_rag
             request.rag_results = saved_config.rag_results or 3
+        if request.use_cache is None:
+            request.use_cache = saved_config.use_cache
+    if request.use_cache is None:
+        request.use_cache = True
 
-    # Save user message
-    user_msg = crud_message.create(db, obj_in=MessageCreate(
+    user_msg = Message(
         conversation_id=request.conversation_id,
         role="user",
         content=request.content,
-    ))
+    )
 
     # Build message history from DB
-    db_messages = crud_message.get_by_conversation(db, conversation_id=request.conversation_id)
-    raw_messages = [{"role": msg.role, "content": msg.content} for msg in db_messages]
+    db_messages = await crud_message.get_recent(db, conversation_id=request.conversation_id)
+    # Tokenizing and retrieval block, so the context is built in the threadpool
+    messages, input_tokens = await run_in_threadpool(_build_turn_context, request, user_id, db_messages, user_msg)
+
+    # One commit for the message and the token counts computed while loading the history
+    async with async_unit_of_work(db):
+        (user_msg,) = await crud_message.insert_all(db, db_objs=[user_msg], commit=False)
+
+    return user_msg, messages, input_tokens
+
+
+def _build_turn_context(
+    request: ChatRequest, user_id: int, db_messages: List[Message], user_msg: Message
+) -> Tuple[List[Dict[str, str]], int]:
+    raw_messages, token_counts = load_history(
+        [*db_messages, user_msg],
+        model=request.model,
+        token_budget=context_token_budget(request.model),
+    )
 
     # RAG context injection
     rag_context = ""
     if request.use_rag:
         rag_results = rag_query(
             query_text=request.content,
-            user_id=current_user.id,
+            user_id=user_id,
             n_results=request.rag_results,
         )
         if rag_results:
@@ -93,84 +123,201 @@ def chat(
         system_prompt = f"{system_prompt}\n\n{rag_context}".strip()
 
     # Build truncated context that fits the model's window
-    messages = build_context(
+    return build_context_with_usage(
         messages=raw_messages,
         system_prompt=system_prompt if system_prompt else None,
         model=request.model,
+        token_counts=token_counts,
+    )
+
+
+async def _save_turn(
+    db: AsyncSession,
+    request: ChatRequest,
+    user_msg: Message,
+    content: str,
+    user_usage: Tuple[int, int],
+    assistant_usage: Tuple[int, int],
+) -> Message:
+    """Insert the reply and record the turn's token usage on both messages, in one transaction."""
+    assistant_msg = Message(
+        conversation_id=request.conversation_id,
+        role="assistant",
+        content=content,
     )
+    # Count the reply now so the next turn doesn't have to write it back
+    await run_in_threadpool(message_token_count, assistant_msg, request.model)
+    prompt_tokens, completion_tokens = assistant_usage
+    assistant_msg.prompt_tokens = prompt_tokens
+    assistant_msg.completion_tokens = completion_tokens
+    assistant_msg.total_tokens = prompt_tokens + completion_tokens
 
-    # Count input tokens
-    input_tokens = count_tokens(messages, model=request.model)
+    async with async_unit_of_work(db):
+        if any(user_usage):
+            await crud_message.update_token_usage(
+                db, db_obj=user_msg, prompt_tokens=user_usage[0], completion_tokens=user_usage[1], commit=False
+            )
+        (saved_reply,) = await crud_message.insert_all(db, db_objs=[assistant_msg], commit=False)
+    return saved_reply
+
+
+async def _save_reply(db: AsyncSession, request: ChatRequest, user_msg: Message, response: Any) -> Message:
+    return await _save_turn(
+        db,
+        request,
+        user_msg,
+        response.choices[0].message.content,
+        user_usage=(response.usage.prompt_tokens, 0),
+        assistant_usage=(0, response.usage.completion_tokens),
+    )
+
+
+@router.post(
+    "/",
+    response_model=MessageResponse,
+    summary="Send a chat message and get an AI response",
+    responses={
+        404: {"description": "Conversation not found"},
+        401: {"description": "Not authenticated"},
+    },
+)
+async def chat(
+    request: ChatRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
+) -> Any:
+    user_msg, messages, input_tokens = await _prepare_turn(db, request, current_user.id)
 
     if request.stream:
-        return _stream_response(db, request, messages, input_tokens)
+        stream_id = new_stream_id()
+        await stream_buffer.create(stream_id, current_user.id)
+        run_detached(_generate(stream_id, request, user_msg, messages, input_tokens))
+        return _event_stream(stream_id)
 
     # Non-streaming response
-    response = chat_completion(
+    response = await achat_completion(
         messages=messages,
         model=request.model,
         temperature=request.temperature,
         max_tokens=request.max_tokens,
+        cache=request.use_cache,
     )
 
-    assistant_content = response.choices[0].message.content
-    completion_tokens = response.usage.completion_tokens
-    prompt_tokens = response.usage.prompt_tokens
+    return await _save_reply(db, request, user_msg, response)
 
-    # Save assistant message
-    assistant_msg = crud_message.create(db, obj_in=MessageCreate(
-        conversation_id=request.conversation_id,
-        role="assistant",
-        content=assistant_content,
-    ))
 
-    # Update token usage
-    crud_message.update_token_usage(
-        db,
-        db_obj=user_msg,
-        prompt_tokens=prompt_tokens,
-        completion_tokens=0,
-    )
-    crud_message.update_token_usage(
-        db,
-        db_obj=assistant_msg,
-        prompt_tokens=0,
-        completion_tokens=completion_tokens,
-    )
+async def _save_streamed_reply(
+    request: ChatRequest, user_msg: Message, content: str, input_tokens: int, usage: Dict[str, int]
+) -> None:
+    if usage:
+        input_tokens = usage["prompt_tokens"] or input_tokens
+        output_tokens = usage["completion_tokens"]
+    else:
+        # The provider reported no usage, so count the reply ourselves
+        output_tokens = await run_in_threadpool(
+            count_tokens,
+            [{"role": "assistant", "content": content}],
+            model=request.model,
+        )
+    # The request session is closed once the response starts, so use a fresh one
+    async with AsyncSessionLocal() as db:
+        await _save_turn(
+            db,
+            request,
+            user_msg,
+            content,
+            user_usage=(0, 0),
+            assistant_usage=(input_tokens, output_tokens),
+        )
+
+
+# SSE ends a line at CR, LF or CRLF; str.splitlines also splits on other characters
+_sse_line_break = re.compile(r"\r\n|\r|\n")
 
-    return assistant_msg
 
+def _sse_event(data: str, event_id: Optional[int] = None, event: Optional[str] = None) -> str:
+    """Frame data as one server-sent event, one data: field per line."""
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    if event:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in _sse_line_break.split(data))
+    return "\n".join(lines) + "\n\n"
 
-def _stream_response(db, request, messages, input_tokens):
-    def generate():
-        full_content = ""
-        for chunk in chat_completion_stream(
+
+async def _generate(
+    stream_id: str, request: ChatRequest, user_msg: Message, messages: List[Dict[str, str]], input_tokens: int
+) -> None:
+    """Stream the reply into the stream buffer and save it, whether or not anyone is reading."""
+    parts = []
+    usage: Dict[str, int] = {}
+    try:
+        async for chunk in achat_completion_stream(
             messages=messages,
             model=request.model,
             temperature=request.temperature,
             max_tokens=request.max_tokens,
+            usage=usage,
+            cache=request.use_cache,
         ):
-            full_content += chunk
-            yield f"data: {chunk}\n\n"
+            parts.append(chunk)
+            await stream_buffer.append(stream_id, StreamEvent(len(parts), chunk))
 
         # Save assistant message after stream completes
-        assistant_msg = crud_message.create(db, obj_in=MessageCreate(
-            conversation_id=request.conversation_id,
-            role="assistant",
-            content=full_content,
-        ))
-
-        output_tokens = count_tokens(
-            [{"role": "assistant", "content": full_content}],
-            model=request.model,
-        )
-        crud_message.update_token_usage(
-            db,
-            db_obj=assistant_msg,
-            prompt_tokens=input_tokens,
-            completion_tokens=output_tokens,
+        await _save_streamed_reply(request, user_msg, "".join(parts), input_tokens, usage)
+    except Exception:
+        # Nobody awaits this task, so the traceback is only kept here
+        logger.exception("stream %s failed", stream_id)
+        await stream_buffer.append(
+            stream_id, StreamEvent(len(parts) + 1, "Generation failed", event="error", last=True)
         )
+        return
+    await stream_buffer.append(stream_id, StreamEvent(len(parts) + 1, "[DONE]", last=True))
+
+
+def _event_stream(stream_id: str, after: int = 0) -> StreamingResponse:
+    async def events():
+        try:
+            async for event in stream_buffer.read(stream_id, after):
+                yield _sse_event(event.data, event.id, event.event)
+        except StreamGone:
+            yield _sse_event("Stream expired", event="error")
 
-        yield "data: [DONE]\n\n"
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering or caching the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Stream-Id": stream_id},
+    )
+
+
+@router.get(
+    "/streams/{stream_id}",
+    summary="Resume a streamed chat response",
+    responses={
+        400: {"description": "Invalid Last-Event-ID"},
+        404: {"description": "Stream not found or expired"},
+        410: {"description": "Events after Last-Event-ID are no longer buffered"},
+        401: {"description": "Not authenticated"},
+    },
+)
+async def resume_stream(
+    stream_id: str,
+    last_event_id: Optional[str] = Header(None),
+    current_user: UserSnapshot = Depends(get_current_active_user),
+) -> Any:
+    """
+    Replay a stream from the event after Last-Event-ID, then follow it live.
 
-    return StreamingResponse(generate(), media_type="text/event-stream")
+    Without Last-Event-ID the stream is replayed from its first event.
+    """
+    try:
+        after = int(last_event_id or 0)
+    except ValueError:
+        after = -1
+    if after < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Last-Event-ID")
+    if await stream_buffer.owner(stream_id) != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stream not found")
+    if not await stream_buffer.available(stream_id, after):
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Stream events no longer buffered")
+    return _event_stream(stream_id, after)
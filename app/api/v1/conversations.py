@@ -1,8 +1,10 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.deps import get_db, get_current_active_user
-from app.crud import conversation as crud_conversation
+from app.crud import async_conversation as crud_conversation
+from app.crud.pagination import InvalidCursor
+from app.schemas.common import CursorPage
 from app.schemas.conversation import (
     ConversationCreate,
     ConversationUpdate,
@@ -10,23 +12,28 @@ from app.schemas.conversation import (
     ConversationWithMessages,
     ConversationWithBranches,
 )
-from app.models.models import User
+from app.schemas.user import UserSnapshot
 
 router = APIRouter()
 
 
 @router.get(
     "/",
-    response_model=List[ConversationResponse],
+    response_model=CursorPage[ConversationResponse],
     summary="List user conversations",
+    responses={400: {"description": "Invalid cursor"}},
 )
-def list_conversations(
-    skip: int = 0,
-    limit: int = 50,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+async def list_conversations(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
-    return crud_conversation.get_by_user(db, user_id=current_user.id, skip=skip, limit=limit)
+    """List conversations, most recently updated first."""
+    try:
+        return await crud_conversation.get_page_by_user(db, user_id=current_user.id, cursor=cursor, limit=limit)
+    except InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
 
 
 @router.post(
@@ -35,12 +42,12 @@ def list_conversations(
     status_code=status.HTTP_201_CREATED,
     summary="Create a new conversation",
 )
-def create_conversation(
+async def create_conversation(
     conversation_in: ConversationCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
-    return crud_conversation.create_for_user(db, obj_in=conversation_in, user_id=current_user.id)
+    return await crud_conversation.create_for_user(db, obj_in=conversation_in, user_id=current_user.id)
 
 
 @router.get(
@@ -49,12 +56,12 @@ def create_conversation(
     summary="Get conversation with messages",
     responses={404: {"description": "Conversation not found"}},
 )
-def get_conversation(
+async def get_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
-    conv = crud_conversation.get_with_messages(db, id=conversation_id)
+    conv = await crud_conversation.get_with_messages(db, id=conversation_id)
     if not conv or conv.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
     return conv
@@ -66,12 +73,12 @@ def get_conversation(
     summary="Get conversation with branches",
     responses={404: {"description": "Conversation not found"}},
 )
-def get_conversation_branches(
+async def get_conversation_branches(
     conversation_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
-    conv = crud_conversation.get_with_branches(db, id=conversation_id)
+    conv = await crud_conversation.get_with_branches(db, id=conversation_id)
     if not conv or conv.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
     return conv
@@ -83,16 +90,16 @@ def get_conversation_branches(
     summary="Update conversation",
     responses={404: {"description": "Conversation not found"}},
 )
-def update_conversation(
+async def update_conversation(
     conversation_id: int,
     conversation_in: ConversationUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
-    conv = crud_conversation.get(db, id=conversation_id)
+    conv = await crud_conversation.get(db, id=conversation_id)
     if not conv or conv.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
-    return crud_conversation.update(db, db_obj=conv, obj_in=conversation_in)
+    return await crud_conversation.update(db, db_obj=conv, obj_in=conversation_in)
 
 
 @router.delete(
@@ -101,12 +108,12 @@ def update_conversation(
     summary="Delete conversation",
     responses={404: {"description": "Conversation not found"}},
 )
-def delete_conversation(
+async def delete_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> None:
-    conv = crud_conversation.get(db, id=conversation_id)
+    conv = await crud_conversation.get(db, id=conversation_id)
     if not conv or conv.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
-    crud_conversation.remove(db, id=conversation_id)
+    await crud_conversation.remove(db, id=conversation_id)
@@ -1,54 +1,180 @@
-import os
-import uuid
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File as FastAPIFile, status
+from typing import Any, AsyncIterator, Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from python_multipart.multipart import MultipartParser, parse_options_header
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.api.deps import get_db, get_current_active_user
+from app.api.deps import get_db, get_sync_db, get_current_active_user
 from app.core.config import settings
+from app.crud import async_conversation, async_file, async_message
 from app.crud import file as crud_file
-from app.schemas.file import FileResponse, FileUploadResponse
-from app.models.models import User, File, FileStatus
-from app.services.file_processor import process_file
-from app.services.rag import delete_document
+from app.crud.pagination import InvalidCursor
+from app.schemas.common import CursorPage
+from app.schemas.file import (
+    FileCreate,
+    FileResponse,
+    FileUploadResponse,
+    FileProcessingStatus,
+    UploadSessionCreate,
+    UploadSessionResponse,
+)
+from app.models.models import File, FileStatus
+from app.schemas.user import UserSnapshot
+from app.services import storage
+from app.services.blobs import delete_file as delete_file_content, store_blob
+from app.services.storage import UploadOffsetMismatch, UploadTooLarge, save_stream, user_upload_path
+from app.services.tasks import enqueue_file_processing, get_task_state
 
 router = APIRouter()
 
 
-def _save_upload(upload: UploadFile, user_id: int) -> dict:
-    """Save uploaded file to disk and return file metadata."""
-    if upload.content_type not in settings.ALLOWED_MIME_TYPES:
+def _check_mime_type(mime_type: str) -> None:
+    if mime_type not in settings.ALLOWED_MIME_TYPES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File type {upload.content_type} not allowed",
+            detail=f"File type {mime_type} not allowed",
         )
 
-    content = upload.file.read()
-    if len(content) > settings.MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File exceeds max size of {settings.MAX_FILE_SIZE} bytes",
-        )
 
-    user_dir = os.path.join(settings.UPLOAD_DIR, str(user_id))
-    os.makedirs(user_dir, exist_ok=True)
+# Room for the multipart boundaries and part headers around the file itself
+_MULTIPART_OVERHEAD = 65536
+
+
+class _StreamedUpload:
+    """
+    One file field of a multipart/form-data request body, parsed as the body arrives.
+
+    Starlette's form parsing spools the whole body before the handler runs;
+    this reads it piece by piece, so an upload can be refused by its headers
+    or cut off at the size limit without receiving the rest.
+    """
+
+    def __init__(self, request: Request, field: str):
+        content_type, params = parse_options_header(request.headers.get("content-type"))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a multipart/form-data body")
+        self.field = field
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self._body = request.stream().__aiter__()
+        self._headers: Dict[bytes, bytes] = {}
+        self._header = [b"", b""]
+        self._reading = False  # inside the field's data
+        self._done = False
+        self._data: List[bytes] = []
+        self._parser = MultipartParser(params[b"boundary"], callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": lambda data, start, end: self._append_header(0, data[start:end]),
+            "on_header_value": lambda data, start, end: self._append_header(1, data[start:end]),
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _append_header(self, index: int, data: bytes) -> None:
+        self._header[index] += data
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header[0].lower()] = self._header[1]
+        self._header = [b"", b""]
+
+    def _on_headers_finished(self) -> None:
+        _, disposition = parse_options_header(self._headers.get(b"content-disposition"))
+        if self.filename is None and disposition.get(b"name") == self.field.encode():
+            self._reading = True
+            self.filename = disposition.get(b"filename", b"").decode()
+            self.content_type = self._headers.get(b"content-type", b"application/octet-stream").decode()
 
-    ext = os.path.splitext(upload.filename)[1]
-    stored_filename = f"{uuid.uuid4()}{ext}"
-    file_path = os.path.join(user_dir, stored_filename)
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._reading:
+            self._data.append(data[start:end])
 
-    with open(file_path, "wb") as f:
-        f.write(content)
+    def _on_part_end(self) -> None:
+        if self._reading:
+            self._reading = False
+            self._done = True
+
+    async def _read(self) -> bool:
+        """Parse the next piece of the body. False once it has all arrived."""
+        try:
+            chunk = await self._body.__anext__()
+        except StopAsyncIteration:
+            self._parser.finalize()
+            return False
+        self._parser.write(chunk)
+        return True
+
+    async def open(self) -> None:
+        """Read up to the start of the field, setting filename and content_type."""
+        while self.filename is None:
+            if not await self._read():
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail=f"Missing file field '{self.field}'"
+                )
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """The field's data, as it arrives."""
+        while True:
+            if self._data:
+                data = b"".join(self._data)
+                self._data.clear()
+                yield data
+            if self._done:
+                return
+            if not await self._read():
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incomplete multipart body")
+
+
+async def _save_upload(request: Request, user_id: int) -> dict:
+    """Stream the uploaded file to disk and return file metadata."""
+    too_large = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"File exceeds max size of {settings.MAX_FILE_SIZE} bytes",
+    )
+    # Refuse before reading any of the body when the client says how large it is
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > settings.MAX_FILE_SIZE + _MULTIPART_OVERHEAD:
+        raise too_large
+
+    upload = _StreamedUpload(request, "upload")
+    await upload.open()
+    _check_mime_type(upload.content_type)
+
+    stored_filename, file_path = await run_in_threadpool(user_upload_path, user_id, upload.filename)
+    try:
+        file_size, content_hash = await save_stream(upload.chunks(), file_path, max_size=settings.MAX_FILE_SIZE)
+    except UploadTooLarge:
+        raise too_large
 
     return {
         "filename": stored_filename,
         "original_filename": upload.filename,
         "file_path": file_path,
-        "file_size": len(content),
+        "file_size": file_size,
+        "content_hash": content_hash,
         "mime_type": upload.content_type,
         "user_id": user_id,
     }
 
 
+def _create_file(db: Session, file_data: dict) -> File:
+    blob = store_blob(
+        db,
+        upload_path=file_data["file_path"],
+        content_hash=file_data["content_hash"],
+        file_size=file_data["file_size"],
+    )
+    file_data = {**file_data, "file_path": blob.file_path, "blob_id": blob.id}
+    file = crud_file.create(db, obj_in=FileCreate(**file_data))
+    if settings.AUTO_PROCESS_UPLOADS:
+        enqueue_file_processing(db, file)
+    return file
+
+
 @router.post(
     "/",
     response_model=FileUploadResponse,
@@ -58,33 +184,192 @@ def _save_upload(upload: UploadFile, user_id: int) -> dict:
         400: {"description": "File type not allowed or file too large"},
         401: {"description": "Not authenticated"},
     },
+    # The body is parsed by hand as it streams in, so describe it here
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"upload": {"type": "string", "format": "binary"}},
+            "required": ["upload"],
+        }}},
+    }},
+)
+async def upload_file(
+    request: Request,
+    db: Session = Depends(get_sync_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
+) -> Any:
+    file_data = await _save_upload(request, current_user.id)
+    return await run_in_threadpool(_create_file, db, file_data)
+
+
+def _get_upload_session(user_id: int, upload_id: str) -> dict:
+    session = storage.get_upload_session(user_id, upload_id)
+    if not session:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+    return session
+
+
+def _session_response(session: dict) -> UploadSessionResponse:
+    return UploadSessionResponse(**session, chunk_size=settings.UPLOAD_CHUNK_SIZE)
+
+
+@router.post(
+    "/uploads",
+    response_model=UploadSessionResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Start a resumable upload",
+    responses={
+        400: {"description": "File type not allowed or file too large"},
+        401: {"description": "Not authenticated"},
+    },
 )
-def upload_file(
-    upload: UploadFile = FastAPIFile(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+def create_upload(
+    upload_in: UploadSessionCreate,
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
-    file_data = _save_upload(upload, current_user.id)
-    from app.schemas.file import FileCreate
-    file_in = FileCreate(**file_data)
-    return crud_file.create(db, obj_in=file_in)
+    _check_mime_type(upload_in.mime_type)
+    try:
+        session = storage.create_upload_session(
+            current_user.id, upload_in.filename, upload_in.mime_type, upload_in.size
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return _session_response(session)
+
+
+@router.get(
+    "/uploads/{upload_id}",
+    response_model=UploadSessionResponse,
+    summary="Get the state of a resumable upload",
+    responses={
+        404: {"description": "Upload not found"},
+        401: {"description": "Not authenticated"},
+    },
+)
+def get_upload(
+    upload_id: str,
+    current_user: UserSnapshot = Depends(get_current_active_user),
+) -> Any:
+    return _session_response(_get_upload_session(current_user.id, upload_id))
+
+
+@router.put(
+    "/uploads/{upload_id}",
+    response_model=UploadSessionResponse,
+    summary="Append a chunk to a resumable upload",
+    description="Send raw bytes as the request body. `offset` must equal the upload's current offset.",
+    responses={
+        400: {"description": "Chunk exceeds the declared upload size"},
+        404: {"description": "Upload not found"},
+        409: {"description": "Offset does not match the upload's current offset"},
+        401: {"description": "Not authenticated"},
+    },
+)
+async def upload_chunk(
+    upload_id: str,
+    offset: int,
+    request: Request,
+    current_user: UserSnapshot = Depends(get_current_active_user),
+) -> Any:
+    # File work runs in the threadpool; the body is read on the event loop
+    session = await run_in_threadpool(_get_upload_session, current_user.id, upload_id)
+    try:
+        f = await run_in_threadpool(storage.open_upload_chunk, current_user.id, session, offset)
+    except UploadOffsetMismatch as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    # Write the body as it arrives; only one network chunk is held at a time
+    written = offset
+    try:
+        async for chunk in request.stream():
+            written += len(chunk)
+            if written > session["size"]:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Chunk exceeds the declared upload size of {session['size']} bytes",
+                )
+            await run_in_threadpool(f.write, chunk)
+    except HTTPException:
+        # Drop the partial chunk so the client can retry from the same offset
+        await run_in_threadpool(f.truncate, offset)
+        raise
+    finally:
+        await run_in_threadpool(f.close)
+
+    return _session_response({**session, "offset": written})
+
+
+@router.post(
+    "/uploads/{upload_id}/complete",
+    response_model=FileUploadResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Finish a resumable upload and create the file",
+    responses={
+        404: {"description": "Upload not found"},
+        409: {"description": "Upload is incomplete"},
+        401: {"description": "Not authenticated"},
+    },
+)
+def complete_upload(
+    upload_id: str,
+    db: Session = Depends(get_sync_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
+) -> Any:
+    session = _get_upload_session(current_user.id, upload_id)
+    try:
+        stored_filename, file_path, content_hash = storage.complete_upload_session(current_user.id, session)
+    except UploadOffsetMismatch as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    return _create_file(db, {
+        "filename": stored_filename,
+        "original_filename": session["filename"],
+        "file_path": file_path,
+        "file_size": session["size"],
+        "content_hash": content_hash,
+        "mime_type": session["mime_type"],
+        "user_id": current_user.id,
+    })
+
+
+@router.delete(
+    "/uploads/{upload_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Abort a resumable upload",
+    responses={
+        404: {"description": "Upload not found"},
+        401: {"description": "Not authenticated"},
+    },
+)
+def abort_upload(
+    upload_id: str,
+    current_user: UserSnapshot = Depends(get_current_active_user),
+) -> None:
+    _get_upload_session(current_user.id, upload_id)
+    storage.delete_upload_session(current_user.id, upload_id)
 
 
 @router.get(
     "/",
-    response_model=List[FileResponse],
+    response_model=CursorPage[FileResponse],
     summary="List all files for the current user",
     responses={
+        400: {"description": "Invalid cursor"},
         401: {"description": "Not authenticated"},
     },
 )
-def list_files(
-    skip: int = 0,
-    limit: int = 50,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+async def list_files(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
-    return crud_file.get_by_user(db, user_id=current_user.id, skip=skip, limit=limit)
+    """List files, newest first."""
+    try:
+        return await async_file.get_page_by_user(db, user_id=current_user.id, cursor=cursor, limit=limit)
+    except InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
 
 
 @router.get(
@@ -96,12 +381,12 @@ def list_files(
         401: {"description": "Not authenticated"},
     },
 )
-def get_file(
+async def get_file(
     file_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
-    file = crud_file.get(db, id=file_id)
+    file = await async_file.get(db, id=file_id)
     if not file or file.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
     return file
@@ -118,46 +403,74 @@ def get_file(
 )
 def delete_file(
     file_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_sync_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> None:
     file = crud_file.get(db, id=file_id)
     if not file or file.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
 
-    # Delete from vector store
-    delete_document(file_id)
-
-    # Delete from disk
-    if os.path.exists(file.file_path):
-        os.remove(file.file_path)
-
-    crud_file.remove(db, id=file_id)
+    # Delete from the vector store and disk once unreferenced
+    delete_file_content(db, file)
 
 
 @router.post(
     "/{file_id}/process",
     response_model=FileResponse,
-    summary="Process an uploaded file for RAG indexing",
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Queue an uploaded file for RAG indexing",
     responses={
         404: {"description": "File not found"},
-        500: {"description": "Processing failed"},
+        409: {"description": "File is already queued or being processed"},
         401: {"description": "Not authenticated"},
     },
 )
 def process_uploaded_file(
     file_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_sync_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
     file = crud_file.get(db, id=file_id)
     if not file or file.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    if file.status == FileStatus.PROCESSING:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="File is already being processed")
+    # Pending files without a task id were never sent to a worker and can be queued
+    if file.status == FileStatus.PENDING and (file.extra_metadata or {}).get("task_id"):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="File is already queued for processing")
 
-    result = process_file(db, file_id)
-    if not result:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Processing failed")
-    return result
+    enqueue_file_processing(db, file)
+    db.refresh(file)
+    return file
+
+
+@router.get(
+    "/{file_id}/status",
+    response_model=FileProcessingStatus,
+    summary="Get the processing status of a file",
+    responses={
+        404: {"description": "File not found"},
+        401: {"description": "Not authenticated"},
+    },
+)
+def get_file_status(
+    file_id: int,
+    db: Session = Depends(get_sync_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
+) -> Any:
+    file = crud_file.get(db, id=file_id)
+    if not file or file.user_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    metadata = file.extra_metadata or {}
+    return FileProcessingStatus(
+        id=file.id,
+        status=file.status,
+        task_id=metadata.get("task_id"),
+        task_state=get_task_state(metadata.get("task_id")),
+        chunks_indexed=metadata.get("chunks_indexed"),
+        error=metadata.get("error"),
+    )
 
 
 @router.post(
@@ -169,25 +482,23 @@ def process_uploaded_file(
         401: {"description": "Not authenticated"},
     },
 )
-def attach_file_to_message(
+async def attach_file_to_message(
     file_id: int,
     message_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
-    file = crud_file.get(db, id=file_id)
+    file = await async_file.get(db, id=file_id)
     if not file or file.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
 
-    from app.crud import message as crud_message
-    from app.crud import conversation as crud_conversation
-    msg = crud_message.get(db, id=message_id)
+    msg = await async_message.get(db, id=message_id)
     if not msg:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
 
-    conv = crud_conversation.get(db, id=msg.conversation_id)
+    conv = await async_conversation.get(db, id=msg.conversation_id)
     if not conv or conv.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
 
-    attachment = crud_file.attach_to_message(db, message_id=message_id, file_id=file_id)
+    attachment = await async_file.attach_to_message(db, message_id=message_id, file_id=file_id)
     return {"message_id": message_id, "file_id": file_id, "id": attachment.id}
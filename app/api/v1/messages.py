@@ -1,48 +1,66 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.deps import get_db, get_current_active_user
-from app.crud import message as crud_message, conversation as crud_conversation
+from app.crud import async_message as crud_message, async_conversation as crud_conversation
+from app.crud.pagination import InvalidCursor
+from app.schemas.common import CursorPage
 from app.schemas.message import MessageCreate, MessageUpdate, MessageResponse
-from app.models.models import User
+from app.schemas.user import UserSnapshot
 
 router = APIRouter()
 
 
 @router.get(
     "/conversations/{conversation_id}/messages",
-    response_model=List[MessageResponse],
+    response_model=CursorPage[MessageResponse],
     summary="List conversation messages",
-    responses={404: {"description": "Conversation not found"}},
+    responses={
+        400: {"description": "Invalid cursor"},
+        404: {"description": "Conversation not found"},
+    },
 )
-def list_messages(
+async def list_messages(
     conversation_id: int,
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
-    """List all messages in a conversation."""
-    conv = crud_conversation.get(db, id=conversation_id)
+    """
+    List messages in a conversation in chronological order.
+
+    Returns the newest page by default; follow prev_cursor for older messages.
+    """
+    conv = await crud_conversation.get(db, id=conversation_id)
     if not conv or conv.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
-    return crud_message.get_by_conversation(db, conversation_id=conversation_id, skip=skip, limit=limit)
+    try:
+        return await crud_message.get_page_by_conversation(
+            db, conversation_id=conversation_id, cursor=cursor, limit=limit
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
 
 
 @router.get(
     "/branches/{branch_id}/messages",
-    response_model=List[MessageResponse],
+    response_model=CursorPage[MessageResponse],
     summary="List branch messages",
+    responses={400: {"description": "Invalid cursor"}},
 )
-def list_branch_messages(
+async def list_branch_messages(
     branch_id: int,
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
-    """List all messages in a branch."""
-    return crud_message.get_by_branch(db, branch_id=branch_id, skip=skip, limit=limit)
+    """List messages in a branch in chronological order, newest page first."""
+    try:
+        return await crud_message.get_page_by_branch(db, branch_id=branch_id, cursor=cursor, limit=limit)
+    except InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
 
 
 @router.post(
@@ -52,16 +70,16 @@ def list_branch_messages(
     summary="Create a message",
     responses={404: {"description": "Conversation not found"}},
 )
-def create_message(
+async def create_message(
     message_in: MessageCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
     """Create a new message."""
-    conv = crud_conversation.get(db, id=message_in.conversation_id)
+    conv = await crud_conversation.get(db, id=message_in.conversation_id)
     if not conv or conv.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
-    return crud_message.create(db, obj_in=message_in)
+    return await crud_message.create(db, obj_in=message_in)
 
 
 @router.get(
@@ -70,17 +88,17 @@ def create_message(
     summary="Get a message",
     responses={404: {"description": "Message not found"}},
 )
-def get_message(
+async def get_message(
     message_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
     """Get a specific message."""
-    msg = crud_message.get(db, id=message_id)
+    msg = await crud_message.get(db, id=message_id)
     if not msg:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
 
-    conv = crud_conversation.get(db, id=msg.conversation_id)
+    conv = await crud_conversation.get(db, id=msg.conversation_id)
     if not conv or conv.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
 
@@ -93,21 +111,22 @@ def get_message(
     summary="Get message thread",
     responses={404: {"description": "Message not found"}},
 )
-def get_message_thread(
+async def get_message_thread(
     message_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    max_depth: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
-    """Get the full thread leading to this message."""
-    msg = crud_message.get(db, id=message_id)
+    """Get the thread leading to this message, optionally limited to the last max_depth messages."""
+    msg = await crud_message.get(db, id=message_id)
     if not msg:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
 
-    conv = crud_conversation.get(db, id=msg.conversation_id)
+    conv = await crud_conversation.get(db, id=msg.conversation_id)
     if not conv or conv.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
 
-    return crud_message.get_thread(db, message_id=message_id)
+    return await crud_message.get_thread(db, message_id=message_id, max_depth=max_depth)
 
 
 @router.patch(
@@ -116,22 +135,22 @@ def get_message_thread(
     summary="Update a message",
     responses={404: {"description": "Message not found"}},
 )
-def update_message(
+async def update_message(
     message_id: int,
     message_in: MessageUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
     """Update a message."""
-    msg = crud_message.get(db, id=message_id)
+    msg = await crud_message.get(db, id=message_id)
     if not msg:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
 
-    conv = crud_conversation.get(db, id=msg.conversation_id)
+    conv = await crud_conversation.get(db, id=msg.conversation_id)
     if not conv or conv.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
 
-    return crud_message.update(db, db_obj=msg, obj_in=message_in)
+    return await crud_message.update(db, db_obj=msg, obj_in=message_in)
 
 
 @router.delete(
@@ -140,18 +159,18 @@ def update_message(
     summary="Delete a message",
     responses={404: {"description": "Message not found"}},
 )
-def delete_message(
+async def delete_message(
     message_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> None:
     """Delete a message."""
-    msg = crud_message.get(db, id=message_id)
+    msg = await crud_message.get(db, id=message_id)
     if not msg:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
 
-    conv = crud_conversation.get(db, id=msg.conversation_id)
+    conv = await crud_conversation.get(db, id=msg.conversation_id)
     if not conv or conv.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
 
-    crud_message.remove(db, id=message_id)
+    await crud_message.remove(db, id=message_id)
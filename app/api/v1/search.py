@@ -1,10 +1,10 @@
-from typing import Any, List
+from typing import Any, Dict, List, Literal, Optional
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from app.api.deps import get_db, get_current_active_user
-from app.services.rag import query as rag_query
-from app.models.models import User
+from app.services.rag import cache_stats, query as rag_query
+from app.schemas.user import UserSnapshot
 
 router = APIRouter()
 
@@ -12,29 +12,46 @@ router = APIRouter()
 class SearchRequest(BaseModel):
     query: str
     n_results: int = 5
+    mode: Optional[Literal["vector", "hybrid"]] = None  # defaults to RAG_SEARCH_MODE
 
 
 class SearchResult(BaseModel):
     content: str
     metadata: dict
     distance: float = None
+    score: Optional[float] = None  # fused rank score in hybrid mode, else the similarity
 
 
 @router.post(
     "/rag",
     response_model=List[SearchResult],
-    summary="Search documents using RAG vector similarity",
+    summary="Search documents using RAG vector or hybrid retrieval",
     responses={
         401: {"description": "Not authenticated"},
     },
 )
 def search_documents(
     request: SearchRequest,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UserSnapshot = Depends(get_current_active_user),
 ) -> Any:
     results = rag_query(
         query_text=request.query,
         user_id=current_user.id,
         n_results=request.n_results,
+        mode=request.mode,
     )
     return results
+
+
+@router.get(
+    "/stats",
+    response_model=Dict[str, Dict[str, int]],
+    summary="RAG cache hit/miss counters",
+    responses={
+        401: {"description": "Not authenticated"},
+    },
+)
+def search_stats(
+    current_user: UserSnapshot = Depends(get_current_active_user),
+) -> Any:
+    return cache_stats()
@@ -0,0 +1,92 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe bounded LRU cache with optional per-entry TTL."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class Generations:
+    """
+    Thread-safe invalidation counters for keys whose cached entries are tagged
+    with the generation they were cached under, bounded to the maxsize keys
+    invalidated most recently.
+
+    Every bump hands out a value never seen before, and a key that was never
+    bumped or was evicted reads as the highest generation evicted so far, so
+    an entry cached before an invalidation never becomes valid again.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._counter = itertools.count(1)
+        self._floor = 0
+        self._data: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> int:
+        with self._lock:
+            return self._data.get(key, self._floor)
+
+    def bump(self, key: Hashable) -> None:
+        with self._lock:
+            self._data[key] = next(self._counter)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                _, generation = self._data.popitem(last=False)
+                self._floor = max(self._floor, generation)
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,36 @@
+from celery import Celery
+from app.core.config import settings
+
+celery_app = Celery(
+    "conduit",
+    broker=settings.CELERY_BROKER_URL,
+    backend=settings.CELERY_RESULT_BACKEND,
+    include=["app.services.tasks"],
+)
+
+celery_app.conf.update(
+    task_always_eager=settings.CELERY_TASK_ALWAYS_EAGER,
+    task_store_eager_result=True,
+    task_track_started=True,
+    # Ingestion jobs are long and idempotent: ack after completion so a crashed
+    # worker's job is redelivered, and don't let one worker hoard the queue
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    worker_concurrency=settings.CELERY_WORKER_CONCURRENCY,
+    task_routes={"files.*": {"queue": "ingest"}, "vectors.*": {"queue": "ingest"}},
+    beat_schedule={
+        "enqueue-pending-files": {
+            "task": "files.enqueue_pending",
+            "schedule": settings.FILE_PROCESSING_POLL_INTERVAL,
+        },
+        "purge-upload-sessions": {
+            "task": "files.purge_upload_sessions",
+            "schedule": 3600.0,
+        },
+        "purge-promoted-vector-tenants": {
+            "task": "vectors.purge_promoted_tenants",
+            "schedule": 600.0,
+        },
+    },
+)
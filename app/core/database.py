@@ -1,10 +1,126 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Tuple
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
 from app.core.config import settings
+from app.core.metrics import CallbackMetric, db_query_duration_seconds
+from app.core.pool import configure_engine, engine_options, pool_status
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+_ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def async_database_url(url: str) -> URL:
+    """A sync database URL rewritten for its asyncio driver."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend in _ASYNC_DRIVERS:
+        url = url.set(drivername=f"{backend}+{_ASYNC_DRIVERS[backend]}")
+    return url
+
+
+# Celery workers and blocking file/vector store work use the sync engine;
+# request handlers use the async one.
+engine = create_engine(settings.DATABASE_URL, **engine_options(make_url(settings.DATABASE_URL)))
+configure_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+_async_url = make_url(settings.ASYNC_DATABASE_URL) if settings.ASYNC_DATABASE_URL else async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(_async_url, **engine_options(_async_url, is_async=True))
+configure_engine(async_engine.sync_engine)
+# Attributes can't be lazily reloaded outside of an await, so objects stay loaded after commit
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 class Base(DeclarativeBase):
     pass
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Connection pool occupancy and checkout metrics for both engines in this process."""
+    return {"sync": pool_status(engine), "async": pool_status(async_engine.sync_engine)}
+
+
+def _time_statements(engine: Engine, name: str) -> None:
+    histogram = db_query_duration_seconds.labels(name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start(conn, cursor, statement, parameters, context, executemany):
+        conn.info["statement_started_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def stop(conn, cursor, statement, parameters, context, executemany):
+        histogram.observe(time.perf_counter() - conn.info["statement_started_at"])
+
+
+_time_statements(engine, "sync")
+_time_statements(async_engine.sync_engine, "async")
+
+
+def _pool_field(*fields: str) -> Callable[[], List[Tuple[Tuple[str, ...], float]]]:
+    """Samples of pool_stats fields, labelled by engine (and by field when there are several)."""
+    def samples():
+        return [
+            ((name, field) if len(fields) > 1 else (name,), status[field])
+            for name, status in pool_stats().items()
+            for field in fields
+            if field in status
+        ]
+    return samples
+
+
+CallbackMetric(
+    "db_pool_connections", "Pooled database connections by state.",
+    ("engine", "state"), _pool_field("checked_out", "checked_in", "overflow"),
+)
+CallbackMetric("db_pool_size", "Configured connection pool size.", ("engine",), _pool_field("size"))
+CallbackMetric(
+    "db_pool_checkouts_total", "Connections checked out of the pool.",
+    ("engine",), _pool_field("checkouts"), type="counter",
+)
+CallbackMetric(
+    "db_pool_overflow_checkouts_total", "Checkouts served by an overflow connection.",
+    ("engine",), _pool_field("overflow_checkouts"), type="counter",
+)
+CallbackMetric(
+    "db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT.",
+    ("engine",), _pool_field("timeouts"), type="counter",
+)
+CallbackMetric(
+    "db_pool_wait_seconds_total", "Time spent waiting for a pooled connection.",
+    ("engine",), _pool_field("wait_seconds_total"), type="counter",
+)
+
+
+@contextmanager
+def unit_of_work(db: Session) -> Iterator[Session]:
+    """
+    Commit the writes made inside the block together, or roll them all back.
+
+    CRUD calls inside should pass commit=False. Objects written in the block
+    keep their loaded state after the commit instead of being expired, since
+    inserts already fetch server-generated values with RETURNING.
+    """
+    expire_on_commit = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        yield db
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.expire_on_commit = expire_on_commit
+
+
+@asynccontextmanager
+async def async_unit_of_work(db: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """unit_of_work for an AsyncSession."""
+    try:
+        yield db
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
@@ -0,0 +1,361 @@
+"""
+Process metrics in the Prometheus text format.
+
+Counters and histograms keep one array of values per thread and sum them when
+scraped, so recording never takes a lock or contends with other threads; the
+only allocation is the label tuple. Metrics computed elsewhere (pool and
+threadpool occupancy) are read through callbacks at scrape time.
+"""
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+import anyio.to_thread
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+RATE_BUCKETS = (1.0, 5.0, 10.0, 20.0, 40.0, 80.0, 160.0, 320.0, 640.0)
+
+_registry: List["_Metric"] = []
+
+
+class _Shards:
+    """Per-thread value arrays; each thread only ever writes its own."""
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def values(self) -> List[float]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = [0.0] * self._size
+            # Once per thread, never on the recording path afterwards
+            with self._lock:
+                self._shards.append(values)
+            self._local.values = values
+            return values
+
+    def total(self) -> List[float]:
+        with self._lock:
+            shards = list(self._shards)
+        return [sum(column) for column in zip(*shards)] if shards else [0.0] * self._size
+
+
+class _Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        _registry.append(self)
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            child = self._children.setdefault(values, self._child())
+        return child
+
+    @abstractmethod
+    def _child(self):
+        """A new child to record the values of one set of labels."""
+
+    @abstractmethod
+    def samples(self) -> Iterable[Tuple[str, LabelValues, Tuple[str, ...], float]]:
+        """(suffix, label values, extra label pairs, value) for every child."""
+
+
+class _CounterChild:
+    __slots__ = ("_shards",)
+
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._shards.values()[0] += amount
+
+
+class Counter(_Metric):
+    """Monotonic count. Name it with a _total suffix."""
+
+    type = "counter"
+
+    def _child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield "", values, (), child._shards.total()[0]
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: "_HistogramChild"):
+        self._child = child
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_shards")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        # One count per bucket plus +Inf, then the sum
+        self._shards = _Shards(len(bounds) + 2)
+
+    def observe(self, value: float) -> None:
+        values = self._shards.values()
+        values[bisect_left(self._bounds, value)] += 1
+        values[-1] += value
+
+    def time(self) -> _Timer:
+        """Context manager that observes the seconds spent inside it."""
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            totals = child._shards.total()
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, float("inf")), totals):
+                cumulative += count
+                yield "_bucket", values, ("le", _format_value(bound)), cumulative
+            yield "_sum", values, (), totals[-1]
+            yield "_count", values, (), cumulative
+
+
+class CallbackMetric(_Metric):
+    """A gauge or counter whose values are read from a callback when scraped."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        callback: Callable[[], Iterable[Tuple[LabelValues, float]]],
+        type: str = "gauge",
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self._callback = callback
+
+    def _child(self):
+        raise TypeError(f"{self.name} is read from its callback and can't be recorded to")
+
+    def samples(self):
+        for values, value in self._callback():
+            yield "", values, (), value
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for suffix, values, extra, value in metric.samples():
+            pairs = list(zip(metric.labelnames, values))
+            if extra:
+                pairs.append(extra)
+            labels = ",".join(f'{key}="{_escape(str(v))}"' for key, v in pairs)
+            lines.append(f"{metric.name}{suffix}{{{labels}}} {_format_value(value)}" if labels
+                         else f"{metric.name}{suffix} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _threadpool_threads() -> List[Tuple[LabelValues, float]]:
+    try:
+        limiter = anyio.to_thread.current_default_thread_limiter()
+    except Exception:
+        # Only readable from the event loop
+        return []
+    return [(("busy",), limiter.borrowed_tokens), (("total",), limiter.total_tokens)]
+
+
+# By id, since routes aren't hashable; they live as long as the app
+_route_templates: Dict[int, str] = {}
+
+
+def _route_template(route, path: str) -> str:
+    """Full path template of the route that served path."""
+    template = _route_templates.get(id(route))
+    if template is None:
+        # A route of an included router may only know its own part of the
+        # path; the part in front of it is the routers' static prefixes
+        match = re.search(route.path_regex.pattern.lstrip("^"), path)
+        template = route.path if match is None else path[:match.start()] + route.path
+        template = _route_templates.setdefault(id(route), template)
+    return template
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the latency of every HTTP request by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            # Templates, not raw paths, so ids don't multiply the series
+            path = _route_template(route, scope["path"]) if hasattr(route, "path_regex") else "unmatched"
+            http_request_duration_seconds.labels(scope["method"], path, str(status)).observe(
+                time.perf_counter() - start
+            )
+
+
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the response is fully sent, by route template.",
+    ("method", "route", "status"),
+)
+threadpool_threads = CallbackMetric(
+    "threadpool_threads",
+    "Worker threads of the event loop's default threadpool, busy and total.",
+    ("state",),
+    _threadpool_threads,
+)
+
+llm_request_duration_seconds = Histogram(
+    "llm_request_duration_seconds",
+    "LLM completion latency until the last token.",
+    ("model", "stream"),
+    buckets=LLM_BUCKETS,
+)
+llm_time_to_first_token_seconds = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from sending a streaming completion to its first content token.",
+    ("model",),
+    buckets=LLM_BUCKETS,
+)
+llm_output_tokens_per_second = Histogram(
+    "llm_output_tokens_per_second",
+    "Completion tokens per second; measured from the first token when streaming.",
+    ("model",),
+    buckets=RATE_BUCKETS,
+)
+llm_cache_requests_total = Counter(
+    "llm_cache_requests_total",
+    "Response cache lookups for cacheable completions, by result (hit or miss).",
+    ("model", "result"),
+)
+llm_errors_total = Counter(
+    "llm_errors_total",
+    "LLM completions that raised.",
+    ("model",),
+)
+token_count_duration_seconds = Histogram(
+    "token_count_duration_seconds",
+    "Time spent in the tokenizer counting prompt or message tokens (cache misses).",
+    ("kind",),
+    buckets=FAST_BUCKETS,
+)
+context_build_duration_seconds = Histogram(
+    "context_build_duration_seconds",
+    "Time to fit a conversation into a model's context window.",
+    buckets=FAST_BUCKETS,
+)
+
+rag_query_duration_seconds = Histogram(
+    "rag_query_duration_seconds",
+    "RAG query latency, excluding result cache hits.",
+    ("mode",),
+)
+rag_embed_duration_seconds = Histogram(
+    "rag_embed_duration_seconds",
+    "Query embedding latency (embedding cache misses).",
+)
+rag_search_duration_seconds = Histogram(
+    "rag_search_duration_seconds",
+    "Index search latency within a RAG query.",
+    ("index",),
+)
+ingest_stage_duration_seconds = Histogram(
+    "ingest_stage_duration_seconds",
+    "File ingestion time per stage and batch.",
+    ("stage",),
+    buckets=LLM_BUCKETS,
+)
+vector_tenant_promotions_total = Counter(
+    "vector_tenant_promotions_total",
+    "Users moved from a shared vector collection to their own, by result (promoted or failed).",
+    ("result",),
+)
+
+db_query_duration_seconds = Histogram(
+    "db_query_duration_seconds",
+    "Database statement execution time.",
+    ("engine",),
+    buckets=FAST_BUCKETS,
+)
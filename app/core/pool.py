@@ -0,0 +1,152 @@
+import threading
+import time
+from typing import Any, Dict, Type
+from uuid import uuid4
+from sqlalchemy import event, exc
+from sqlalchemy.engine import URL, Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+from app.core.config import settings
+
+
+class PoolMetrics:
+    """Checkout counters for one connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, wait: float, *, overflow: bool = False, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.overflow_checkouts += overflow
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "overflow_checkouts": self.overflow_checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+
+
+class _InstrumentedPool:
+    """Times every wait for a connection. Mixed into a QueuePool class."""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        # Anything checked out beyond pool_size is an overflow connection
+        self.metrics.record(time.perf_counter() - start, overflow=self.checkedout() > self.size())
+        return record
+
+
+def instrumented_pool(base: Type[Pool]) -> Type[Pool]:
+    """A subclass of base with its own PoolMetrics, kept when the pool is recreated."""
+    return type(f"Instrumented{base.__name__}", (_InstrumentedPool, base), {"metrics": PoolMetrics()})
+
+
+def engine_options(url: URL, *, is_async: bool = False) -> Dict[str, Any]:
+    """create_engine keyword arguments for url from the DB_* settings."""
+    backend, driver = url.get_backend_name(), url.get_driver_name()
+    options: Dict[str, Any] = {"pool_pre_ping": settings.DB_POOL_PRE_PING == "always"}
+
+    # In-memory SQLite keeps its single shared connection
+    if not (backend == "sqlite" and url.database in (None, "", ":memory:")):
+        options.update(
+            poolclass=instrumented_pool(AsyncAdaptedQueuePool if is_async else QueuePool),
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            # Reusing the most recent connection keeps busy ones warm, so idle pings stay rare
+            pool_use_lifo=True,
+        )
+
+    if backend != "postgresql":
+        return options
+    connect_args: Dict[str, Any] = {}
+    if settings.DB_PGBOUNCER:
+        # Transaction pooling hands each transaction to any server connection,
+        # so named prepared statements can't be reused. The statement timeout
+        # is set per transaction instead (see configure_engine).
+        if driver == "asyncpg":
+            connect_args.update(
+                statement_cache_size=0,
+                prepared_statement_cache_size=0,
+                prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+            )
+    elif settings.DB_STATEMENT_TIMEOUT:
+        if driver == "asyncpg":
+            connect_args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT)}
+        else:
+            connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT}"
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def configure_engine(engine: Engine) -> None:
+    """Install the event hooks engine_options can't express. Pass sync_engine for async engines."""
+    if settings.DB_POOL_PRE_PING == "idle":
+        _ping_idle_connections(engine, settings.DB_POOL_PRE_PING_IDLE)
+    if settings.DB_PGBOUNCER and settings.DB_STATEMENT_TIMEOUT and engine.dialect.name == "postgresql":
+        # PgBouncer doesn't forward startup options, so set it per transaction
+        @event.listens_for(engine, "begin")
+        def set_statement_timeout(conn):
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(settings.DB_STATEMENT_TIMEOUT)}")
+
+
+def _ping_idle_connections(engine: Engine, idle: float) -> None:
+    """
+    Ping connections on checkout only after they have sat in the pool for idle
+    seconds. Busy connections skip the extra round trip; the ones a server or
+    proxy may have dropped meanwhile are checked and replaced.
+    """
+    @event.listens_for(engine, "checkin")
+    def mark_idle(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def ping(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle:
+            return
+        try:
+            engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            # The pool discards the connection and checks out another
+            raise exc.DisconnectionError("Connection failed idle ping") from e
+
+
+def pool_status(engine: Engine) -> Dict[str, Any]:
+    """Live occupancy of engine's pool, plus its checkout metrics if instrumented."""
+    pool = engine.pool
+    status: Dict[str, Any] = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+        )
+    metrics = getattr(pool, "metrics", None)
+    if isinstance(metrics, PoolMetrics):
+        status.update(metrics.snapshot())
+    return status
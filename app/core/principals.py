@@ -0,0 +1,43 @@
+import time
+from typing import Any, Optional
+from app.core.cache import Generations, LRUCache
+from app.core.config import settings
+
+# Authenticated user snapshots by bearer token
+_principals = LRUCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+# Bumped when a user changes, which orphans every cached token for them
+_user_generations = Generations(maxsize=settings.AUTH_CACHE_SIZE)
+
+
+def principal_generation(user_id: int) -> int:
+    """Read before loading the user, so a concurrent change is never cached."""
+    return _user_generations.get(user_id)
+
+
+def get_cached_principal(token: str) -> Optional[Any]:
+    entry = _principals.get(token)
+    if entry is None:
+        return None
+    generation, principal = entry
+    if generation != principal_generation(principal.id):
+        _principals.pop(token)
+        return None
+    return principal
+
+
+def cache_principal(token: str, principal: Any, generation: int, expires_at: Optional[float] = None) -> None:
+    """Cache a user snapshot for a token, never past the token's own expiry."""
+    ttl = settings.AUTH_CACHE_TTL
+    if expires_at is not None:
+        ttl = min(ttl, expires_at - time.time())
+    if ttl > 0:
+        _principals.set(token, (generation, principal), ttl=ttl)
+
+
+def invalidate_principal(user_id: int) -> None:
+    """Drop cached snapshots of a user after it is updated, deactivated or deleted."""
+    _user_generations.bump(user_id)
+
+
+def principal_cache_stats() -> dict:
+    return _principals.stats()
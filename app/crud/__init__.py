@@ -3,5 +3,23 @@ from app.crud.crud_conversation import conversation
 from app.crud.crud_message import message
 from app.crud.crud_file import file
 from app.crud.crud_config import config
+from app.crud.crud_blob import blob
+from app.crud.crud_chunk import chunk
+from app.crud.crud_vector_tenant import vector_tenant
+from app.crud.base import AsyncCRUD
 
-__all__ = ["user", "conversation", "message", "file", "config"]
+# For AsyncSession, e.g. await async_conversation.get(db, id=1)
+async_user = AsyncCRUD(user)
+async_conversation = AsyncCRUD(conversation)
+async_message = AsyncCRUD(message)
+async_file = AsyncCRUD(file)
+async_config = AsyncCRUD(config)
+async_blob = AsyncCRUD(blob)
+async_chunk = AsyncCRUD(chunk)
+async_vector_tenant = AsyncCRUD(vector_tenant)
+
+__all__ = [
+    "user", "conversation", "message", "file", "config", "blob", "chunk", "vector_tenant",
+    "async_user", "async_conversation", "async_message", "async_file", "async_config",
+    "async_blob", "async_chunk", "async_vector_tenant",
+]
@@ -1,11 +1,14 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, Sequence, Type, TypeVar, Union
 from pydantic import BaseModel
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.core.database import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
+CRUDType = TypeVar("CRUDType")
 
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
@@ -20,28 +23,111 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     ) -> List[ModelType]:
         return db.query(self.model).offset(skip).limit(limit).all()
 
-    def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
+    def create(self, db: Session, *, obj_in: CreateSchemaType, commit: bool = True) -> ModelType:
         obj_data = obj_in.model_dump()
         db_obj = self.model(**obj_data)
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        self._save(db, db_obj, commit)
         return db_obj
 
+    def create_many(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        commit: bool = True,
+    ) -> List[ModelType]:
+        """
+        Insert rows in a single INSERT ... RETURNING and return them in order.
+
+        Dicts may set any column, not just the create schema's fields.
+        """
+        if not objs_in:
+            return []
+        rows = [obj_in if isinstance(obj_in, dict) else obj_in.model_dump() for obj_in in objs_in]
+        db_objs = list(db.scalars(
+            insert(self.model).returning(self.model, sort_by_parameter_order=True), rows
+        ))
+        if commit:
+            db.commit()
+        return db_objs
+
+    def insert_all(
+        self, db: Session, *, db_objs: Sequence[ModelType], commit: bool = True
+    ) -> List[ModelType]:
+        """
+        Insert new model instances with create_many, returning the persisted rows.
+
+        Unset attributes take their column defaults. The instances passed in
+        are left untouched.
+        """
+        columns = self.model.__table__.columns
+        return self.create_many(db, objs_in=[
+            {
+                column.key: getattr(db_obj, column.key)
+                for column in columns
+                if getattr(db_obj, column.key) is not None
+            }
+            for db_obj in db_objs
+        ], commit=commit)
+
     def update(
-        self, db: Session, *, db_obj: ModelType, obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+        self,
+        db: Session,
+        *,
+        db_obj: ModelType,
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]],
+        commit: bool = True,
     ) -> ModelType:
         update_data = obj_in if isinstance(obj_in, dict) else obj_in.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_obj, field, value)
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        self._save(db, db_obj, commit)
         return db_obj
 
-    def remove(self, db: Session, *, id: int) -> Optional[ModelType]:
+    def remove(self, db: Session, *, id: int, commit: bool = True) -> Optional[ModelType]:
         obj = db.query(self.model).filter(self.model.id == id).first()
         if obj:
             db.delete(obj)
-            db.commit()
+            if commit:
+                db.commit()
+            else:
+                db.flush()
         return obj
+
+    def _save(self, db: Session, db_obj: ModelType, commit: bool) -> None:
+        """Commit and reload db_obj, or only flush it when the caller commits later."""
+        if commit:
+            db.commit()
+            db.refresh(db_obj)
+        else:
+            db.flush()
+
+
+class AsyncCRUD(Generic[CRUDType]):
+    """
+    Awaitable variant of a CRUD object for an AsyncSession.
+
+    Every method of the wrapped object is available with the same arguments,
+    taking an AsyncSession in place of a Session. Calls run through
+    AsyncSession.run_sync, so the queries are shared with the sync stack while
+    the database I/O happens on the event loop.
+    """
+
+    def __init__(self, crud: CRUDType):
+        self.crud = crud
+
+    def __getattr__(self, name: str) -> Callable[..., Awaitable[Any]]:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = getattr(self.crud, name)
+
+        async def call(db: AsyncSession, *args: Any, **kwargs: Any) -> Any:
+            return await db.run_sync(method, *args, **kwargs)
+
+        call.__name__ = name
+        call.__doc__ = method.__doc__
+        # Cache on the instance so later lookups skip __getattr__
+        setattr(self, name, call)
+        return call
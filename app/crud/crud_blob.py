@@ -0,0 +1,56 @@
+from typing import Optional
+from pydantic import BaseModel
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.crud.base import CRUDBase
+from app.models.models import Blob
+
+
+class CRUDBlob(CRUDBase[Blob, BaseModel, BaseModel]):
+    """Reference-counted content-addressed blobs. Counts change atomically in SQL."""
+
+    def get_by_hash(self, db: Session, *, content_hash: str) -> Optional[Blob]:
+        return db.query(Blob).filter(Blob.content_hash == content_hash).first()
+
+    def acquire(self, db: Session, *, blob: Blob) -> bool:
+        """Add a reference. Returns False if the blob was deleted concurrently."""
+        result = db.execute(
+            update(Blob)
+            .where(Blob.id == blob.id, Blob.ref_count > 0)
+            .values(ref_count=Blob.ref_count + 1)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    def create_referenced(
+        self, db: Session, *, content_hash: str, file_path: str, file_size: int
+    ) -> Optional[Blob]:
+        """Insert a blob holding one reference, or None if the hash already exists."""
+        blob = Blob(content_hash=content_hash, file_path=file_path, file_size=file_size, ref_count=1)
+        db.add(blob)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return None
+        db.refresh(blob)
+        return blob
+
+    def release(self, db: Session, *, blob_id: int, commit: bool = True) -> bool:
+        """
+        Drop a reference. Returns True if it was the last one and the blob row was deleted.
+
+        With commit=False the row stays locked until the caller commits, so
+        concurrent acquire() calls wait for it.
+        """
+        db.execute(
+            update(Blob).where(Blob.id == blob_id).values(ref_count=Blob.ref_count - 1)
+        )
+        result = db.execute(delete(Blob).where(Blob.id == blob_id, Blob.ref_count <= 0))
+        if commit:
+            db.commit()
+        return result.rowcount == 1
+
+
+blob = CRUDBlob(Blob)
@@ -0,0 +1,125 @@
+import re
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from sqlalchemy import Text, delete, func, insert, literal_column, or_, update
+from sqlalchemy.orm import Session
+from app.crud.base import CRUDBase
+from app.models.models import DocumentChunk
+
+# Must match the expression of the GIN index. The "simple" configuration does
+# not stem or drop stop words, so identifiers and error codes match exactly.
+_TS_CONFIG = literal_column("'simple'::regconfig")
+
+
+class CRUDChunk(CRUDBase[DocumentChunk, BaseModel, BaseModel]):
+    """Text of the chunks in the vector store, for search results and lexical search."""
+
+    def insert_rows(self, db: Session, *, rows: List[Dict]) -> None:
+        """Insert chunk rows, replacing any with the same ids, so re-indexing doesn't duplicate them."""
+        if rows:
+            db.execute(delete(DocumentChunk).where(DocumentChunk.id.in_([row["id"] for row in rows])))
+            db.execute(insert(DocumentChunk), rows)
+            db.commit()
+
+    def get_contents(self, db: Session, *, ids: List[str]) -> Dict[str, str]:
+        """Text of the chunks with these point ids; ids without a row are left out."""
+        if not ids:
+            return {}
+        rows = db.query(DocumentChunk.id, DocumentChunk.content).filter(DocumentChunk.id.in_(ids)).all()
+        return {row.id: row.content for row in rows}
+
+    def remove_where(
+        self,
+        db: Session,
+        *,
+        collection_name: str,
+        file_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        blob_id: Optional[int] = None,
+    ) -> None:
+        conditions = [
+            column == value
+            for column, value in (
+                (DocumentChunk.file_id, file_id),
+                (DocumentChunk.user_id, user_id),
+                (DocumentChunk.blob_id, blob_id),
+            )
+            if value is not None
+        ]
+        db.execute(
+            delete(DocumentChunk).where(DocumentChunk.collection_name == collection_name, *conditions)
+        )
+        db.commit()
+
+    def reassign_file(
+        self, db: Session, *, collection_name: str, user_id: int, blob_id: int, file_id: int, new_file_id: int
+    ) -> None:
+        """Move a user's chunks of some deduplicated content from one of their files to another."""
+        db.execute(
+            update(DocumentChunk)
+            .where(
+                DocumentChunk.collection_name == collection_name,
+                DocumentChunk.user_id == user_id,
+                DocumentChunk.blob_id == blob_id,
+                DocumentChunk.file_id == file_id,
+            )
+            .values(file_id=new_file_id)
+        )
+        db.commit()
+
+    def search(
+        self, db: Session, *, user_id: int, query: str, limit: int, collection_name: str = "documents"
+    ) -> List[str]:
+        """Ids of the user's chunks that best match any term of the query, best first."""
+        if db.get_bind().dialect.name == "postgresql":
+            return self._search_fulltext(db, user_id, query, limit, collection_name)
+        return self._search_substring(db, user_id, query, limit, collection_name)
+
+    def _search_fulltext(
+        self, db: Session, user_id: int, query: str, limit: int, collection_name: str
+    ) -> List[str]:
+        # plainto_tsquery ANDs the terms; OR them so partial matches still rank
+        tsquery = func.to_tsquery(
+            _TS_CONFIG,
+            func.replace(func.plainto_tsquery(_TS_CONFIG, query).cast(Text), " & ", " | "),
+        )
+        document = func.to_tsvector(_TS_CONFIG, DocumentChunk.content)
+        rows = (
+            db.query(DocumentChunk.id)
+            .filter(
+                DocumentChunk.user_id == user_id,
+                DocumentChunk.collection_name == collection_name,
+                document.op("@@")(tsquery),
+            )
+            # Normalization 1 divides by 1 + log(length), so long chunks don't dominate
+            .order_by(func.ts_rank_cd(document, tsquery, 1).desc())
+            .limit(limit)
+            .all()
+        )
+        return [row.id for row in rows]
+
+    def _search_substring(
+        self, db: Session, user_id: int, query: str, limit: int, collection_name: str
+    ) -> List[str]:
+        """Fallback for databases without full-text search, e.g. SQLite in tests."""
+        terms = set(re.findall(r"\w+", query.lower()))
+        if not terms:
+            return []
+        rows = (
+            db.query(DocumentChunk.id, DocumentChunk.content)
+            .filter(
+                DocumentChunk.user_id == user_id,
+                DocumentChunk.collection_name == collection_name,
+                or_(*(DocumentChunk.content.ilike(f"%{term}%") for term in terms)),
+            )
+            .all()
+        )
+        scored = sorted(
+            rows,
+            key=lambda row: sum(row.content.lower().count(term) for term in terms),
+            reverse=True,
+        )
+        return [row.id for row in scored[:limit]]
+
+
+chunk = CRUDChunk(DocumentChunk)
@@ -1,21 +1,22 @@
-from typing import List, Optional
+from typing import Any, Dict, Optional
 from sqlalchemy.orm import Session, joinedload
 from app.crud.base import CRUDBase
+from app.crud.pagination import paginate
 from app.models.models import Conversation
 from app.schemas.conversation import ConversationCreate, ConversationUpdate
 
 
 class CRUDConversation(CRUDBase[Conversation, ConversationCreate, ConversationUpdate]):
-    def get_by_user(
-        self, db: Session, *, user_id: int, skip: int = 0, limit: int = 50
-    ) -> List[Conversation]:
-        return (
-            db.query(Conversation)
-            .filter(Conversation.user_id == user_id)
-            .order_by(Conversation.updated_at.desc().nullslast(), Conversation.created_at.desc())
-            .offset(skip)
-            .limit(limit)
-            .all()
+    def get_page_by_user(
+        self, db: Session, *, user_id: int, cursor: Optional[str] = None, limit: int = 50
+    ) -> Dict[str, Any]:
+        """A page of the user's conversations, most recently updated first."""
+        return paginate(
+            db.query(Conversation).filter(Conversation.user_id == user_id),
+            (Conversation.updated_at, Conversation.id),
+            cursor=cursor,
+            limit=limit,
+            descending=True,
         )
 
     def get_with_messages(self, db: Session, *, id: int) -> Optional[Conversation]:
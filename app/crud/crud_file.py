@@ -1,31 +1,59 @@
-from typing import List
+from typing import Any, Dict, List, Optional
 from sqlalchemy.orm import Session
 from app.crud.base import CRUDBase
+from app.crud.pagination import paginate
 from app.models.models import File, FileStatus, MessageFile
 from app.schemas.file import FileCreate, FileUpdate
 
 
 class CRUDFile(CRUDBase[File, FileCreate, FileUpdate]):
-    def get_by_user(
-        self, db: Session, *, user_id: int, skip: int = 0, limit: int = 50
-    ) -> List[File]:
-        return (
-            db.query(File)
-            .filter(File.user_id == user_id)
-            .order_by(File.created_at.desc())
-            .offset(skip)
-            .limit(limit)
-            .all()
+    def get_page_by_user(
+        self, db: Session, *, user_id: int, cursor: Optional[str] = None, limit: int = 50
+    ) -> Dict[str, Any]:
+        """A page of the user's files, newest first."""
+        return paginate(
+            db.query(File).filter(File.user_id == user_id),
+            (File.created_at, File.id),
+            cursor=cursor,
+            limit=limit,
+            descending=True,
         )
 
     def get_pending(self, db: Session, *, limit: int = 10) -> List[File]:
+        """The oldest files waiting to be processed."""
         return (
             db.query(File)
             .filter(File.status == FileStatus.PENDING)
+            .order_by(File.created_at, File.id)
             .limit(limit)
             .all()
         )
 
+    def get_other_user_blob_file(self, db: Session, *, user_id: int, blob_id: int, exclude_id: int) -> Optional[File]:
+        """The oldest other file of a user with the same deduplicated content, if any."""
+        return (
+            db.query(File)
+            .filter(File.user_id == user_id, File.blob_id == blob_id, File.id != exclude_id)
+            .order_by(File.id)
+            .first()
+        )
+
+    def get_indexed_by_blob(
+        self,
+        db: Session,
+        *,
+        blob_id: int,
+        user_id: Optional[int] = None,
+        exclude_user_id: Optional[int] = None,
+    ) -> Optional[File]:
+        """A completed file with this blob, whose chunks are fully indexed and can be reused."""
+        query = db.query(File).filter(File.blob_id == blob_id, File.status == FileStatus.COMPLETED)
+        if user_id is not None:
+            query = query.filter(File.user_id == user_id)
+        if exclude_user_id is not None:
+            query = query.filter(File.user_id != exclude_user_id)
+        return query.first()
+
     def attach_to_message(
         self, db: Session, *, message_id: int, file_id: int
     ) -> MessageFile:
@@ -1,58 +1,116 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy import literal, select
+from sqlalchemy.orm import Session, aliased
 from app.crud.base import CRUDBase
+from app.crud.pagination import paginate
 from app.models.models import Message
 from app.schemas.message import MessageCreate, MessageUpdate
 
 
 class CRUDMessage(CRUDBase[Message, MessageCreate, MessageUpdate]):
-    def get_by_conversation(
-        self, db: Session, *, conversation_id: int, skip: int = 0, limit: int = 100
+    def get_recent(
+        self, db: Session, *, conversation_id: int, limit: int = 100
     ) -> List[Message]:
-        return (
-            db.query(Message)
-            .filter(Message.conversation_id == conversation_id)
-            .order_by(Message.created_at.asc())
-            .offset(skip)
-            .limit(limit)
-            .all()
+        """The conversation's newest messages, oldest first."""
+        return self.get_page_by_conversation(db, conversation_id=conversation_id, limit=limit)["items"]
+
+    def get_page_by_conversation(
+        self, db: Session, *, conversation_id: int, cursor: Optional[str] = None, limit: int = 100
+    ) -> Dict[str, Any]:
+        """
+        A page of the conversation's messages in chronological order.
+
+        Without a cursor this is the newest page; prev_cursor walks back
+        through older messages.
+        """
+        return paginate(
+            db.query(Message).filter(Message.conversation_id == conversation_id),
+            (Message.created_at, Message.id),
+            cursor=cursor,
+            limit=limit,
+            from_end=True,
         )
 
-    def get_by_branch(
-        self, db: Session, *, branch_id: int, skip: int = 0, limit: int = 100
-    ) -> List[Message]:
-        return (
-            db.query(Message)
-            .filter(Message.branch_id == branch_id)
-            .order_by(Message.created_at.asc())
-            .offset(skip)
-            .limit(limit)
-            .all()
+    def get_page_by_branch(
+        self, db: Session, *, branch_id: int, cursor: Optional[str] = None, limit: int = 100
+    ) -> Dict[str, Any]:
+        """A page of the branch's messages in chronological order, newest page first."""
+        return paginate(
+            db.query(Message).filter(Message.branch_id == branch_id),
+            (Message.created_at, Message.id),
+            cursor=cursor,
+            limit=limit,
+            from_end=True,
         )
 
-    def get_thread(self, db: Session, *, message_id: int) -> List[Message]:
-        """Walk up the parent chain to build the conversation thread."""
-        thread = []
-        current = self.get(db, id=message_id)
-        while current:
-            thread.append(current)
-            current = (
-                self.get(db, id=current.parent_message_id)
-                if current.parent_message_id
-                else None
+    def _ancestors_cte(self, leaf_ids: Sequence[int], max_depth: Optional[int] = None):
+        """Recursive CTE of (leaf_id, id, depth) rows walking up the parent chain."""
+        ancestors = (
+            select(
+                Message.id.label("leaf_id"),
+                Message.id.label("id"),
+                Message.parent_message_id.label("parent_message_id"),
+                literal(0).label("depth"),
+            )
+            .where(Message.id.in_(leaf_ids))
+            .cte("ancestors", recursive=True)
+        )
+        parent = aliased(Message)
+        step = (
+            select(
+                ancestors.c.leaf_id,
+                parent.id,
+                parent.parent_message_id,
+                (ancestors.c.depth + 1).label("depth"),
             )
-        thread.reverse()
-        return thread
+            .join(ancestors, parent.id == ancestors.c.parent_message_id)
+        )
+        if max_depth is not None:
+            step = step.where(ancestors.c.depth < max_depth - 1)
+        return ancestors.union_all(step)
+
+    def get_thread(
+        self, db: Session, *, message_id: int, max_depth: Optional[int] = None
+    ) -> List[Message]:
+        """
+        Load the conversation thread ending at a message in a single query.
+
+        max_depth limits the thread to the most recent N messages.
+        """
+        return self.get_threads(db, message_ids=[message_id], max_depth=max_depth).get(message_id, [])
+
+    def get_threads(
+        self, db: Session, *, message_ids: Sequence[int], max_depth: Optional[int] = None
+    ) -> Dict[int, List[Message]]:
+        """Load the threads for many leaf messages at once, keyed by leaf id."""
+        if not message_ids:
+            return {}
+        ancestors = self._ancestors_cte(message_ids, max_depth=max_depth)
+        rows = (
+            db.query(ancestors.c.leaf_id, Message)
+            .join(ancestors, Message.id == ancestors.c.id)
+            .order_by(ancestors.c.leaf_id, ancestors.c.depth.desc())
+            .all()
+        )
+        threads: Dict[int, List[Message]] = {}
+        for leaf_id, msg in rows:
+            threads.setdefault(leaf_id, []).append(msg)
+        return threads
 
     def update_token_usage(
-        self, db: Session, *, db_obj: Message, prompt_tokens: int, completion_tokens: int
+        self,
+        db: Session,
+        *,
+        db_obj: Message,
+        prompt_tokens: int,
+        completion_tokens: int,
+        commit: bool = True,
     ) -> Message:
         db_obj.prompt_tokens = prompt_tokens
         db_obj.completion_tokens = completion_tokens
         db_obj.total_tokens = prompt_tokens + completion_tokens
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        self._save(db, db_obj, commit)
         return db_obj
 
 
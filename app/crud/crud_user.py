@@ -1,11 +1,29 @@
-from typing import Optional
+from typing import Any, Dict, Optional, Union
 from sqlalchemy.orm import Session
+from app.core.principals import invalidate_principal
 from app.crud.base import CRUDBase
 from app.models.models import User
 from app.schemas.user import UserCreate, UserUpdate
 
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
+    def update(
+        self,
+        db: Session,
+        *,
+        db_obj: User,
+        obj_in: Union[UserUpdate, Dict[str, Any]],
+        commit: bool = True,
+    ) -> User:
+        user = super().update(db, db_obj=db_obj, obj_in=obj_in, commit=commit)
+        invalidate_principal(user.id)
+        return user
+
+    def remove(self, db: Session, *, id: int, commit: bool = True) -> Optional[User]:
+        user = super().remove(db, id=id, commit=commit)
+        invalidate_principal(id)
+        return user
+
     def get_by_email(self, db: Session, *, email: str) -> Optional[User]:
         return db.query(User).filter(User.email == email).first()
 
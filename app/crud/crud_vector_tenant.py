@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.crud.base import CRUDBase
+from app.models.models import VectorTenant, VectorTenantState
+
+
+class CRUDVectorTenant(CRUDBase[VectorTenant, BaseModel, BaseModel]):
+    """Users promoted from a shared vector collection to their own."""
+
+    def get_by_user(self, db: Session, *, collection_name: str, user_id: int) -> Optional[VectorTenant]:
+        return db.query(VectorTenant).filter(
+            VectorTenant.collection_name == collection_name, VectorTenant.user_id == user_id
+        ).first()
+
+    def get_by_collection(self, db: Session, *, collection_name: str) -> List[VectorTenant]:
+        return db.query(VectorTenant).filter(VectorTenant.collection_name == collection_name).all()
+
+    def claim(
+        self, db: Session, *, collection_name: str, user_id: int, dedicated_collection: str
+    ) -> Optional[VectorTenant]:
+        """Start promoting a user, or None if another process already has."""
+        tenant = VectorTenant(
+            collection_name=collection_name,
+            user_id=user_id,
+            dedicated_collection=dedicated_collection,
+            state=VectorTenantState.COPYING,
+        )
+        db.add(tenant)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return None
+        db.refresh(tenant)
+        return tenant
+
+    def set_state(self, db: Session, *, tenant: VectorTenant, state: VectorTenantState) -> VectorTenant:
+        values = {"state": state}
+        if state == VectorTenantState.DEDICATED:
+            values["promoted_at"] = datetime.now(timezone.utc)
+        return self.update(db, db_obj=tenant, obj_in=values)
+
+    def get_purgeable(self, db: Session, *, promoted_before: datetime) -> List[VectorTenant]:
+        """Promoted tenants whose shared copies are old enough to delete."""
+        return db.query(VectorTenant).filter(
+            VectorTenant.state == VectorTenantState.DEDICATED,
+            VectorTenant.promoted_at <= promoted_before,
+        ).all()
+
+
+vector_tenant = CRUDVectorTenant(VectorTenant)
@@ -0,0 +1,86 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import literal, tuple_
+from sqlalchemy.orm import Query
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(key: Sequence[Any], backward: bool) -> str:
+    """Opaque cursor for the row with this sort key."""
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in key]
+    raw = json.dumps({"k": values, "b": backward}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> Tuple[List[Any], bool]:
+    """Sort key and direction from a cursor made by encode_cursor for the same columns."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        values, backward = data["k"], data["b"]
+        if len(values) != len(columns) or not isinstance(backward, bool):
+            raise ValueError("cursor does not match this listing")
+        key = []
+        for column, value in zip(columns, values):
+            python_type = column.type.python_type
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif not isinstance(value, python_type):
+                raise ValueError("cursor does not match this listing")
+            key.append(value)
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+    return key, backward
+
+
+def paginate(
+    query: Query,
+    columns: Sequence[Any],
+    *,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    descending: bool = False,
+    from_end: bool = False,
+) -> Dict[str, Any]:
+    """
+    One page of query ordered by columns, seeking past the cursor instead of
+    offsetting, so every page costs the same as the first.
+
+    The last column must be unique so the order is total. Without a cursor
+    the first page is returned, or the last one if from_end is set (the newest
+    messages of a chronological listing). Items are always in listing order;
+    next_cursor and prev_cursor are None when there is nothing further that way.
+    Raises InvalidCursor for cursors that weren't made for these columns.
+    """
+    key, backward = decode_cursor(cursor, columns) if cursor else (None, from_end)
+
+    # Going backward is going forward through the reversed order
+    reverse = descending != backward
+    if key is not None:
+        row = tuple_(*columns)
+        bound = tuple_(*(literal(value, type_=column.type) for column, value in zip(columns, key)))
+        query = query.filter(row < bound if reverse else row > bound)
+    query = query.order_by(*(column.desc() if reverse else column.asc() for column in columns))
+
+    items = query.limit(limit + 1).all()
+    more = len(items) > limit
+    items = items[:limit]
+    if backward:
+        items.reverse()
+
+    def cursor_for(item: Any, backward: bool) -> str:
+        return encode_cursor([getattr(item, column.key) for column in columns], backward)
+
+    if not items:
+        return {"items": [], "next_cursor": None, "prev_cursor": None}
+    # There is more on the side we came from whenever we came from a cursor
+    more_before, more_after = (more, key is not None) if backward else (key is not None, more)
+    return {
+        "items": items,
+        "next_cursor": cursor_for(items[-1], False) if more_after else None,
+        "prev_cursor": cursor_for(items[0], True) if more_before else None,
+    }
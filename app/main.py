@@ -1,8 +1,35 @@
+import asyncio
+import signal
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.database import pool_stats
+from app.core.metrics import MetricsMiddleware, render as render_metrics
 from app.api.v1.router import api_router
+from app.services import warmup
+from app.services.model_registry import model_registry
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop = asyncio.get_running_loop()
+    if settings.WARM_UP_ON_STARTUP:
+        # Loads in the background while /health answers; /health/ready turns 200 when done
+        app.state.warm_up = loop.run_in_executor(None, warmup.run)
+    # SIGHUP re-reads the model settings without a restart
+    reload_signal = getattr(signal, "SIGHUP", None)
+    if reload_signal is not None:
+        try:
+            loop.add_signal_handler(reload_signal, lambda: loop.run_in_executor(None, model_registry.reload))
+        except (NotImplementedError, RuntimeError):
+            # Only the main thread's loop can handle signals
+            reload_signal = None
+    yield
+    if reload_signal is not None:
+        loop.remove_signal_handler(reload_signal)
+
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -10,6 +37,7 @@ app = FastAPI(
     version="0.1.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 
@@ -27,7 +55,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets browsers read the id needed to resume a chat stream
+    expose_headers=["X-Stream-Id"],
 )
+# Outermost, so the recorded latency covers every other middleware
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(api_router, prefix="/api/v1")
 
@@ -35,3 +67,25 @@ app.include_router(api_router, prefix="/api/v1")
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
+
+
+@app.get("/health/ready", responses={503: {"description": "Still warming up, or a component failed to load"}})
+def readiness():
+    """Whether the LLM tokenizers, vector store and embedding model are loaded, per component."""
+    status = warmup.status()
+    if not settings.WARM_UP_ON_STARTUP:
+        # Everything loads on first use instead
+        status["ready"] = True
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/health/db")
+def database_pool_health():
+    """Connection pool occupancy, checkout waits, overflow use and timeouts."""
+    return pool_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics for this process. Runs on the event loop so it can read threadpool occupancy."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -3,7 +3,9 @@ from app.models.models import (
     Conversation,
     Message,
     Branch,
+    Blob,
     File,
+    DocumentChunk,
     MessageFile,
     FileStatus,
     ConversationConfig,
@@ -14,7 +16,9 @@ __all__ = [
     "Conversation",
     "Message",
     "Branch",
+    "Blob",
     "File",
+    "DocumentChunk",
     "MessageFile",
     "FileStatus",
     "ConversationConfig",
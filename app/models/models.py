@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, JSON, Enum, Index, Float
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, Boolean, Text, ForeignKey, JSON, Enum, Index, Float
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 import enum
 from app.core.database import Base
 
@@ -12,6 +12,12 @@ class FileStatus(enum.Enum):
     FAILED = "failed"
 
 
+class VectorTenantState(enum.Enum):
+    COPYING = "copying"  # points are being copied; writes go to both collections
+    DEDICATED = "dedicated"  # served from its own collection; shared copies not yet purged
+    PURGED = "purged"  # shared copies deleted
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -48,7 +54,7 @@ class Conversation(Base):
     extra_metadata = Column(JSON, default={})
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
     # Relationships
     user = relationship("User", back_populates="conversations")
@@ -56,6 +62,10 @@ class Conversation(Base):
     branches = relationship("Branch", back_populates="conversation", cascade="all, delete-orphan")
     config = relationship("ConversationConfig", back_populates="conversation", uselist=False, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index('ix_conversations_user_updated', 'user_id', 'updated_at', 'id'),
+    )
+
 
 class Message(Base):
     __tablename__ = "messages"
@@ -73,6 +83,7 @@ class Message(Base):
     prompt_tokens = Column(Integer, default=0)
     completion_tokens = Column(Integer, default=0)
     total_tokens = Column(Integer, default=0)
+    token_counts = Column(JSON, default={})  # model -> context token count
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -81,6 +92,11 @@ class Message(Base):
     branch = relationship("Branch", back_populates="messages")
     file_attachments = relationship("MessageFile", back_populates="message", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index('ix_messages_conversation_created', 'conversation_id', 'created_at', 'id'),
+        Index('ix_messages_branch_created', 'branch_id', 'created_at', 'id'),
+    )
+
 
 class Branch(Base):
     __tablename__ = "branches"
@@ -102,6 +118,23 @@ class Branch(Base):
     )
 
 
+class Blob(Base):
+    """Content-addressed file bytes shared by every upload of the same content."""
+    __tablename__ = "blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), unique=True, index=True, nullable=False)  # sha256
+    file_path = Column(String, nullable=False)
+    file_size = Column(BigInteger, nullable=False)
+    extracted_text = Column(Text, nullable=True)
+    ref_count = Column(Integer, default=0, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    files = relationship("File", back_populates="blob")
+
+
 class File(Base):
     __tablename__ = "files"
 
@@ -111,8 +144,10 @@ class File(Base):
     filename = Column(String, nullable=False)
     original_filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
-    file_size = Column(Integer, nullable=False)
+    file_size = Column(BigInteger, nullable=False)
     mime_type = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)  # sha256 of the file bytes
+    blob_id = Column(Integer, ForeignKey("blobs.id"), nullable=True)
 
     # Processing status
     status = Column(Enum(FileStatus), default=FileStatus.PENDING, nullable=False)
@@ -123,8 +158,72 @@ class File(Base):
 
     # Relationships
     user = relationship("User", back_populates="files")
+    blob = relationship("Blob", back_populates="files", lazy="joined")
     message_attachments = relationship("MessageFile", back_populates="file", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index('ix_files_user_created', 'user_id', 'created_at', 'id'),
+        Index('ix_files_blob_user', 'blob_id', 'user_id'),
+        # Only the processing backlog, which stays small however many files there are
+        Index(
+            'ix_files_pending', 'created_at', 'id',
+            postgresql_where=text("status = 'PENDING'"),
+            sqlite_where=text("status = 'PENDING'"),
+        ),
+    )
+
+    @property
+    def document_text(self):
+        """Extracted text, shared through the blob for deduplicated files."""
+        if self.blob is not None and self.blob.extracted_text is not None:
+            return self.blob.extracted_text
+        return self.extracted_text
+
+
+class DocumentChunk(Base):
+    """
+    Text of a chunk in the vector store, keyed by its point id, for search results and lexical search.
+
+    On PostgreSQL the content has a full-text GIN index and is stored
+    compressed (see the migrations).
+    """
+    __tablename__ = "document_chunks"
+
+    id = Column(String(36), primary_key=True)  # vector store point id
+    collection_name = Column(String, nullable=False, default="documents")
+    user_id = Column(Integer, nullable=False)
+    file_id = Column(Integer, nullable=True, index=True)
+    blob_id = Column(Integer, nullable=True)
+    chunk_index = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False)
+
+    __table_args__ = (
+        Index('ix_document_chunks_user_collection', 'user_id', 'collection_name'),
+        Index('ix_document_chunks_user_blob', 'user_id', 'blob_id'),
+    )
+
+
+class VectorTenant(Base):
+    """
+    A user whose chunks in a shared vector collection were moved to a collection of their own.
+
+    Users without a row live in the shared collection; see app.services.tenancy.
+    """
+    __tablename__ = "vector_tenants"
+
+    id = Column(Integer, primary_key=True, index=True)
+    collection_name = Column(String, nullable=False)  # the shared collection
+    user_id = Column(Integer, nullable=False)
+    dedicated_collection = Column(String, nullable=False)
+    state = Column(Enum(VectorTenantState), default=VectorTenantState.COPYING, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    promoted_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index('ix_vector_tenants_collection_user', 'collection_name', 'user_id', unique=True),
+    )
+
 
 class MessageFile(Base):
     __tablename__ = "message_files"
@@ -139,6 +238,11 @@ class MessageFile(Base):
     message = relationship("Message", back_populates="file_attachments")
     file = relationship("File", back_populates="message_attachments")
 
+    __table_args__ = (
+        Index('ix_message_files_message_file', 'message_id', 'file_id'),
+        Index('ix_message_files_file_id', 'file_id'),
+    )
+
 
 class ConversationConfig(Base):
     __tablename__ = "conversation_configs"
@@ -151,6 +255,7 @@ class ConversationConfig(Base):
     system_prompt = Column(Text, nullable=True)
     use_rag = Column(Boolean, default=False)
     rag_results = Column(Integer, default=3)
+    use_cache = Column(Boolean, nullable=True)  # response cache for deterministic requests; unset allows it
     extra_metadata = Column(JSON, default={})
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
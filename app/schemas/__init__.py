@@ -35,6 +35,9 @@ from app.schemas.file import (
     FileUpdate,
     FileResponse,
     FileUploadResponse,
+    FileProcessingStatus,
+    UploadSessionCreate,
+    UploadSessionResponse,
 )
 from app.schemas.config import (
     ConfigBase,
@@ -42,7 +45,7 @@ from app.schemas.config import (
     ConfigUpdate,
     ConfigResponse,
 )
-from app.schemas.common import PaginatedResponse
+from app.schemas.common import CursorPage, PaginatedResponse
 
 # Resolve forward references
 ConversationWithMessages.model_rebuild()
@@ -83,6 +86,9 @@ __all__ = [
     "FileUpdate",
     "FileResponse",
     "FileUploadResponse",
+    "FileProcessingStatus",
+    "UploadSessionCreate",
+    "UploadSessionResponse",
     # Config
     "ConfigBase",
     "ConfigCreate",
@@ -90,4 +96,5 @@ __all__ = [
     "ConfigResponse",
     # Common
     "PaginatedResponse",
+    "CursorPage",
 ]
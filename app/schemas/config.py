@@ -10,6 +10,7 @@ class ConfigBase(BaseModel):
     system_prompt: Optional[str] = None
     use_rag: Optional[bool] = None
     rag_results: Optional[int] = None
+    use_cache: Optional[bool] = None
 
 
 class ConfigCreate(ConfigBase):
@@ -1,6 +1,6 @@
 from typing import Optional
 from datetime import datetime
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from app.models.models import FileStatus
 
 
@@ -14,6 +14,8 @@ class FileCreate(FileBase):
     file_path: str
     file_size: int
     user_id: int
+    content_hash: Optional[str] = None
+    blob_id: Optional[int] = None
 
 
 class FileUpdate(BaseModel):
@@ -27,8 +29,9 @@ class FileResponse(FileBase):
     user_id: int
     file_path: str
     file_size: int
+    content_hash: Optional[str] = None
     status: FileStatus
-    extracted_text: Optional[str] = None
+    extracted_text: Optional[str] = Field(default=None, validation_alias="document_text")
     extra_metadata: Optional[dict] = {}
     created_at: datetime
 
@@ -44,3 +47,30 @@ class FileUploadResponse(BaseModel):
     status: FileStatus
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class UploadSessionCreate(BaseModel):
+    """Start a resumable upload"""
+    filename: str
+    mime_type: str
+    size: int = Field(gt=0)
+
+
+class UploadSessionResponse(BaseModel):
+    """State of a resumable upload"""
+    upload_id: str
+    filename: str
+    mime_type: str
+    size: int
+    offset: int
+    chunk_size: int
+
+
+class FileProcessingStatus(BaseModel):
+    """Processing status of a file and its background job"""
+    id: int
+    status: FileStatus
+    task_id: Optional[str] = None
+    task_state: Optional[str] = None
+    chunks_indexed: Optional[int] = None
+    error: Optional[str] = None
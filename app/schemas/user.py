@@ -31,6 +31,12 @@ class UserResponse(UserBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class UserSnapshot(UserResponse):
+    """Immutable copy of the authenticated user, safe to cache between requests."""
+
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
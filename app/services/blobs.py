@@ -0,0 +1,62 @@
+import os
+from sqlalchemy.orm import Session
+from app.crud import blob as crud_blob
+from app.crud import file as crud_file
+from app.models.models import Blob, File
+from app.services.rag import delete_document, reassign_document
+from app.services.storage import blob_path
+
+
+def store_blob(db: Session, *, upload_path: str, content_hash: str, file_size: int) -> Blob:
+    """
+    Take a reference on the blob for some uploaded bytes.
+
+    If the content is already stored, the new copy is discarded and the existing
+    blob is shared; otherwise the upload is moved into content-addressed storage.
+    """
+    while True:
+        blob = crud_blob.get_by_hash(db, content_hash=content_hash)
+        if blob and crud_blob.acquire(db, blob=blob):
+            if os.path.exists(upload_path):
+                os.remove(upload_path)
+            return blob
+
+        path = blob_path(content_hash)
+        if os.path.exists(upload_path):
+            os.replace(upload_path, path)
+        blob = crud_blob.create_referenced(db, content_hash=content_hash, file_path=path, file_size=file_size)
+        if blob:
+            return blob
+        # Lost a race with a concurrent upload of the same bytes; share theirs
+
+
+def delete_file(db: Session, file: File) -> None:
+    """Delete a file, removing its vector chunks and bytes once nothing else references them."""
+    if file.blob_id is None:
+        delete_document(file.id, user_id=file.user_id)
+        if os.path.exists(file.file_path):
+            os.remove(file.file_path)
+        crud_file.remove(db, id=file.id)
+        return
+
+    file_id, blob_id, user_id, path = file.id, file.blob_id, file.user_id, file.blob.file_path
+
+    # Chunks are shared by all of a user's copies of the same content, under
+    # the file_id of the one indexed first
+    other = crud_file.get_other_user_blob_file(db, user_id=user_id, blob_id=blob_id, exclude_id=file_id)
+    if other is None:
+        delete_document(user_id=user_id, blob_id=blob_id)
+    else:
+        reassign_document(file_id, other.id, user_id=user_id, blob_id=blob_id)
+
+    crud_file.remove(db, id=file_id)
+    try:
+        # Remove the bytes before the row's deletion commits: until then the row
+        # is locked, so a concurrent upload of the same content either took its
+        # reference first or waits and then stores its own copy at this path
+        if crud_blob.release(db, blob_id=blob_id, commit=False) and os.path.exists(path):
+            os.remove(path)
+    except BaseException:
+        db.rollback()
+        raise
+    db.commit()
@@ -0,0 +1,177 @@
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+from app.core.config import settings
+
+# Page breaks are marked with form feeds by the extractors
+PAGE_BREAK = "\f"
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\S+")
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model_name: str):
+    """The embedding model's tokenizer, without padding or truncation."""
+    from tokenizers import Tokenizer
+    tokenizer = Tokenizer.from_pretrained(model_name)
+    tokenizer.no_padding()
+    tokenizer.no_truncation()
+    return tokenizer
+
+
+def chunk_text(
+    text: str,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+    chunker: Optional[str] = None,
+) -> List[Dict]:
+    """
+    Split text into chunks for embedding with the configured chunker.
+
+    Each chunk is a dict with text, start and end character offsets into the
+    original text, and page (1-based, None if the text has no page breaks).
+    """
+    if not text or not text.strip():
+        return []
+    split = CHUNKERS[chunker or settings.CHUNKER]
+    return split(
+        text,
+        chunk_size if chunk_size is not None else settings.CHUNK_SIZE,
+        chunk_overlap if chunk_overlap is not None else settings.CHUNK_OVERLAP,
+    )
+
+
+def chunk_by_tokens(text: str, chunk_size: int, overlap: int) -> List[Dict]:
+    """
+    Pack whole paragraphs into chunks of at most chunk_size embedding tokens.
+
+    Chunks never cross a page. Paragraphs too long for one chunk are split into
+    sentences, and sentences that are still too long are cut at token
+    boundaries. Consecutive chunks share trailing sentences or paragraphs
+    totalling at most overlap tokens.
+    """
+    tokenizer = get_tokenizer(settings.EMBEDDING_MODEL)
+    limit = min(chunk_size, settings.EMBEDDING_MAX_TOKENS - tokenizer.num_special_tokens_to_add(False))
+    paged = PAGE_BREAK in text
+
+    paragraphs = []
+    page_start = 0
+    for page, page_text in enumerate(text.split(PAGE_BREAK), 1):
+        page_end = page_start + len(page_text)
+        for start, end in _spans(text, page_start, page_end, _PARAGRAPH_BREAK):
+            paragraphs.append((start, end, page if paged else None))
+        page_start = page_end + len(PAGE_BREAK)
+
+    # Encode every paragraph in one call; the Rust tokenizer batches in parallel
+    encodings = tokenizer.encode_batch(
+        [text[start:end] for start, end, _ in paragraphs], add_special_tokens=False
+    )
+
+    # Paragraphs too long for one chunk are split into sentences, also encoded together
+    long_paragraphs = {
+        i: _spans(text, start, end, _SENTENCE_END)
+        for i, ((start, end, _), encoding) in enumerate(zip(paragraphs, encodings))
+        if len(encoding.ids) > limit
+    }
+    sentence_encodings = iter(tokenizer.encode_batch(
+        [text[start:end] for spans in long_paragraphs.values() for start, end in spans],
+        add_special_tokens=False,
+    ))
+
+    # (start, end, tokens, page) pieces that each fit in a chunk
+    pieces = []
+    for i, ((start, end, page), encoding) in enumerate(zip(paragraphs, encodings)):
+        if i not in long_paragraphs:
+            pieces.append((start, end, len(encoding.ids), page))
+            continue
+        for s_start, s_end in long_paragraphs[i]:
+            sentence = next(sentence_encodings)
+            if len(sentence.ids) <= limit:
+                pieces.append((s_start, s_end, len(sentence.ids), page))
+                continue
+            # Cut at the last word boundary that fits, so each cut re-tokenizes
+            # to the same tokens
+            offsets, word_ids = sentence.offsets, sentence.word_ids
+            j = 0
+            while j < len(offsets):
+                k = min(j + limit, len(offsets))
+                cut = k
+                while j < cut < len(offsets) and word_ids[cut] is not None and word_ids[cut] == word_ids[cut - 1]:
+                    cut -= 1
+                k = cut if cut > j else k
+                pieces.append((s_start + offsets[j][0], s_start + offsets[k - 1][1], k - j, page))
+                j = k
+
+    chunks = []
+    current: List[Tuple[int, int, int, Optional[int]]] = []
+    current_tokens = 0
+    for piece in pieces:
+        if current and (piece[3] != current[-1][3] or current_tokens + piece[2] > limit):
+            chunks.append(_token_chunk(text, current, current_tokens))
+            tail = []
+            tail_tokens = 0
+            if piece[3] == current[-1][3]:
+                for prev in reversed(current):
+                    if tail_tokens + prev[2] > overlap or tail_tokens + prev[2] + piece[2] > limit:
+                        break
+                    tail.insert(0, prev)
+                    tail_tokens += prev[2]
+            current, current_tokens = tail, tail_tokens
+        current.append(piece)
+        current_tokens += piece[2]
+    if current:
+        chunks.append(_token_chunk(text, current, current_tokens))
+    return chunks
+
+
+def chunk_by_words(text: str, chunk_size: int, overlap: int) -> List[Dict]:
+    """Fixed windows of chunk_size whitespace-separated words, ignoring structure."""
+    words = [(m.start(), m.end()) for m in _WORD.finditer(text)]
+    page_breaks = [m.start() for m in re.finditer(PAGE_BREAK, text)]
+    chunks = []
+    start = 0
+    while start < len(words):
+        window = words[start:start + chunk_size]
+        chunk_start, chunk_end = window[0][0], window[-1][1]
+        chunks.append({
+            "text": " ".join(text[s:e] for s, e in window),
+            "start": chunk_start,
+            "end": chunk_end,
+            "page": bisect_right(page_breaks, chunk_start) + 1 if page_breaks else None,
+        })
+        start += chunk_size - overlap
+    return chunks
+
+
+CHUNKERS: Dict[str, Callable[[str, int, int], List[Dict]]] = {
+    "tokens": chunk_by_tokens,
+    "words": chunk_by_words,
+}
+
+
+def _spans(text: str, start: int, end: int, separator: re.Pattern) -> List[Tuple[int, int]]:
+    """Non-empty spans of text[start:end] between separators, trimmed of whitespace."""
+    spans = []
+    pos = start
+    for match in separator.finditer(text, start, end):
+        spans.append((pos, match.start()))
+        pos = match.end()
+    spans.append((pos, end))
+
+    trimmed = []
+    for s, e in spans:
+        while s < e and text[s].isspace():
+            s += 1
+        while e > s and text[e - 1].isspace():
+            e -= 1
+        if s < e:
+            trimmed.append((s, e))
+    return trimmed
+
+
+def _token_chunk(text: str, pieces: List[Tuple[int, int, int, Optional[int]]], tokens: int) -> Dict:
+    start, end = pieces[0][0], pieces[-1][1]
+    return {"text": text[start:end], "start": start, "end": end, "page": pieces[0][3], "tokens": tokens}
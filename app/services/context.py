@@ -1,13 +1,64 @@
-from typing import Dict, List, Optional
-from app.services.llm import count_tokens, get_model_info
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.core.config import settings
+from app.core.metrics import context_build_duration_seconds
+from app.models.models import Message
+from app.services.llm import count_message_tokens
+from app.services.model_registry import model_registry
 
 
-def build_context(
+def context_token_budget(model: Optional[str] = None, max_context_ratio: float = 0.75) -> int:
+    """Number of input tokens available for the context of a model."""
+    return int(model_registry.get(model).max_input_tokens * max_context_ratio)
+
+
+def message_token_count(msg: Message, model: Optional[str] = None) -> int:
+    """Token count of a message for a model, computed once and stored on the message."""
+    model_key = model or settings.DEFAULT_MODEL
+    counts = msg.token_counts or {}
+    tokens = counts.get(model_key)
+    if tokens is None:
+        tokens = count_message_tokens({"role": msg.role, "content": msg.content}, model=model_key)
+        # Reassign so SQLAlchemy detects the JSON change
+        msg.token_counts = {**counts, model_key: tokens}
+    return tokens
+
+
+def load_history(
+    db_messages: Sequence[Message],
+    model: Optional[str] = None,
+    token_budget: Optional[int] = None,
+) -> Tuple[List[Dict[str, str]], List[int]]:
+    """
+    Convert stored messages to LLM format along with their token counts.
+
+    Counts persisted on each message are reused; missing ones are computed once
+    and written back to the message so later turns only tokenize new messages.
+    With token_budget, only the newest messages that can fit are loaded.
+    """
+    raw_messages = []
+    token_counts = []
+    used_tokens = 0
+    for msg in reversed(db_messages):
+        raw = {"role": msg.role, "content": msg.content}
+        tokens = message_token_count(msg, model)
+        used_tokens += tokens
+        if token_budget is not None and used_tokens > token_budget:
+            break
+        raw_messages.append(raw)
+        token_counts.append(tokens)
+    raw_messages.reverse()
+    token_counts.reverse()
+    return raw_messages, token_counts
+
+
+def build_context_with_usage(
     messages: List[Dict[str, str]],
     system_prompt: Optional[str] = None,
     model: Optional[str] = None,
     max_context_ratio: float = 0.75,
-) -> List[Dict[str, str]]:
+    token_counts: Optional[Sequence[Optional[int]]] = None,
+) -> Tuple[List[Dict[str, str]], int]:
     """
     Build a context window that fits within the model's token limit.
 
@@ -15,10 +66,12 @@ def build_context(
     - Most recent messages are prioritized
     - Older messages are dropped first
     - max_context_ratio reserves space for the response (default 75% for input)
+    - token_counts optionally supplies precomputed per-message counts
+
+    Returns the context and the number of input tokens it uses.
     """
-    model_info = get_model_info(model)
-    max_input = model_info.get("max_input_tokens") or model_info.get("max_tokens") or 8192
-    token_budget = int(max_input * max_context_ratio)
+    start = time.perf_counter()
+    token_budget = context_token_budget(model, max_context_ratio)
 
     context = []
     used_tokens = 0
@@ -26,17 +79,19 @@ def build_context(
     # System prompt always goes first
     if system_prompt:
         system_msg = {"role": "system", "content": system_prompt}
-        system_tokens = count_tokens([system_msg], model=model)
+        system_tokens = count_message_tokens(system_msg, model=model)
         context.append(system_msg)
         used_tokens += system_tokens
         token_budget -= system_tokens
 
     # Walk messages from newest to oldest
-    reversed_messages = list(reversed(messages))
     kept = []
 
-    for msg in reversed_messages:
-        msg_tokens = count_tokens([msg], model=model)
+    for i in range(len(messages) - 1, -1, -1):
+        msg = messages[i]
+        msg_tokens = token_counts[i] if token_counts is not None else None
+        if msg_tokens is None:
+            msg_tokens = count_message_tokens(msg, model=model)
         if used_tokens + msg_tokens > token_budget:
             break
         kept.append(msg)
@@ -46,6 +101,25 @@ def build_context(
     kept.reverse()
     context.extend(kept)
 
+    context_build_duration_seconds.observe(time.perf_counter() - start)
+    return context, used_tokens
+
+
+def build_context(
+    messages: List[Dict[str, str]],
+    system_prompt: Optional[str] = None,
+    model: Optional[str] = None,
+    max_context_ratio: float = 0.75,
+    token_counts: Optional[Sequence[Optional[int]]] = None,
+) -> List[Dict[str, str]]:
+    """Build a context window that fits within the model's token limit."""
+    context, _ = build_context_with_usage(
+        messages,
+        system_prompt=system_prompt,
+        model=model,
+        max_context_ratio=max_context_ratio,
+        token_counts=token_counts,
+    )
     return context
 
 
@@ -55,9 +129,9 @@ def estimate_cost(
     model: Optional[str] = None,
 ) -> Dict[str, float]:
     """Estimate the cost of a request."""
-    model_info = get_model_info(model)
-    input_cost = model_info.get("input_cost_per_token") or 0
-    output_cost = model_info.get("output_cost_per_token") or 0
+    model_info = model_registry.get(model)
+    input_cost = model_info.input_cost_per_token
+    output_cost = model_info.output_cost_per_token
 
     return {
         "prompt_tokens": prompt_tokens,
@@ -1,41 +1,143 @@
 import os
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.metrics import ingest_stage_duration_seconds
 from app.models.models import File, FileStatus
 from app.crud import file as crud_file
 from app.schemas.file import FileUpdate
-from app.services.rag import add_document
+from app.services.chunking import PAGE_BREAK
+from app.services.rag import add_documents, copy_blob_chunks, count_blob_chunks
+
+
+_extract_seconds = ingest_stage_duration_seconds.labels("extract")
 
 
 def process_file(db: Session, file_id: int) -> Optional[File]:
     """Process a file and extract text content."""
-    file = crud_file.get(db, id=file_id)
-    if not file:
-        return None
+    return process_files(db, [file_id])[0]
 
-    # Mark as processing
-    crud_file.update(db, db_obj=file, obj_in=FileUpdate(status=FileStatus.PROCESSING))
 
-    try:
-        text = _extract_text(file.file_path, file.mime_type)
+def process_files(db: Session, file_ids: List[int]) -> List[Optional[File]]:
+    """
+    Extract and index several files, embedding all of their new chunks together.
 
-        # Index in vector store for RAG
-        chunks_added = 0
-        if text and not file.mime_type.startswith("image/"):
-            chunks_added = add_document(text=text, file_id=file.id, user_id=file.user_id)
+    Returns the updated files in the order given, None for ids that don't exist.
+    A file that fails to extract is marked failed without affecting the others.
+    """
+    files = [crud_file.get(db, id=file_id) for file_id in file_ids]
+    found = [file for file in files if file]
 
-        crud_file.update(db, db_obj=file, obj_in=FileUpdate(
-            status=FileStatus.COMPLETED,
-            extracted_text=text,
-            extra_metadata={"chunks_indexed": chunks_added},
-        ))
-    except Exception as e:
-        crud_file.update(db, db_obj=file, obj_in=FileUpdate(
-            status=FileStatus.FAILED,
-            extra_metadata={"error": str(e)},
-        ))
-
-    return crud_file.get(db, id=file_id)
+    # Mark as processing
+    for file in found:
+        crud_file.update(db, db_obj=file, obj_in=FileUpdate(status=FileStatus.PROCESSING))
+
+    texts: Dict[int, Optional[str]] = {}
+    chunks_indexed: Dict[int, int] = {}
+    documents: List[Dict] = []
+    document_files: List[List[File]] = []
+    # Files of one user with the same content share a single indexed document
+    scheduled: Dict[Tuple[int, int], int] = {}
+
+    for file in found:
+        try:
+            text, chunks = _prepare_file(db, file)
+        except Exception as e:
+            _mark_failed(db, file, e)
+            continue
+        texts[file.id] = text
+        if chunks is not None:
+            chunks_indexed[file.id] = chunks
+            continue
+
+        key = (file.user_id, file.blob_id)
+        if file.blob_id and key in scheduled:
+            document_files[scheduled[key]].append(file)
+            continue
+        if file.blob_id:
+            scheduled[key] = len(documents)
+        documents.append({"text": text, "file_id": file.id, "user_id": file.user_id, "blob_id": file.blob_id})
+        document_files.append([file])
+
+    # Index in vector store for RAG
+    if documents:
+        try:
+            counts = add_documents(documents)
+        except Exception as e:
+            for group in document_files:
+                for file in group:
+                    _mark_failed(db, file, e)
+        else:
+            for group, count in zip(document_files, counts):
+                for file in group:
+                    chunks_indexed[file.id] = count
+
+    for file in found:
+        if file.id not in chunks_indexed:
+            continue
+        try:
+            metadata = {k: v for k, v in (file.extra_metadata or {}).items() if k != "error"}
+            crud_file.update(db, db_obj=file, obj_in=FileUpdate(
+                status=FileStatus.COMPLETED,
+                # Deduplicated files keep their text on the shared blob
+                extracted_text=None if file.blob_id else texts[file.id],
+                extra_metadata={**metadata, "chunks_indexed": chunks_indexed[file.id]},
+            ))
+        except Exception as e:
+            _mark_failed(db, file, e)
+
+    return [crud_file.get(db, id=file.id) if file else None for file in files]
+
+
+def _mark_failed(db: Session, file: File, error: Exception) -> None:
+    db.rollback()
+    metadata = {k: v for k, v in (file.extra_metadata or {}).items() if k != "chunks_indexed"}
+    crud_file.update(db, db_obj=file, obj_in=FileUpdate(
+        status=FileStatus.FAILED,
+        extra_metadata={**metadata, "error": str(error)},
+    ))
+
+
+def _prepare_file(db: Session, file: File) -> Tuple[str, Optional[int]]:
+    """
+    Extract a file's text and reuse any chunks already indexed for it.
+
+    Returns (text, chunks), where chunks is None if the text still needs embedding.
+    """
+    if file.blob is None:
+        with _extract_seconds.time():
+            text = _extract_text(file.file_path, file.mime_type)
+        if not text or file.mime_type.startswith("image/"):
+            return text, 0
+        return text, None
+
+    # Text is extracted once per blob. Chunks are indexed once per user and
+    # blob; another user's chunks are copied with their vectors rather than
+    # re-embedded.
+    blob = file.blob
+    text = blob.extracted_text
+    if text is None:
+        with _extract_seconds.time():
+            text = _extract_text(blob.file_path, file.mime_type)
+        blob.extracted_text = text
+        db.commit()
+
+    if not text or file.mime_type.startswith("image/"):
+        return text, 0
+
+    # Chunks are only reused once a file marked them complete; a failed or
+    # retried run may have left some of them, which re-indexing overwrites
+    if crud_file.get_indexed_by_blob(db, blob_id=blob.id, user_id=file.user_id):
+        return text, count_blob_chunks(blob.id, file.user_id)
+
+    indexed = crud_file.get_indexed_by_blob(db, blob_id=blob.id, exclude_user_id=file.user_id)
+    if indexed:
+        with ingest_stage_duration_seconds.labels("copy").time():
+            copied = copy_blob_chunks(blob.id, indexed.user_id, file.user_id, file_id=file.id)
+        if copied:
+            return text, copied
+
+    return text, None
 
 
 def _extract_text(file_path: str, mime_type: str) -> str:
@@ -62,11 +164,11 @@ def _extract_text(file_path: str, mime_type: str) -> str:
 def _extract_pdf(file_path: str) -> str:
     import fitz  # PyMuPDF
     doc = fitz.open(file_path)
-    text = ""
-    for page in doc:
-        text += page.get_text()
+    # Keep page breaks so chunks can record their page; only trim around the
+    # whole text so leading empty pages still count
+    text = PAGE_BREAK.join(page.get_text() for page in doc)
     doc.close()
-    return text.strip()
+    return text.lstrip(" \t\r\n").rstrip()
 
 
 def _extract_docx(file_path: str) -> str:
@@ -95,11 +197,7 @@ def _extract_image_metadata(file_path: str) -> str:
     return str(info)
 
 
-def process_pending_files(db: Session, limit: int = 10) -> list:
-    """Process all pending files."""
-    pending = crud_file.get_pending(db, limit=limit)
-    results = []
-    for file in pending:
-        result = process_file(db, file.id)
-        results.append(result)
-    return results
+def process_pending_files(db: Session, limit: Optional[int] = None) -> list:
+    """Process pending files as one batch."""
+    pending = crud_file.get_pending(db, limit=limit or settings.FILE_PROCESSING_BATCH_SIZE)
+    return process_files(db, [file.id for file in pending])
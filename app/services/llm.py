@@ -1,9 +1,82 @@
-from typing import Any, Dict, List, Optional, Generator
-import litellm
+import hashlib
+import time
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Dict, List, Optional, Generator
+from app.core.cache import LRUCache
 from app.core.config import settings
+from app.core.metrics import (
+    llm_cache_requests_total,
+    llm_errors_total,
+    llm_output_tokens_per_second,
+    llm_request_duration_seconds,
+    llm_time_to_first_token_seconds,
+    token_count_duration_seconds,
+)
+from app.services.llm_cache import cache_key, response_cache
+from app.services.model_registry import model_registry
 
-# Suppress LiteLLM debug logs
-litellm.set_verbose = False
+
+@lru_cache(maxsize=None)
+def _litellm():
+    """LiteLLM, imported on first use because the import alone takes seconds."""
+    import litellm
+
+    # Suppress LiteLLM debug logs
+    litellm.set_verbose = False
+    return litellm
+
+
+# Per-message token counts keyed by (model, content hash)
+_token_cache = LRUCache(maxsize=settings.TOKEN_CACHE_SIZE)
+
+_count_messages_seconds = token_count_duration_seconds.labels("messages")
+_count_message_seconds = token_count_duration_seconds.labels("message")
+
+# Characters per chunk when replaying a cached reply as a stream
+_REPLAY_CHUNK_SIZE = 64
+
+
+def _response_cache_key(model: str, messages, temperature: float, max_tokens: Optional[int], kwargs) -> Optional[str]:
+    """Response cache key for a request the cache may answer, or None."""
+    if response_cache is None or temperature > settings.LLM_CACHE_MAX_TEMPERATURE:
+        return None
+    return cache_key({
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        **kwargs,
+    })
+
+
+def _cache_entry(response: Any) -> Optional[Dict[str, Any]]:
+    """What the cache keeps of a response; None for tool calls, which it doesn't replay."""
+    choice = response.choices[0]
+    if not isinstance(choice.message.content, str) or getattr(choice.message, "tool_calls", None):
+        return None
+    usage = getattr(response, "usage", None)
+    return {
+        "content": choice.message.content,
+        "finish_reason": choice.finish_reason,
+        "usage": {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+        if usage else None,
+    }
+
+
+def _cached_response(model: str, entry: Dict[str, Any]) -> Any:
+    usage = entry["usage"] or {"prompt_tokens": 0, "completion_tokens": 0}
+    response = _litellm().ModelResponse(
+        model=model,
+        choices=[{
+            "index": 0,
+            "message": {"role": "assistant", "content": entry["content"]},
+            "finish_reason": entry["finish_reason"],
+        }],
+        usage={**usage, "total_tokens": usage["prompt_tokens"] + usage["completion_tokens"]},
+    )
+    # Where LiteLLM's own caching reports hits
+    response._hidden_params["cache_hit"] = True
+    return response
 
 
 def chat_completion(
@@ -12,9 +85,14 @@ def chat_completion(
     temperature: float = 0.7,
     max_tokens: Optional[int] = None,
     stream: bool = False,
+    cache: bool = False,
     **kwargs,
 ) -> Any:
-    """Send a chat completion request through LiteLLM."""
+    """
+    Send a chat completion request through LiteLLM.
+
+    With cache, a deterministic request may be answered from the response cache.
+    """
     model = model or settings.DEFAULT_MODEL
 
     params = {
@@ -28,7 +106,16 @@ def chat_completion(
     if max_tokens:
         params["max_tokens"] = max_tokens
 
-    response = litellm.completion(**params)
+    key = None if stream or not cache else _response_cache_key(model, messages, temperature, max_tokens, kwargs)
+    if key is not None:
+        entry = response_cache.get(key)
+        llm_cache_requests_total.labels(model, "miss" if entry is None else "hit").inc()
+        if entry is not None:
+            return _cached_response(model, entry)
+
+    response = _litellm().completion(**params)
+    if key is not None and (entry := _cache_entry(response)) is not None:
+        response_cache.set(key, entry)
     return response
 
 
@@ -42,7 +129,7 @@ def chat_completion_stream(
     """Stream a chat completion response."""
     model = model or settings.DEFAULT_MODEL
 
-    response = litellm.completion(
+    response = _litellm().completion(
         model=model,
         messages=messages,
         temperature=temperature,
@@ -57,24 +144,178 @@ def chat_completion_stream(
             yield delta.content
 
 
-def count_tokens(messages: List[Dict[str, str]], model: Optional[str] = None) -> int:
-    """Count tokens for a list of messages."""
+async def achat_completion(
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    temperature: float = 0.7,
+    max_tokens: Optional[int] = None,
+    stream: bool = False,
+    cache: bool = False,
+    **kwargs,
+) -> Any:
+    """
+    Send a chat completion request through LiteLLM without blocking the event loop.
+
+    With cache, a deterministic request may be answered from the response cache.
+    """
     model = model or settings.DEFAULT_MODEL
-    return litellm.token_counter(model=model, messages=messages)
 
+    params = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "stream": stream,
+        **kwargs,
+    }
 
-def get_model_info(model: Optional[str] = None) -> Dict[str, Any]:
-    """Get model metadata (context window, costs, etc.)."""
+    if max_tokens:
+        params["max_tokens"] = max_tokens
+
+    key = None if stream or not cache else _response_cache_key(model, messages, temperature, max_tokens, kwargs)
+    if key is not None:
+        entry = await response_cache.aget(key)
+        llm_cache_requests_total.labels(model, "miss" if entry is None else "hit").inc()
+        if entry is not None:
+            return _cached_response(model, entry)
+
+    start = time.perf_counter()
+    try:
+        response = await _litellm().acompletion(**params)
+    except Exception:
+        llm_errors_total.labels(model).inc()
+        raise
+    if not stream:
+        elapsed = time.perf_counter() - start
+        llm_request_duration_seconds.labels(model, "false").observe(elapsed)
+        usage = getattr(response, "usage", None)
+        if usage and usage.completion_tokens:
+            llm_output_tokens_per_second.labels(model).observe(usage.completion_tokens / elapsed)
+    if key is not None and (entry := _cache_entry(response)) is not None:
+        await response_cache.aset(key, entry)
+    return response
+
+
+async def achat_completion_stream(
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    temperature: float = 1.0,
+    max_tokens: Optional[int] = None,
+    usage: Optional[Dict[str, int]] = None,
+    cache: bool = False,
+    **kwargs,
+) -> AsyncGenerator[str, None]:
+    """
+    Stream a chat completion response without blocking the event loop.
+
+    Pass a dict as usage to receive prompt_tokens and completion_tokens from
+    the provider's final usage chunk; it is left empty if none was reported.
+    With cache, a deterministic request may be replayed from the response
+    cache, and a completed stream is stored in it.
+    """
     model = model or settings.DEFAULT_MODEL
+
+    key = None if not cache else _response_cache_key(model, messages, temperature, max_tokens, kwargs)
+    if key is not None:
+        entry = await response_cache.aget(key)
+        llm_cache_requests_total.labels(model, "miss" if entry is None else "hit").inc()
+        if entry is not None:
+            if entry["usage"] and usage is not None:
+                usage.update(entry["usage"])
+            content = entry["content"]
+            for i in range(0, len(content), _REPLAY_CHUNK_SIZE):
+                yield content[i:i + _REPLAY_CHUNK_SIZE]
+            return
+
+    start = time.perf_counter()
+    first_token_at = None
+    chunks = 0
+    parts = []
+    finish_reason = None
+    reported = None
     try:
-        info = litellm.get_model_info(model)
-        return {
-            "model": model,
-            "max_tokens": info.get("max_tokens"),
-            "max_input_tokens": info.get("max_input_tokens"),
-            "max_output_tokens": info.get("max_output_tokens"),
-            "input_cost_per_token": info.get("input_cost_per_token"),
-            "output_cost_per_token": info.get("output_cost_per_token"),
-        }
+        response = await _litellm().acompletion(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+            **kwargs,
+        )
+
+        async for chunk in response:
+            # The usage chunk comes last, usually without choices
+            chunk_usage = getattr(chunk, "usage", None)
+            if chunk_usage and chunk_usage.completion_tokens:
+                reported = chunk_usage
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            delta = chunk.choices[0].delta
+            if delta.content:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    llm_time_to_first_token_seconds.labels(model).observe(first_token_at - start)
+                chunks += 1
+                if key is not None:
+                    parts.append(delta.content)
+                yield delta.content
     except Exception:
-        return {"model": model, "error": "Model info not available"}
+        llm_errors_total.labels(model).inc()
+        raise
+
+    end = time.perf_counter()
+    llm_request_duration_seconds.labels(model, "true").observe(end - start)
+    if reported is not None and usage is not None:
+        usage["prompt_tokens"] = reported.prompt_tokens or 0
+        usage["completion_tokens"] = reported.completion_tokens
+    # Without reported usage, assume about one token per chunk
+    tokens = reported.completion_tokens if reported is not None else chunks
+    if chunks > 1 and tokens > 1:
+        llm_output_tokens_per_second.labels(model).observe((tokens - 1) / (end - first_token_at))
+    if key is not None:
+        await response_cache.aset(key, {
+            "content": "".join(parts),
+            "finish_reason": finish_reason or "stop",
+            "usage": {"prompt_tokens": reported.prompt_tokens or 0, "completion_tokens": reported.completion_tokens}
+            if reported is not None else None,
+        })
+
+
+def count_tokens(messages: List[Dict[str, str]], model: Optional[str] = None) -> int:
+    """Count tokens for a list of messages."""
+    model = model or settings.DEFAULT_MODEL
+    tokenizer = model_registry.tokenizer(model)
+    with _count_messages_seconds.time():
+        return _litellm().token_counter(model=model, custom_tokenizer=tokenizer, messages=messages)
+
+
+def count_message_tokens(message: Dict[str, str], model: Optional[str] = None) -> int:
+    """Count tokens for a single message, memoized by model and content hash."""
+    model = model or settings.DEFAULT_MODEL
+    digest = hashlib.sha1(
+        f"{message.get('role', '')}\x00{message.get('content') or ''}".encode("utf-8")
+    ).hexdigest()
+    key = (model, digest)
+    tokens = _token_cache.get(key)
+    if tokens is None:
+        tokenizer = model_registry.tokenizer(model)
+        with _count_message_seconds.time():
+            tokens = _litellm().token_counter(model=model, custom_tokenizer=tokenizer, messages=[message])
+        _token_cache.set(key, tokens)
+    return tokens
+
+
+def get_model_info(model: Optional[str] = None) -> Dict[str, Any]:
+    """Get model metadata (context window, costs, etc.) from the model registry."""
+    info = model_registry.get(model)
+    return {
+        "model": info.name,
+        "known": info.known,
+        # LiteLLM's legacy field: the output limit where the provider gives one, else the input limit
+        "max_tokens": info.max_output_tokens or info.max_input_tokens,
+        "max_input_tokens": info.max_input_tokens,
+        "max_output_tokens": info.max_output_tokens,
+        "input_cost_per_token": info.input_cost_per_token,
+        "output_cost_per_token": info.output_cost_per_token,
+    }
@@ -0,0 +1,100 @@
+"""
+Exact-match cache of LLM responses.
+
+Entries are keyed by a hash of everything that shapes the completion (model,
+messages, sampling parameters, tools), so only identical requests share an
+answer. Only deterministic requests are cached; see app.services.llm.
+"""
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+
+def cache_key(params: Dict[str, Any]) -> str:
+    """Canonical hash of completion parameters; key order and 0 vs 0.0 don't matter."""
+    params = {key: value for key, value in params.items() if value is not None}
+    if "temperature" in params:
+        params["temperature"] = float(params["temperature"])
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class MemoryResponseCache:
+    """Responses in an LRU cache in this process."""
+
+    def __init__(self, maxsize: int, ttl: Optional[float]):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._cache.get(key)
+
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        self._cache.set(key, entry)
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._cache.get(key)
+
+    async def aset(self, key: str, entry: Dict[str, Any]) -> None:
+        self._cache.set(key, entry)
+
+
+class RedisResponseCache:
+    """
+    Responses in Redis, shared by every process.
+
+    A Redis error is treated as a miss, so an outage only costs the cache.
+    """
+
+    def __init__(self, url: str, ttl: Optional[float]):
+        import redis
+        import redis.asyncio
+
+        self.ttl = int(ttl) if ttl else None
+        self._errors = (redis.RedisError, OSError)
+        self._redis = redis.Redis.from_url(url)
+        self._aredis = redis.asyncio.Redis.from_url(url)
+
+    @staticmethod
+    def _key(key: str) -> str:
+        return f"llm:response:{key}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = self._redis.get(self._key(key))
+        except self._errors:
+            return None
+        return None if value is None else json.loads(value)
+
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        try:
+            self._redis.set(self._key(key), json.dumps(entry), ex=self.ttl)
+        except self._errors:
+            pass
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = await self._aredis.get(self._key(key))
+        except self._errors:
+            return None
+        return None if value is None else json.loads(value)
+
+    async def aset(self, key: str, entry: Dict[str, Any]) -> None:
+        try:
+            await self._aredis.set(self._key(key), json.dumps(entry), ex=self.ttl)
+        except self._errors:
+            pass
+
+
+def _create_cache():
+    if settings.LLM_CACHE_BACKEND == "memory":
+        return MemoryResponseCache(settings.LLM_CACHE_SIZE, settings.LLM_CACHE_TTL)
+    if settings.LLM_CACHE_BACKEND == "redis":
+        return RedisResponseCache(settings.REDIS_URL, settings.LLM_CACHE_TTL)
+    return None
+
+
+# None unless LLM_CACHE_BACKEND is set
+response_cache = _create_cache()
@@ -0,0 +1,160 @@
+"""
+Model capabilities: context limits, pricing and tokenizers.
+
+The registry is built once from LiteLLM's model map merged with
+MODEL_OVERRIDES, so looking a model up is a dict access instead of a
+litellm.get_model_info call. Names outside the map (provider prefixes,
+aliases) are resolved through LiteLLM on first use and remembered; models
+nobody describes get DEFAULT_CONTEXT_WINDOW and are marked unknown. Model
+names come from requests, so unknown ones are only kept in a bounded LRU.
+HuggingFace tokenizers named in MODEL_OVERRIDES are loaded once per model,
+and warm_up loads them, and LiteLLM's own encoders, ahead of the first
+request. LiteLLM is only imported, and the registry only built, on first
+use.
+"""
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from app.core.cache import LRUCache
+from app.core.config import Settings, settings
+
+UNKNOWN_MODELS_CACHED = 1024
+
+
+class ModelInfo(NamedTuple):
+    name: str
+    max_input_tokens: int
+    max_output_tokens: Optional[int]
+    input_cost_per_token: float
+    output_cost_per_token: float
+    known: bool  # False when neither LiteLLM nor MODEL_OVERRIDES describe the model
+    # token_counter's custom_tokenizer, for overrides naming one; None until first needed
+    tokenizer: Optional[Dict[str, Any]] = None
+
+
+def _model_info(name: str, spec: Optional[Dict[str, Any]]) -> ModelInfo:
+    spec = spec or {}
+    return ModelInfo(
+        name=name,
+        max_input_tokens=spec.get("max_input_tokens") or spec.get("max_tokens") or settings.DEFAULT_CONTEXT_WINDOW,
+        max_output_tokens=spec.get("max_output_tokens"),
+        input_cost_per_token=spec.get("input_cost_per_token") or 0.0,
+        output_cost_per_token=spec.get("output_cost_per_token") or 0.0,
+        known=bool(spec),
+    )
+
+
+class ModelRegistry:
+    """Model capabilities by name. Reads take no lock; writes replace whole entries."""
+
+    def __init__(self):
+        self._models: Optional[Dict[str, ModelInfo]] = None
+        self._overrides: Dict[str, Dict[str, Any]] = {}
+        # Names LiteLLM couldn't resolve, so they aren't looked up on every request
+        self._unknown = LRUCache(maxsize=UNKNOWN_MODELS_CACHED)
+        self._lock = threading.Lock()
+
+    def load(self, overrides: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        """Build the registry from LiteLLM's model map and overrides, replacing it in one step."""
+        import litellm
+
+        overrides = dict(settings.MODEL_OVERRIDES if overrides is None else overrides)
+        models = {
+            name: _model_info(name, spec)
+            for name, spec in litellm.model_cost.items()
+            if name != "sample_spec" and isinstance(spec, dict)
+        }
+        for name, override in overrides.items():
+            models[name] = _model_info(name, {**litellm.model_cost.get(name, {}), **override})
+        with self._lock:
+            # Keep tokenizers already loaded for models whose tokenizer didn't change
+            for name, info in (self._models or {}).items():
+                if info.tokenizer is not None and name in models and (
+                    overrides.get(name, {}).get("tokenizer") == self._overrides.get(name, {}).get("tokenizer")
+                ):
+                    models[name] = models[name]._replace(tokenizer=info.tokenizer)
+            self._models = models
+            self._overrides = overrides
+        # Overrides may describe them now
+        self._unknown.clear()
+
+    def get(self, model: Optional[str] = None) -> ModelInfo:
+        name = model or settings.DEFAULT_MODEL
+        if self._models is None:
+            self.load()
+        info = self._models.get(name) or self._unknown.get(name)
+        if info is None:
+            info = self._resolve(name)
+        return info
+
+    def tokenizer(self, model: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        token_counter's custom_tokenizer for model, loaded on first use.
+
+        None for models whose override names no tokenizer, which token_counter
+        then picks itself.
+        """
+        info = self.get(model)
+        identifier = self._overrides.get(info.name, {}).get("tokenizer")
+        if info.tokenizer is not None or not identifier:
+            return info.tokenizer
+
+        import litellm
+
+        # A HuggingFace repository with a tokenizer.json, for models LiteLLM can't tokenize
+        tokenizer = litellm.create_pretrained_tokenizer(identifier)
+        with self._lock:
+            # Unless a reload replaced the registry with a different tokenizer in between
+            current = self._models.get(info.name)
+            if current is not None and self._overrides.get(info.name, {}).get("tokenizer") == identifier:
+                self._models[info.name] = current._replace(tokenizer=tokenizer)
+        return tokenizer
+
+    def warm_up(self, models: Iterable[str]) -> List[ModelInfo]:
+        """Load the tokenizers of models and count a message with each, so first requests run warm."""
+        import litellm
+
+        warmed = []
+        for name in models:
+            tokenizer = self.tokenizer(name)
+            # The first count builds encoders and caches inside the tokenizer
+            litellm.token_counter(
+                model=name,
+                custom_tokenizer=tokenizer,
+                messages=[{"role": "user", "content": "warm up"}],
+            )
+            warmed.append(self.get(name))
+        return warmed
+
+    def reload(self) -> List[ModelInfo]:
+        """Re-read MODEL_OVERRIDES and MODEL_PRELOAD from the environment and .env, rebuild and warm up."""
+        fresh = Settings()
+        settings.MODEL_OVERRIDES = fresh.MODEL_OVERRIDES
+        settings.MODEL_PRELOAD = fresh.MODEL_PRELOAD
+        self.load()
+        return self.warm_up(preload_models())
+
+    def _resolve(self, name: str) -> ModelInfo:
+        import litellm
+
+        # Names LiteLLM maps onto an entry, e.g. with a provider prefix
+        try:
+            spec = litellm.get_model_info(name)
+        except Exception:
+            spec = None
+        info = _model_info(name, spec)
+        if not info.known:
+            self._unknown.set(name, info)
+            return info
+        with self._lock:
+            self._models[name] = info
+        return info
+
+
+def preload_models() -> List[str]:
+    """Models warmed up at startup: the default model, MODEL_PRELOAD and every overridden model."""
+    names = [settings.DEFAULT_MODEL, *settings.MODEL_PRELOAD, *settings.MODEL_OVERRIDES]
+    return list(dict.fromkeys(name for name in names if name))
+
+
+model_registry = ModelRegistry()
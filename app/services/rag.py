@@ -1,36 +1,255 @@
-from typing import List, Dict
-from qdrant_client import QdrantClient
-from qdrant_client.models import Filter, FieldCondition, MatchValue
+import threading
+import time
+import unicodedata
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple
+from app.core.cache import Generations, LRUCache
 from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import (
+    ingest_stage_duration_seconds,
+    rag_embed_duration_seconds,
+    rag_query_duration_seconds,
+    rag_search_duration_seconds,
+)
+from app.crud import chunk as crud_chunk
+from app.services import tenancy
+from app.services.chunking import chunk_text
+from app.services.vector_store import ScoredPoint, SearchRequest, VectorPoint, get_vector_store
 
-client = QdrantClient(path=settings.VECTOR_DB_PATH)
-client.set_model("sentence-transformers/all-MiniLM-L6-v2")
+if TYPE_CHECKING:
+    from fastembed import TextEmbedding
+
+# fastembed takes seconds to import and the embedding model may have to be
+# downloaded, so, like the vector store, it is loaded on first use (or by
+# app.services.warmup) rather than when the API, a worker or a script
+# imports this module.
+_embedder: Optional["TextEmbedding"] = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder() -> "TextEmbedding":
+    """The embedding model, loaded (and downloaded if needed) on first use."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                from fastembed import TextEmbedding
+
+                _embedder = TextEmbedding(settings.EMBEDDING_MODEL)
+    return _embedder
+
+
+_embedding_cache = LRUCache(
+    maxsize=settings.QUERY_EMBEDDING_CACHE_SIZE, ttl=settings.QUERY_EMBEDDING_CACHE_TTL
+)
+_result_cache = LRUCache(maxsize=settings.RAG_RESULT_CACHE_SIZE, ttl=settings.RAG_RESULT_CACHE_TTL)
+# Bumped whenever a user's documents change, which orphans their cached results
+_user_generations = Generations(maxsize=settings.RAG_RESULT_CACHE_SIZE)
+
+# Chunk point ids are derived from where the chunk sits, so indexing a
+# document again, e.g. when a task is retried, overwrites its chunks
+_CHUNK_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_OID, "conduit.document_chunks")
+
+_vector_search_seconds = rag_search_duration_seconds.labels("vector")
+_lexical_search_seconds = rag_search_duration_seconds.labels("lexical")
 
 
 def add_document(
     text: str,
     file_id: int,
     user_id: int,
-    chunk_size: int = 500,
-    chunk_overlap: int = 50,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
     collection_name: str = "documents",
+    blob_id: Optional[int] = None,
 ) -> int:
     """Chunk text and add to vector store. Returns number of chunks added."""
-    chunks = _chunk_text(text, chunk_size, chunk_overlap)
+    return add_documents(
+        [{"text": text, "file_id": file_id, "user_id": user_id, "blob_id": blob_id}],
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        collection_name=collection_name,
+    )[0]
+
+
+def add_documents(
+    documents: List[Dict],
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+    collection_name: str = "documents",
+    batch_size: Optional[int] = None,
+    parallel: Optional[int] = None,
+) -> List[int]:
+    """
+    Chunk and index many documents at once. Returns the number of chunks per document.
+
+    Each document is a dict with text, file_id, user_id and optionally blob_id.
+    Chunks from all documents are embedded together in batches of batch_size,
+    and each batch is upserted on a background thread while the next one is
+    embedded. With parallel set, FastEmbed embeds on that many worker
+    processes (0 for all cores).
+    """
+    counts = []
+    chunks = []
+    metadata = []
+    with ingest_stage_duration_seconds.labels("chunk").time():
+        for doc in documents:
+            doc_chunks = chunk_text(doc["text"], chunk_size, chunk_overlap)
+            counts.append(len(doc_chunks))
+            chunks.extend(chunk["text"] for chunk in doc_chunks)
+            metadata.extend(
+                {
+                    "file_id": doc["file_id"],
+                    "user_id": doc["user_id"],
+                    "blob_id": doc.get("blob_id"),
+                    "chunk_index": i,
+                    "char_start": chunk["start"],
+                    "char_end": chunk["end"],
+                    "page": chunk["page"],
+                }
+                for i, chunk in enumerate(doc_chunks)
+            )
+
     if not chunks:
-        return 0
+        return counts
 
-    metadata = [
-        {"content": chunk, "file_id": file_id, "user_id": user_id, "chunk_index": i}
-        for i, chunk in enumerate(chunks)
-    ]
+    ids = [_chunk_id(collection_name, meta) for meta in metadata]
+    # Before the vectors, so every point found by a search has its text
+    with ingest_stage_duration_seconds.labels("lexical_index").time():
+        _index_text(collection_name, ids, metadata, chunks)
 
-    client.add(
-        collection_name=collection_name,
-        documents=chunks,
-        metadata=metadata,
+    batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+    vectors = get_embedder().passage_embed(
+        chunks,
+        batch_size=batch_size,
+        parallel=parallel if parallel is not None else settings.EMBEDDING_PARALLEL,
     )
-    return len(chunks)
+    embedding = ingest_stage_duration_seconds.labels("embed")
+    store = get_vector_store()
+    user_ids = {doc["user_id"] for doc in documents}
+    # Shared, dedicated, or both while a user is being promoted
+    targets = {user_id: tenancy.write_collections(collection_name, user_id) for user_id in user_ids}
+    with ThreadPoolExecutor(max_workers=1) as upserter:
+        pending = None
+        for start in range(0, len(chunks), batch_size):
+            # Embedding is lazy; this is the wait for the next batch
+            with embedding.time():
+                batch_vectors = list(islice(vectors, batch_size))
+            points = [
+                VectorPoint(point_id, vector.tolist(), _payload(meta, chunk))
+                for point_id, chunk, meta, vector in zip(
+                    ids[start:start + batch_size],
+                    chunks[start:start + batch_size],
+                    metadata[start:start + batch_size],
+                    batch_vectors,
+                )
+            ]
+            batches = _by_collection(points, targets)
+            for target in batches:
+                store.ensure_collection(target, len(points[0].vector), multitenant=target == collection_name)
+            if pending is not None:
+                pending.result()
+            pending = upserter.submit(_upsert, batches)
+        pending.result()
+
+    for user_id in user_ids:
+        _invalidate_results(user_id)
+    tenancy.maybe_promote(collection_name, user_ids)
+    return counts
+
+
+def _chunk_id(collection_name: str, meta: Dict) -> str:
+    """Point id of a chunk; a user's copies of some content share chunks, so these are keyed by blob."""
+    source = f"blob:{meta['blob_id']}" if meta.get("blob_id") else f"file:{meta['file_id']}"
+    name = f"{collection_name}:{meta['user_id']}:{source}:{meta['chunk_index']}"
+    return str(uuid.uuid5(_CHUNK_ID_NAMESPACE, name))
+
+
+def _by_collection(points: List[VectorPoint], targets: Dict[int, List[str]]) -> Dict[str, List[VectorPoint]]:
+    """Points grouped by the collections their user's chunks are written to."""
+    batches: Dict[str, List[VectorPoint]] = {}
+    for point in points:
+        for target in targets[point.payload["user_id"]]:
+            batches.setdefault(target, []).append(point)
+    return batches
+
+
+def _upsert(batches: Dict[str, List[VectorPoint]]) -> None:
+    store = get_vector_store()
+    with ingest_stage_duration_seconds.labels("upsert").time():
+        for collection_name, points in batches.items():
+            store.upsert(collection_name, points)
+
+
+def _payload(meta: Dict, text: str) -> Dict:
+    """
+    Payload of a chunk's point.
+
+    The text lives in document_chunks, keyed by point id, rather than in
+    vector store memory next to every vector; VECTOR_PAYLOAD_TEXT copies it
+    into the payload as well, as points written before held it.
+    """
+    if settings.VECTOR_PAYLOAD_TEXT:
+        return {"document": text, "content": text, **meta}
+    return dict(meta)
+
+
+def _index_text(collection_name: str, ids: List[str], metadata: List[Dict], texts: List[str]) -> None:
+    """Store chunk text in the database, for search results and the lexical side of hybrid search."""
+    with SessionLocal() as db:
+        crud_chunk.insert_rows(db, rows=[
+            {
+                "id": point_id,
+                "collection_name": collection_name,
+                "user_id": meta["user_id"],
+                "file_id": meta["file_id"],
+                "blob_id": meta["blob_id"],
+                "chunk_index": meta["chunk_index"],
+                "content": text,
+            }
+            for point_id, meta, text in zip(ids, metadata, texts)
+        ])
+
+
+def _chunk_texts(points: List) -> Dict[str, str]:
+    """Text of each point's chunk by id, from its payload or else from document_chunks."""
+    texts = {point.id: point.payload["content"] for point in points if "content" in point.payload}
+    missing = [point.id for point in points if point.id not in texts]
+    if missing:
+        with SessionLocal() as db:
+            texts.update(crud_chunk.get_contents(db, ids=missing))
+    return texts
+
+
+def _normalize_query(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def embed_query(query_text: str) -> List[float]:
+    """Embedding for a search query, cached by model and normalized text."""
+    text = _normalize_query(query_text)
+    key = (settings.EMBEDDING_MODEL, text)
+    vector = _embedding_cache.get(key)
+    if vector is None:
+        with rag_embed_duration_seconds.time():
+            vector = next(iter(get_embedder().query_embed(text))).tolist()
+        _embedding_cache.set(key, vector)
+    return vector
+
+
+def _invalidate_results(user_id: Optional[int] = None) -> None:
+    if user_id is None:
+        _result_cache.clear()
+    else:
+        _user_generations.bump(user_id)
+
+
+def cache_stats() -> Dict[str, Dict]:
+    """Hit/miss counters for the query embedding and result caches."""
+    return {"query_embeddings": _embedding_cache.stats(), "results": _result_cache.stats()}
 
 
 def query(
@@ -38,55 +257,234 @@ def query(
     user_id: int,
     n_results: int = 5,
     collection_name: str = "documents",
+    mode: Optional[str] = None,
 ) -> List[Dict]:
-    """Query the vector store and return relevant chunks."""
-    results = client.query(
-        collection_name=collection_name,
-        query_text=query_text,
-        query_filter=Filter(
-            must=[FieldCondition(key="user_id", match=MatchValue(value=user_id))]
-        ),
-        limit=n_results,
-    )
+    """
+    Query the vector store and return relevant chunks.
+
+    mode is "vector" for dense similarity or "hybrid" to fuse it with lexical
+    matches; it defaults to RAG_SEARCH_MODE. Results are cached per user when
+    RAG_RESULT_CACHE_SIZE is set, until the user's documents change in this
+    process or RAG_RESULT_CACHE_TTL passes.
+    """
+    mode = mode or settings.RAG_SEARCH_MODE
+    if mode not in ("vector", "hybrid"):
+        raise ValueError(f"Unknown search mode: {mode}")
 
+    key = None
+    if settings.RAG_RESULT_CACHE_SIZE:
+        key = (
+            user_id,
+            _user_generations.get(user_id),
+            collection_name,
+            _normalize_query(query_text),
+            n_results,
+            mode,
+        )
+        cached = _result_cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+    start = time.perf_counter()
+    scores = {}
+    if mode == "hybrid":
+        results, scores = _hybrid_search(query_text, user_id, n_results, collection_name)
+    else:
+        vector = embed_query(query_text)
+        with _vector_search_seconds.time():
+            results = get_vector_store().search(
+                tenancy.search_collection(collection_name, user_id),
+                SearchRequest(vector, n_results, _document_filter(user_id=user_id)),
+            )
+
+    texts = _chunk_texts(results)
     documents = []
     for point in results:
         documents.append({
-            "content": point.metadata.get("content", ""),
+            "content": texts.get(point.id, ""),
             "metadata": {
-                "file_id": point.metadata.get("file_id"),
-                "user_id": point.metadata.get("user_id"),
-                "chunk_index": point.metadata.get("chunk_index"),
+                "file_id": point.payload.get("file_id"),
+                "user_id": point.payload.get("user_id"),
+                "blob_id": point.payload.get("blob_id"),
+                "chunk_index": point.payload.get("chunk_index"),
+                "char_start": point.payload.get("char_start"),
+                "char_end": point.payload.get("char_end"),
+                "page": point.payload.get("page"),
             },
             "distance": point.score,
+            "score": scores.get(point.id, point.score),
         })
-    return documents
 
+    if key is not None:
+        _result_cache.set(key, documents)
+    rag_query_duration_seconds.labels(mode).observe(time.perf_counter() - start)
+    return list(documents)
 
-def delete_document(file_id: int, collection_name: str = "documents") -> None:
-    """Remove all chunks for a file from the vector store."""
-    client.delete(
-        collection_name=collection_name,
-        points_selector=Filter(
-            must=[FieldCondition(key="file_id", match=MatchValue(value=file_id))]
-        ),
+
+def _hybrid_search(
+    query_text: str, user_id: int, n_results: int, collection_name: str
+) -> Tuple[List[ScoredPoint], Dict]:
+    """
+    Fuse lexical and dense rankings with reciprocal rank fusion.
+
+    The lexical index supplies the wide candidate list, so the dense search
+    only needs the top n_results plus a rescoring of those candidates by id,
+    rather than a deep nearest-neighbour search. Returns the fused top points
+    and their fused scores by point id.
+    """
+    with _lexical_search_seconds.time(), SessionLocal() as db:
+        lexical_ids = crud_chunk.search(
+            db,
+            user_id=user_id,
+            query=query_text,
+            limit=n_results * settings.HYBRID_CANDIDATES_FACTOR,
+            collection_name=collection_name,
+        )
+
+    vector = embed_query(query_text)
+    user_filter = _document_filter(user_id=user_id)
+    requests = [SearchRequest(vector, n_results, user_filter)]
+    if lexical_ids:
+        requests.append(SearchRequest(vector, len(lexical_ids), user_filter, ids=lexical_ids))
+
+    with _vector_search_seconds.time():
+        responses = get_vector_store().search_batch(
+            tenancy.search_collection(collection_name, user_id), requests
+        )
+    points = {}
+    for response in responses:
+        for point in response:
+            points[point.id] = point
+    dense_ids = sorted(points, key=lambda point_id: points[point_id].score, reverse=True)
+
+    fused: Dict[str, float] = {}
+    for ranking in (dense_ids, lexical_ids):
+        for rank, point_id in enumerate(ranking):
+            # Lexical hits without a vector were deleted from the store
+            if point_id in points:
+                fused[point_id] = fused.get(point_id, 0.0) + 1.0 / (settings.RRF_K + rank + 1)
+
+    top = sorted(fused, key=fused.get, reverse=True)[:n_results]
+    return [points[point_id] for point_id in top], {point_id: fused[point_id] for point_id in top}
+
+
+def _document_filter(
+    file_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    blob_id: Optional[int] = None,
+) -> Dict[str, int]:
+    conditions = {
+        key: value
+        for key, value in (("file_id", file_id), ("user_id", user_id), ("blob_id", blob_id))
+        if value is not None
+    }
+    if not conditions:
+        raise ValueError("A file_id, user_id or blob_id is required")
+    return conditions
+
+
+def count_blob_chunks(blob_id: int, user_id: int, collection_name: str = "documents") -> int:
+    """Number of chunks a user already has indexed for some deduplicated content."""
+    return get_vector_store().count(
+        tenancy.search_collection(collection_name, user_id), _document_filter(user_id=user_id, blob_id=blob_id)
     )
 
 
-def _chunk_text(text: str, chunk_size: int, overlap: int) -> List[str]:
-    """Split text into overlapping chunks."""
-    if not text or not text.strip():
-        return []
+def copy_blob_chunks(
+    blob_id: int,
+    from_user_id: int,
+    to_user_id: int,
+    file_id: int,
+    collection_name: str = "documents",
+    batch_size: int = 256,
+) -> int:
+    """Copy another user's chunks and vectors for the same content instead of re-embedding."""
+    store = get_vector_store()
+    source = tenancy.search_collection(collection_name, from_user_id)
+    targets = {to_user_id: tenancy.write_collections(collection_name, to_user_id)}
+    copied = 0
+    offset = None
+    while True:
+        points, offset = store.scroll(
+            source,
+            _document_filter(user_id=from_user_id, blob_id=blob_id),
+            limit=batch_size,
+            offset=offset,
+        )
+        if points:
+            texts = _chunk_texts(points)
+            copies = []
+            for point in points:
+                meta = {
+                    key: value for key, value in point.payload.items() if key not in ("document", "content")
+                }
+                meta.update(user_id=to_user_id, file_id=file_id)
+                copies.append(VectorPoint(
+                    _chunk_id(collection_name, meta), point.vector, _payload(meta, texts.get(point.id, ""))
+                ))
+            _index_text(
+                collection_name,
+                [copy.id for copy in copies],
+                [copy.payload for copy in copies],
+                [texts.get(point.id, "") for point in points],
+            )
+            batches = _by_collection(copies, targets)
+            for target, batch in batches.items():
+                store.ensure_collection(target, len(batch[0].vector), multitenant=target == collection_name)
+                store.upsert(target, batch)
+            copied += len(points)
+        if offset is None:
+            _invalidate_results(to_user_id)
+            tenancy.maybe_promote(collection_name, [to_user_id])
+            return copied
+
+
+def reassign_document(
+    file_id: int,
+    new_file_id: int,
+    *,
+    user_id: int,
+    blob_id: int,
+    collection_name: str = "documents",
+) -> None:
+    """
+    Attribute a user's chunks of deduplicated content to another of their files.
+
+    A user's copies of the same content share one set of chunks, labelled
+    with the file that was indexed first; when that file is deleted they are
+    handed to a surviving copy.
+    """
+    filters = _document_filter(file_id=file_id, user_id=user_id, blob_id=blob_id)
+    store = get_vector_store()
+    for target in tenancy.delete_collections(collection_name, user_id):
+        store.set_payload(target, filters, {"file_id": new_file_id})
+    with SessionLocal() as db:
+        crud_chunk.reassign_file(
+            db,
+            collection_name=collection_name,
+            user_id=user_id,
+            blob_id=blob_id,
+            file_id=file_id,
+            new_file_id=new_file_id,
+        )
+    _invalidate_results(user_id)
 
-    words = text.split()
-    chunks = []
-    start = 0
 
-    while start < len(words):
-        end = start + chunk_size
-        chunk = " ".join(words[start:end])
-        if chunk.strip():
-            chunks.append(chunk)
-        start += chunk_size - overlap
+def delete_document(
+    file_id: Optional[int] = None,
+    collection_name: str = "documents",
+    *,
+    user_id: Optional[int] = None,
+    blob_id: Optional[int] = None,
+) -> None:
+    """Remove chunks for a file, or for a user's copy of deduplicated content, from the vector store."""
+    filters = _document_filter(file_id=file_id, user_id=user_id, blob_id=blob_id)
+    store = get_vector_store()
+    for target in tenancy.delete_collections(collection_name, user_id):
+        store.delete(target, filters)
+    with SessionLocal() as db:
+        crud_chunk.remove_where(
+            db, collection_name=collection_name, file_id=file_id, user_id=user_id, blob_id=blob_id
+        )
+    _invalidate_results(user_id)
 
-    return chunks
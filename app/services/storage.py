@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import AsyncIterator, BinaryIO, Dict, Optional, Tuple
+from anyio import to_thread
+from app.core.config import settings
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadOffsetMismatch(Exception):
+    pass
+
+
+async def save_stream(source: AsyncIterator[bytes], dest_path: str, max_size: int) -> Tuple[int, str]:
+    """
+    Write bytes arriving from an async iterator, e.g. a request body, to disk.
+
+    The data is hashed as it goes and the copy aborted as soon as it exceeds
+    max_size, without reading the rest, so only one piece is held in memory
+    at a time. File writes run in a worker thread so they don't block the
+    event loop. Returns (size, sha256 hex digest).
+    """
+    tmp_path = f"{dest_path}.part"
+    digest = hashlib.sha256()
+    size = 0
+    f = await to_thread.run_sync(open, tmp_path, "wb")
+    try:
+        async for chunk in source:
+            size += len(chunk)
+            if size > max_size:
+                raise UploadTooLarge(f"File exceeds max size of {max_size} bytes")
+            digest.update(chunk)
+            await to_thread.run_sync(f.write, chunk)
+        await to_thread.run_sync(f.close)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        f.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return size, digest.hexdigest()
+
+
+def hash_file(path: str, chunk_size: Optional[int] = None) -> str:
+    """sha256 of a file on disk, read in chunks."""
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def user_upload_path(user_id: int, original_filename: str) -> Tuple[str, str]:
+    """Allocate a stored filename and path for a user's upload."""
+    user_dir = os.path.join(settings.UPLOAD_DIR, str(user_id))
+    os.makedirs(user_dir, exist_ok=True)
+    ext = os.path.splitext(original_filename)[1]
+    stored_filename = f"{uuid.uuid4()}{ext}"
+    return stored_filename, os.path.join(user_dir, stored_filename)
+
+
+def blob_path(content_hash: str) -> str:
+    """Content-addressed location for a blob, fanned out by hash prefix."""
+    blob_dir = os.path.join(settings.UPLOAD_DIR, "blobs", content_hash[:2])
+    os.makedirs(blob_dir, exist_ok=True)
+    return os.path.join(blob_dir, content_hash)
+
+
+# Resumable uploads
+#
+# A session is a partial data file plus a JSON sidecar describing the upload.
+# The size of the partial file is the authoritative offset, so an interrupted
+# client can ask for it and continue from there.
+
+def _session_dir(user_id: int) -> str:
+    return os.path.join(settings.UPLOAD_DIR, ".sessions", str(user_id))
+
+
+def _session_paths(user_id: int, upload_id: str) -> Tuple[str, str]:
+    base = os.path.join(_session_dir(user_id), upload_id)
+    return f"{base}.json", f"{base}.data"
+
+
+def create_upload_session(user_id: int, filename: str, mime_type: str, size: int) -> Dict:
+    if size > settings.MAX_RESUMABLE_FILE_SIZE:
+        raise UploadTooLarge(f"File exceeds max size of {settings.MAX_RESUMABLE_FILE_SIZE} bytes")
+    os.makedirs(_session_dir(user_id), exist_ok=True)
+    upload_id = uuid.uuid4().hex
+    meta_path, data_path = _session_paths(user_id, upload_id)
+    session = {
+        "upload_id": upload_id,
+        "filename": filename,
+        "mime_type": mime_type,
+        "size": size,
+        "created_at": time.time(),
+    }
+    open(data_path, "wb").close()
+    with open(meta_path, "w") as f:
+        json.dump(session, f)
+    return {**session, "offset": 0}
+
+
+def get_upload_session(user_id: int, upload_id: str) -> Optional[Dict]:
+    # upload_id comes from the URL; refuse anything that isn't one of ours
+    if not upload_id.isalnum():
+        return None
+    meta_path, data_path = _session_paths(user_id, upload_id)
+    if not os.path.exists(meta_path) or not os.path.exists(data_path):
+        return None
+    with open(meta_path) as f:
+        session = json.load(f)
+    return {**session, "offset": os.path.getsize(data_path)}
+
+
+def open_upload_chunk(user_id: int, session: Dict, offset: int) -> BinaryIO:
+    """Open a session's data file for appending at offset."""
+    if offset != session["offset"]:
+        raise UploadOffsetMismatch(f"Expected offset {session['offset']}, got {offset}")
+    _, data_path = _session_paths(user_id, session["upload_id"])
+    f = open(data_path, "r+b")
+    f.seek(offset)
+    return f
+
+
+def complete_upload_session(user_id: int, session: Dict) -> Tuple[str, str, str]:
+    """
+    Move a finished upload into the user's directory.
+
+    Returns (stored_filename, file_path, sha256 hex digest).
+    """
+    if session["offset"] != session["size"]:
+        raise UploadOffsetMismatch(f"Upload incomplete: {session['offset']} of {session['size']} bytes")
+    meta_path, data_path = _session_paths(user_id, session["upload_id"])
+    content_hash = hash_file(data_path)
+    stored_filename, file_path = user_upload_path(user_id, session["filename"])
+    shutil.move(data_path, file_path)
+    os.remove(meta_path)
+    return stored_filename, file_path, content_hash
+
+
+def delete_upload_session(user_id: int, upload_id: str) -> None:
+    for path in _session_paths(user_id, upload_id):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def purge_stale_upload_sessions(max_age: Optional[float] = None) -> int:
+    """Remove resumable uploads that were abandoned. Returns the number purged."""
+    max_age = max_age if max_age is not None else settings.UPLOAD_SESSION_TTL
+    root = os.path.join(settings.UPLOAD_DIR, ".sessions")
+    if not os.path.isdir(root):
+        return 0
+    cutoff = time.time() - max_age
+    purged = 0
+    for user_id in os.listdir(root):
+        for name in os.listdir(os.path.join(root, user_id)):
+            if not name.endswith(".json"):
+                continue
+            upload_id = name[: -len(".json")]
+            meta_path, data_path = _session_paths(int(user_id), upload_id)
+            last_write = max(
+                os.path.getmtime(path) for path in (meta_path, data_path) if os.path.exists(path)
+            )
+            if last_write < cutoff:
+                delete_upload_session(int(user_id), upload_id)
+                purged += 1
+    return purged
@@ -0,0 +1,268 @@
+"""
+Replay buffers for streamed chat generations.
+
+Each generation writes its events to a buffer under a stream id while it runs
+as a task of its own, so it finishes and is saved even if the client goes
+away. Clients read the buffer from any event id onwards, which is how a
+dropped connection resumes with Last-Event-ID. Buffers are bounded per stream
+and in total, and finished streams expire after STREAM_BUFFER_TTL seconds.
+"""
+import asyncio
+import sys
+import time
+import uuid
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import AsyncIterator, Awaitable, Deque, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.metrics import CallbackMetric
+
+
+class StreamEvent(NamedTuple):
+    id: int
+    data: str
+    event: Optional[str] = None
+    last: bool = False
+
+
+class StreamGone(Exception):
+    """The stream expired, or events after the requested id were evicted."""
+
+
+def new_stream_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _event_size(event: StreamEvent) -> int:
+    # The string, plus the tuple and its slot in the deque
+    return sys.getsizeof(event.data) + 80
+
+
+class _Stream:
+    __slots__ = ("user_id", "events", "size", "finished", "changed")
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.events: Deque[StreamEvent] = deque()
+        self.size = 0
+        self.finished = False
+        self.changed = asyncio.Event()
+
+    def notify(self) -> None:
+        # Wake everyone waiting on the current event; later waiters get a new one
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class MemoryStreamBuffer:
+    """
+    Buffers in this process, for single-process deployments.
+
+    Only touched from the event loop, so it needs no locks. When the total
+    size passes max_bytes, finished streams are dropped oldest first, then
+    the oldest events of running ones.
+    """
+
+    def __init__(self, max_events: int, max_bytes: int, ttl: float):
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._streams: Dict[str, _Stream] = {}
+        # Finished stream ids by expiry time, oldest first
+        self._expiry: "OrderedDict[str, float]" = OrderedDict()
+
+    async def create(self, stream_id: str, user_id: int) -> None:
+        self._expire()
+        self._streams[stream_id] = _Stream(user_id)
+
+    async def append(self, stream_id: str, event: StreamEvent) -> None:
+        stream = self._streams[stream_id]
+        if len(stream.events) >= self.max_events:
+            self._trim(stream)
+        stream.events.append(event)
+        size = _event_size(event)
+        stream.size += size
+        self.size += size
+        if self.size > self.max_bytes:
+            self._shrink()
+        # Marked finished after shrinking, so a stream isn't evicted by its own last event
+        if event.last:
+            stream.finished = True
+            self._expiry[stream_id] = time.monotonic() + self.ttl
+        stream.notify()
+
+    async def owner(self, stream_id: str) -> Optional[int]:
+        self._expire()
+        stream = self._streams.get(stream_id)
+        return None if stream is None else stream.user_id
+
+    async def available(self, stream_id: str, after: int) -> bool:
+        stream = self._streams.get(stream_id)
+        return stream is not None and (not stream.events or stream.events[0].id <= after + 1)
+
+    async def read(self, stream_id: str, after: int = 0) -> AsyncIterator[StreamEvent]:
+        """Events with ids above after, as they arrive, up to the last one."""
+        while True:
+            stream = self._streams.get(stream_id)
+            if stream is None:
+                raise StreamGone(stream_id)
+            events = stream.events
+            if events and events[0].id > after + 1:
+                raise StreamGone(stream_id)
+            changed = stream.changed
+            # Ids are consecutive, so the position of after + 1 is known
+            start = after + 1 - events[0].id if events else 0
+            for event in list(islice(events, max(start, 0), None)):
+                yield event
+                if event.last:
+                    return
+                after = event.id
+            if stream.finished:
+                # after was at or past the last event
+                return
+            if not stream.events or stream.events[-1].id <= after:
+                await changed.wait()
+
+    def stats(self) -> Dict[str, int]:
+        return {"streams": len(self._streams), "bytes": self.size}
+
+    def _trim(self, stream: _Stream) -> None:
+        size = _event_size(stream.events.popleft())
+        stream.size -= size
+        self.size -= size
+
+    def _remove(self, stream_id: str) -> None:
+        stream = self._streams.pop(stream_id)
+        self._expiry.pop(stream_id, None)
+        self.size -= stream.size
+        # Readers wake up and find the stream gone
+        stream.notify()
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self._expiry:
+            stream_id, expires_at = next(iter(self._expiry.items()))
+            if expires_at > now:
+                break
+            self._remove(stream_id)
+
+    def _shrink(self) -> None:
+        while self.size > self.max_bytes and self._expiry:
+            self._remove(next(iter(self._expiry)))
+        for stream in self._streams.values():
+            while self.size > self.max_bytes and len(stream.events) > 1:
+                self._trim(stream)
+            if self.size <= self.max_bytes:
+                break
+
+
+class RedisStreamBuffer:
+    """
+    Buffers in Redis streams, so any process can serve a resume.
+
+    Each stream keeps its last max_events events and expires ttl seconds after
+    its latest event. Redis' own maxmemory policy caps the total.
+    """
+
+    def __init__(self, url: str, max_events: int, ttl: float, block: float = 5.0):
+        import redis.asyncio as redis
+
+        self.max_events = max_events
+        self.ttl = int(ttl)
+        self.block_ms = int(block * 1000)
+        self._redis = redis.from_url(url, decode_responses=True)
+
+    @staticmethod
+    def _keys(stream_id: str) -> Tuple[str, str]:
+        return f"chat:stream:{stream_id}", f"chat:stream:{stream_id}:owner"
+
+    async def create(self, stream_id: str, user_id: int) -> None:
+        _, owner_key = self._keys(stream_id)
+        await self._redis.set(owner_key, user_id, ex=self.ttl)
+
+    async def append(self, stream_id: str, event: StreamEvent) -> None:
+        events_key, owner_key = self._keys(stream_id)
+        fields = {"data": event.data, "event": event.event or "", "last": int(event.last)}
+        async with self._redis.pipeline(transaction=False) as pipe:
+            # The event id is the entry id, so resuming is a plain XREAD
+            pipe.xadd(events_key, fields, id=f"{event.id}-0", maxlen=self.max_events, approximate=True)
+            pipe.expire(events_key, self.ttl)
+            pipe.expire(owner_key, self.ttl)
+            await pipe.execute()
+
+    async def owner(self, stream_id: str) -> Optional[int]:
+        _, owner_key = self._keys(stream_id)
+        user_id = await self._redis.get(owner_key)
+        return None if user_id is None else int(user_id)
+
+    async def available(self, stream_id: str, after: int) -> bool:
+        events_key, _ = self._keys(stream_id)
+        first = await self._redis.xrange(events_key, count=1)
+        return not first or _entry_seq(first[0][0]) <= after + 1
+
+    async def read(self, stream_id: str, after: int = 0) -> AsyncIterator[StreamEvent]:
+        """Events with ids above after, as they arrive, up to the last one."""
+        events_key, owner_key = self._keys(stream_id)
+        while True:
+            response = await self._redis.xread({events_key: f"{after}-0"}, count=256, block=self.block_ms)
+            if not response:
+                if not await self._redis.exists(owner_key):
+                    raise StreamGone(stream_id)
+                newest = await self._redis.xrevrange(events_key, count=1)
+                if newest and newest[0][1]["last"] == "1":
+                    # after was at or past the last event
+                    return
+                continue
+            for entry_id, fields in response[0][1]:
+                seq = _entry_seq(entry_id)
+                if seq > after + 1:
+                    raise StreamGone(stream_id)
+                event = StreamEvent(seq, fields["data"], fields["event"] or None, fields["last"] == "1")
+                yield event
+                if event.last:
+                    return
+                after = seq
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+def _entry_seq(entry_id: str) -> int:
+    return int(entry_id.split("-", 1)[0])
+
+
+def _create_buffer():
+    if settings.STREAM_BUFFER_BACKEND == "redis":
+        return RedisStreamBuffer(settings.REDIS_URL, settings.STREAM_BUFFER_MAX_EVENTS, settings.STREAM_BUFFER_TTL)
+    return MemoryStreamBuffer(
+        settings.STREAM_BUFFER_MAX_EVENTS, settings.STREAM_BUFFER_MAX_BYTES, settings.STREAM_BUFFER_TTL
+    )
+
+
+buffer = _create_buffer()
+
+# Generations in flight; the loop only keeps weak references to tasks
+_tasks: Set[asyncio.Task] = set()
+
+
+def run_detached(generation: Awaitable[None]) -> asyncio.Task:
+    """Run a generation as its own task, unaffected by the request that started it."""
+    task = asyncio.ensure_future(generation)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
+
+
+def _buffer_stats() -> List[Tuple[Tuple[str, ...], float]]:
+    stats = buffer.stats()
+    return [(("generating",), len(_tasks))] + [((name,), value) for name, value in stats.items()]
+
+
+chat_stream_buffer = CallbackMetric(
+    "chat_stream_buffer",
+    "Chat generations in flight, and buffered streams and bytes in this process.",
+    ("kind",),
+    _buffer_stats,
+)
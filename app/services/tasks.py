@@ -0,0 +1,154 @@
+import uuid
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.crud import file as crud_file
+from app.models.models import File, FileStatus
+from app.schemas.file import FileUpdate
+from app.services.file_processor import process_file, process_files
+from app.services.storage import purge_stale_upload_sessions
+from app.services.tenancy import purge_promoted
+
+
+class FileProcessingError(Exception):
+    pass
+
+
+@celery_app.task(
+    bind=True,
+    name="files.process",
+    max_retries=settings.FILE_PROCESSING_MAX_RETRIES,
+    rate_limit=settings.FILE_PROCESSING_RATE_LIMIT or None,
+)
+def process_file_task(self, file_id: int) -> dict:
+    """Extract and index a file, retrying with exponential backoff on failure."""
+    db = SessionLocal()
+    try:
+        file = process_file(db, file_id)
+        if file is None:
+            return {"file_id": file_id, "status": None}
+        if file.status == FileStatus.FAILED:
+            error = FileProcessingError((file.extra_metadata or {}).get("error", "Processing failed"))
+            if self.request.retries < self.max_retries:
+                raise self.retry(
+                    exc=error,
+                    countdown=settings.FILE_PROCESSING_RETRY_BACKOFF * 2 ** self.request.retries,
+                )
+            raise error
+        return {"file_id": file_id, "status": file.status.value}
+    finally:
+        db.close()
+
+
+@celery_app.task(
+    bind=True,
+    name="files.process_batch",
+    max_retries=settings.FILE_PROCESSING_MAX_RETRIES,
+    rate_limit=settings.FILE_PROCESSING_RATE_LIMIT or None,
+)
+def process_files_task(self, file_ids: List[int]) -> dict:
+    """Extract and index a batch of files together, retrying only the ones that failed."""
+    db = SessionLocal()
+    try:
+        files = [file for file in process_files(db, file_ids) if file]
+        failed = [file for file in files if file.status == FileStatus.FAILED]
+        if failed:
+            error = FileProcessingError(
+                (failed[0].extra_metadata or {}).get("error", "Processing failed")
+            )
+            if self.request.retries < self.max_retries:
+                raise self.retry(
+                    args=[[file.id for file in failed]],
+                    exc=error,
+                    countdown=settings.FILE_PROCESSING_RETRY_BACKOFF * 2 ** self.request.retries,
+                )
+            raise error
+        return {"file_ids": [file.id for file in files], "status": FileStatus.COMPLETED.value}
+    finally:
+        db.close()
+
+
+@celery_app.task(name="files.enqueue_pending")
+def enqueue_pending_files_task(limit: int = 100) -> int:
+    """Queue pending files that were never handed to a worker, in batches."""
+    db = SessionLocal()
+    try:
+        unqueued = [
+            file for file in crud_file.get_pending(db, limit=limit)
+            if not (file.extra_metadata or {}).get("task_id")
+        ]
+        batch_size = settings.FILE_PROCESSING_BATCH_SIZE
+        for i in range(0, len(unqueued), batch_size):
+            enqueue_file_batch(db, unqueued[i:i + batch_size])
+        return len(unqueued)
+    finally:
+        db.close()
+
+
+@celery_app.task(name="files.purge_upload_sessions")
+def purge_upload_sessions_task() -> int:
+    """Delete resumable uploads that were abandoned."""
+    return purge_stale_upload_sessions()
+
+
+@celery_app.task(name="vectors.purge_promoted_tenants")
+def purge_promoted_tenants_task() -> int:
+    """Delete the shared vector copies of users promoted to their own collection."""
+    return purge_promoted()
+
+
+def enqueue_file_processing(db: Session, file: File) -> str:
+    """Mark a file pending and queue it for processing. Returns the task id."""
+    task_id = str(uuid.uuid4())
+    # Record the task before sending it so eager or fast workers see it
+    crud_file.update(db, db_obj=file, obj_in=FileUpdate(
+        status=FileStatus.PENDING,
+        extra_metadata={**(file.extra_metadata or {}), "task_id": task_id},
+    ))
+    try:
+        process_file_task.apply_async(args=[file.id], task_id=task_id)
+    except Exception:
+        _release_unsent(db, [file], task_id)
+        raise
+    return task_id
+
+
+def enqueue_file_batch(db: Session, files: List[File]) -> str:
+    """Queue several files to be indexed together under one task id."""
+    task_id = str(uuid.uuid4())
+    for file in files:
+        crud_file.update(db, db_obj=file, obj_in=FileUpdate(
+            status=FileStatus.PENDING,
+            extra_metadata={**(file.extra_metadata or {}), "task_id": task_id},
+        ))
+    try:
+        process_files_task.apply_async(args=[[file.id for file in files]], task_id=task_id)
+    except Exception:
+        _release_unsent(db, files, task_id)
+        raise
+    return task_id
+
+
+def _release_unsent(db: Session, files: List[File], task_id: str) -> None:
+    """
+    Clear the task id recorded for a task the broker never received.
+
+    Otherwise the files would look queued forever: /process would refuse them
+    and the pending sweep would skip them.
+    """
+    db.rollback()
+    for file in files:
+        db.refresh(file)
+        metadata = dict(file.extra_metadata or {})
+        if file.status == FileStatus.PENDING and metadata.get("task_id") == task_id:
+            del metadata["task_id"]
+            crud_file.update(db, db_obj=file, obj_in=FileUpdate(extra_metadata=metadata))
+
+
+def get_task_state(task_id: Optional[str]) -> Optional[str]:
+    """Celery state for a queued processing task, if known."""
+    if not task_id:
+        return None
+    return celery_app.AsyncResult(task_id).state
@@ -0,0 +1,193 @@
+"""
+Which vector collection holds each user's chunks.
+
+Users start in the shared collection (e.g. "documents"), which is indexed by
+user_id so filtered searches stay fast however many users it holds. With
+VECTOR_TENANCY=promote, a user reaching VECTOR_TENANT_PROMOTION_THRESHOLD
+chunks gets a collection of their own, so one large tenant neither slows
+searches for everyone else nor is slowed by them:
+
+1. A vector_tenants row claims the promotion (COPYING). From then on new
+   chunks are written to both collections and deletes apply to both.
+2. The user's points are copied with their ids, and the row becomes
+   DEDICATED: writes and searches go to the new collection only.
+3. After VECTOR_TENANT_PURGE_DELAY, purge_promoted() copies over anything
+   written to the shared collection by processes that hadn't noticed yet and
+   deletes the user's shared copies (PURGED).
+
+Processes cache search routes for VECTOR_TENANT_ROUTE_TTL; the shared copies
+outlive that. Writes only use the cache once a user is promoted, which is
+never undone, so they follow a claim at once. Callers keep using the shared
+collection's name (lexical index, result cache); only the vector store sees
+the dedicated ones.
+
+With VECTOR_TENANCY=shared nothing is looked up and every user is in the
+shared collection, so users promoted earlier must not be switched back.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import vector_tenant_promotions_total
+from app.crud import vector_tenant as crud_vector_tenant
+from app.models.models import VectorTenant, VectorTenantState
+from app.services.vector_store import get_vector_store
+
+logger = logging.getLogger(__name__)
+
+_routes = LRUCache(maxsize=100000, ttl=settings.VECTOR_TENANT_ROUTE_TTL)
+
+
+def dedicated_collection_name(collection_name: str, user_id: int) -> str:
+    return f"{collection_name}_user_{user_id}"
+
+
+def _tenant(collection_name: str, user_id: int) -> Optional[VectorTenant]:
+    with SessionLocal() as db:
+        return crud_vector_tenant.get_by_user(db, collection_name=collection_name, user_id=user_id)
+
+
+def _promoted_route(collection_name: str, user_id: int) -> Optional[str]:
+    """The user's dedicated collection if this process has cached their promotion."""
+    route = _routes.get((collection_name, user_id))
+    return route if route is not None and route != collection_name else None
+
+
+def search_collection(collection_name: str, user_id: int) -> str:
+    """The collection to search for a user's chunks."""
+    if settings.VECTOR_TENANCY != "promote":
+        return collection_name
+    key = (collection_name, user_id)
+    route = _routes.get(key)
+    if route is None:
+        tenant = _tenant(collection_name, user_id)
+        if tenant is None or tenant.state == VectorTenantState.COPYING:
+            route = collection_name
+        else:
+            route = tenant.dedicated_collection
+        _routes.set(key, route)
+    return route
+
+
+def write_collections(collection_name: str, user_id: int) -> List[str]:
+    """
+    Collections new chunks of a user go to.
+
+    Promoted users are answered from the route cache; anyone else is looked
+    up every time, so writes go to both collections as soon as a promotion is
+    claimed.
+    """
+    if settings.VECTOR_TENANCY != "promote":
+        return [collection_name]
+    promoted = _promoted_route(collection_name, user_id)
+    if promoted is not None:
+        return [promoted]
+    tenant = _tenant(collection_name, user_id)
+    if tenant is None:
+        return [collection_name]
+    if tenant.state == VectorTenantState.COPYING:
+        return [collection_name, tenant.dedicated_collection]
+    _routes.set((collection_name, user_id), tenant.dedicated_collection)
+    return [tenant.dedicated_collection]
+
+
+def delete_collections(collection_name: str, user_id: Optional[int] = None) -> List[str]:
+    """Every collection that may hold a user's chunks, or anyone's without a user_id."""
+    if settings.VECTOR_TENANCY != "promote":
+        return [collection_name]
+    if user_id is None:
+        with SessionLocal() as db:
+            tenants = crud_vector_tenant.get_by_collection(db, collection_name=collection_name)
+        return [collection_name, *(tenant.dedicated_collection for tenant in tenants)]
+    tenant = _tenant(collection_name, user_id)
+    if tenant is None:
+        return [collection_name]
+    if tenant.state == VectorTenantState.PURGED:
+        return [tenant.dedicated_collection]
+    return [collection_name, tenant.dedicated_collection]
+
+
+def _copy_points(source: str, target: str, user_id: int, batch_size: int = 256) -> int:
+    store = get_vector_store()
+    copied = 0
+    offset = None
+    while True:
+        points, offset = store.scroll(source, {"user_id": user_id}, limit=batch_size, offset=offset)
+        if points:
+            store.ensure_collection(target, len(points[0].vector))
+            store.upsert(target, points)
+            copied += len(points)
+        if offset is None:
+            return copied
+
+
+def promote(collection_name: str, user_id: int) -> bool:
+    """Move a user's points to their own collection. Returns False if another process already is."""
+    dedicated = dedicated_collection_name(collection_name, user_id)
+    with SessionLocal() as db:
+        tenant = crud_vector_tenant.claim(
+            db, collection_name=collection_name, user_id=user_id, dedicated_collection=dedicated
+        )
+    if tenant is None:
+        return False
+    store = get_vector_store()
+    try:
+        # Leftovers of an earlier attempt may include chunks deleted since;
+        # anything written after the claim is in the shared collection too
+        store.delete(dedicated, {"user_id": user_id})
+        _copy_points(collection_name, dedicated, user_id)
+    except Exception:
+        # Release the claim so a later ingestion can try again
+        with SessionLocal() as db:
+            crud_vector_tenant.remove(db, id=tenant.id)
+        raise
+    with SessionLocal() as db:
+        crud_vector_tenant.set_state(db, tenant=tenant, state=VectorTenantState.DEDICATED)
+    _routes.set((collection_name, user_id), dedicated)
+    vector_tenant_promotions_total.labels("promoted").inc()
+    return True
+
+
+def maybe_promote(collection_name: str, user_ids: Iterable[int]) -> List[int]:
+    """
+    Promote users whose shared chunk count has reached the threshold. Returns those promoted.
+
+    A failed promotion is logged, counted in vector_tenant_promotions_total
+    and retried on the user's next ingestion; it doesn't fail the caller.
+    """
+    if settings.VECTOR_TENANCY != "promote":
+        return []
+    store = get_vector_store()
+    promoted = []
+    for user_id in user_ids:
+        if _promoted_route(collection_name, user_id) is not None or _tenant(collection_name, user_id) is not None:
+            continue
+        if store.count(collection_name, {"user_id": user_id}) < settings.VECTOR_TENANT_PROMOTION_THRESHOLD:
+            continue
+        try:
+            if promote(collection_name, user_id):
+                promoted.append(user_id)
+        except Exception:
+            logger.exception("Promoting user %s to a dedicated %s collection failed", user_id, collection_name)
+            vector_tenant_promotions_total.labels("failed").inc()
+    return promoted
+
+
+def purge_promoted() -> int:
+    """Delete the shared copies of users promoted more than VECTOR_TENANT_PURGE_DELAY ago. Returns how many."""
+    delay = max(settings.VECTOR_TENANT_PURGE_DELAY, settings.VECTOR_TENANT_ROUTE_TTL)
+    with SessionLocal() as db:
+        tenants = crud_vector_tenant.get_purgeable(
+            db, promoted_before=datetime.now(timezone.utc) - timedelta(seconds=delay)
+        )
+    store = get_vector_store()
+    for tenant in tenants:
+        # Chunks written by processes that hadn't seen the promotion yet
+        _copy_points(tenant.collection_name, tenant.dedicated_collection, tenant.user_id)
+        store.delete(tenant.collection_name, {"user_id": tenant.user_id})
+        with SessionLocal() as db:
+            crud_vector_tenant.set_state(db, tenant=tenant, state=VectorTenantState.PURGED)
+    return len(tenants)
@@ -0,0 +1,553 @@
+"""
+Vector store backends behind one interface.
+
+rag talks to a VectorStore instead of qdrant_client, so the index can be:
+
+- local: an embedded Qdrant directory (VECTOR_DB_PATH). It keeps every point
+  in memory and locks the directory, so only one process can use it.
+- qdrant: a Qdrant server shared by every API and Celery worker, over gRPC
+  through a pool of channels.
+- memory: NumPy arrays in this process, searched by brute force. For tests
+  and small deployments; nothing is persisted.
+
+VECTOR_STORE_BACKEND picks one, and get_vector_store() creates it on first
+use. Points carry a flat payload; filters are equality matches on payload
+fields, and every filter given must match.
+"""
+import itertools
+import threading
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import Filter
+
+# Same vector name qdrant-client's fastembed helpers use, so collections they
+# created keep working
+VECTOR_NAME = f"fast-{settings.EMBEDDING_MODEL.split('/')[-1].lower()}"
+
+# Payload fields documents are filtered on, all integers; every backend indexes them
+FILTER_FIELDS = ("user_id", "file_id", "blob_id")
+
+
+class VectorPoint(NamedTuple):
+    id: str
+    vector: List[float]
+    payload: Dict[str, Any]
+
+
+class ScoredPoint(NamedTuple):
+    id: str
+    score: float  # cosine similarity, higher is closer
+    payload: Dict[str, Any]
+
+
+class SearchRequest(NamedTuple):
+    vector: List[float]
+    limit: int
+    filters: Dict[str, Any]
+    ids: Optional[List[str]] = None  # restrict the search to these points
+
+
+class StorageOptions(NamedTuple):
+    """How a Qdrant server holds a collection's vectors and payloads."""
+    quantization: str = ""  # "", "scalar" (int8) or "binary" (one bit per dimension)
+    rescore: bool = True  # re-rank quantized candidates by the original vectors
+    oversampling: float = 2.0  # quantized candidates fetched per result to rescore
+    on_disk: bool = False  # original vectors in memory-mapped files rather than RAM
+    payload_on_disk: bool = False
+
+    @classmethod
+    def from_settings(cls) -> "StorageOptions":
+        return cls(
+            quantization=settings.VECTOR_QUANTIZATION,
+            rescore=settings.VECTOR_QUANTIZATION_RESCORE,
+            oversampling=settings.VECTOR_QUANTIZATION_OVERSAMPLING,
+            on_disk=settings.VECTOR_ON_DISK,
+            payload_on_disk=settings.VECTOR_PAYLOAD_ON_DISK,
+        )
+
+
+class VectorStore(ABC):
+    """Cosine-similarity index of vectors with payloads, in named collections."""
+
+    @abstractmethod
+    def collection_exists(self, collection: str) -> bool:
+        """Whether the collection has been created."""
+
+    @abstractmethod
+    def ensure_collection(self, collection: str, size: int, multitenant: bool = False) -> None:
+        """
+        Create the collection for vectors of size dimensions unless it exists.
+
+        multitenant marks a collection shared by many users, where every
+        search is filtered by user_id.
+        """
+
+    @abstractmethod
+    def upsert(self, collection: str, points: List[VectorPoint]) -> None:
+        """Add points, replacing any with the same ids."""
+
+    @abstractmethod
+    def search(self, collection: str, request: SearchRequest) -> List[ScoredPoint]:
+        """The request.limit points closest to request.vector, best first."""
+
+    def search_batch(self, collection: str, requests: List[SearchRequest]) -> List[List[ScoredPoint]]:
+        return [self.search(collection, request) for request in requests]
+
+    @abstractmethod
+    def count(self, collection: str, filters: Dict[str, Any]) -> int:
+        """Number of points matching the filters."""
+
+    @abstractmethod
+    def scroll(
+        self, collection: str, filters: Dict[str, Any], limit: int, offset: Optional[Any] = None
+    ) -> Tuple[List[VectorPoint], Optional[Any]]:
+        """A page of matching points with their vectors, and the offset of the next page or None."""
+
+    @abstractmethod
+    def set_payload(self, collection: str, filters: Dict[str, Any], payload: Dict[str, Any]) -> None:
+        """Set these payload fields on every matching point, keeping the others."""
+
+    @abstractmethod
+    def delete(self, collection: str, filters: Dict[str, Any]) -> None:
+        """Remove every point matching the filters."""
+
+
+class QdrantVectorStore(VectorStore):
+    """
+    Qdrant, embedded or over the network.
+
+    Calls are spread round-robin over clients; each client of a server owns
+    its own gRPC connection, so concurrent requests from the threadpool and
+    ingestion don't all queue on one.
+
+    On a server, FILTER_FIELDS get payload indexes so filtered searches don't
+    scan, and multitenant collections build their HNSW graph per user_id
+    rather than across all users (m=0, payload_m), so one user's search
+    never walks another's points. storage sets how vectors and payloads are
+    held: quantized copies stay in RAM for the graph search while the
+    originals, read only to rescore the candidates, can be memory-mapped.
+    Existing collections are brought in line on first write, and Qdrant
+    rebuilds them in the background. Embedded Qdrant searches exhaustively
+    and ignores all of these.
+    """
+
+    def __init__(
+        self,
+        clients: List["QdrantClient"],
+        vector_name: str = VECTOR_NAME,
+        indexed: bool = True,
+        storage: StorageOptions = StorageOptions(),
+    ):
+        self._clients = itertools.cycle(clients)
+        self.vector_name = vector_name
+        self.indexed = indexed
+        self.storage = storage
+        self._collections = set()
+
+    @property
+    def client(self) -> "QdrantClient":
+        return next(self._clients)
+
+    def _filter(self, filters: Dict[str, Any], ids: Optional[List[str]] = None) -> "Filter":
+        from qdrant_client.models import FieldCondition, Filter, HasIdCondition, MatchValue
+
+        conditions = [FieldCondition(key=key, match=MatchValue(value=value)) for key, value in filters.items()]
+        if ids is not None:
+            conditions.append(HasIdCondition(has_id=ids))
+        return Filter(must=conditions)
+
+    def collection_exists(self, collection: str) -> bool:
+        return collection in self._collections or self.client.collection_exists(collection)
+
+    def ensure_collection(self, collection: str, size: int, multitenant: bool = False) -> None:
+        if collection in self._collections:
+            return
+        from qdrant_client.models import Distance, HnswConfigDiff, VectorParams
+
+        client = self.client
+        if not client.collection_exists(collection):
+            try:
+                client.create_collection(
+                    collection_name=collection,
+                    vectors_config={self.vector_name: VectorParams(
+                        size=size, distance=Distance.COSINE, on_disk=self.storage.on_disk if self.indexed else None
+                    )},
+                    hnsw_config=HnswConfigDiff(m=0, payload_m=16) if multitenant and self.indexed else None,
+                    quantization_config=self._quantization_config() if self.indexed else None,
+                    on_disk_payload=self.storage.payload_on_disk if self.indexed else None,
+                )
+            except Exception:
+                # Another worker may have created it in the meantime
+                if not client.collection_exists(collection):
+                    raise
+        if self.indexed:
+            # Also brings collections created before these settings in line
+            info = client.get_collection(collection)
+            self._ensure_storage(client, collection, info)
+            self._ensure_payload_indexes(client, collection, info.payload_schema)
+        self._collections.add(collection)
+
+    def _quantization_config(self):
+        from qdrant_client.models import (
+            BinaryQuantization,
+            BinaryQuantizationConfig,
+            ScalarQuantization,
+            ScalarQuantizationConfig,
+            ScalarType,
+        )
+
+        # Quantized vectors always stay in RAM; they're what the graph search reads
+        if self.storage.quantization == "scalar":
+            # quantile=0.99 clips outliers so the int8 range isn't spent on them
+            return ScalarQuantization(
+                scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
+        if self.storage.quantization == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+        if self.storage.quantization:
+            raise ValueError(f"Unknown vector quantization: {self.storage.quantization}")
+        return None
+
+    def _ensure_storage(self, client: "QdrantClient", collection: str, info) -> None:
+        from qdrant_client.models import (
+            BinaryQuantization,
+            CollectionParamsDiff,
+            Disabled,
+            ScalarQuantization,
+            VectorParamsDiff,
+        )
+
+        current = info.config.quantization_config
+        if isinstance(current, ScalarQuantization):
+            quantization = "scalar"
+        elif isinstance(current, BinaryQuantization):
+            quantization = "binary"
+        else:
+            quantization = "" if current is None else type(current).__name__
+        vectors = info.config.params.vectors
+        on_disk = bool(vectors[self.vector_name].on_disk) if isinstance(vectors, dict) else False
+        payload_on_disk = bool(info.config.params.on_disk_payload)
+
+        changes = {}
+        if quantization != self.storage.quantization:
+            changes["quantization_config"] = self._quantization_config() or Disabled.DISABLED
+        if on_disk != self.storage.on_disk:
+            changes["vectors_config"] = {self.vector_name: VectorParamsDiff(on_disk=self.storage.on_disk)}
+        if payload_on_disk != self.storage.payload_on_disk:
+            changes["collection_params"] = CollectionParamsDiff(on_disk_payload=self.storage.payload_on_disk)
+        if changes:
+            client.update_collection(collection_name=collection, **changes)
+
+    def _ensure_payload_indexes(self, client: "QdrantClient", collection: str, existing: Dict[str, Any]) -> None:
+        from qdrant_client.models import IntegerIndexParams, IntegerIndexType
+
+        for field in FILTER_FIELDS:
+            if field not in existing:
+                client.create_payload_index(
+                    collection_name=collection,
+                    field_name=field,
+                    # Exact matches only; no range queries on ids
+                    field_schema=IntegerIndexParams(type=IntegerIndexType.INTEGER, lookup=True, range=False),
+                )
+
+    def upsert(self, collection: str, points: List[VectorPoint]) -> None:
+        from qdrant_client.models import PointStruct
+
+        self.client.upsert(
+            collection_name=collection,
+            points=[
+                PointStruct(id=point.id, vector={self.vector_name: point.vector}, payload=point.payload)
+                for point in points
+            ],
+        )
+
+    def _search_params(self):
+        from qdrant_client.models import QuantizationSearchParams, SearchParams
+
+        if not (self.indexed and self.storage.quantization):
+            return None
+        return SearchParams(quantization=QuantizationSearchParams(
+            rescore=self.storage.rescore,
+            oversampling=self.storage.oversampling if self.storage.rescore else None,
+        ))
+
+    def _query_request(self, request: SearchRequest):
+        from qdrant_client.models import QueryRequest
+
+        return QueryRequest(
+            query=request.vector,
+            using=self.vector_name,
+            filter=self._filter(request.filters, request.ids),
+            params=self._search_params(),
+            limit=request.limit,
+            with_payload=True,
+        )
+
+    @staticmethod
+    def _scored(points) -> List[ScoredPoint]:
+        return [ScoredPoint(str(point.id), point.score, point.payload or {}) for point in points]
+
+    def search(self, collection: str, request: SearchRequest) -> List[ScoredPoint]:
+        return self._scored(self.client.query_points(
+            collection_name=collection,
+            query=request.vector,
+            using=self.vector_name,
+            query_filter=self._filter(request.filters, request.ids),
+            search_params=self._search_params(),
+            limit=request.limit,
+            with_payload=True,
+        ).points)
+
+    def search_batch(self, collection: str, requests: List[SearchRequest]) -> List[List[ScoredPoint]]:
+        # One round trip for all of them
+        responses = self.client.query_batch_points(
+            collection_name=collection, requests=[self._query_request(request) for request in requests]
+        )
+        return [self._scored(response.points) for response in responses]
+
+    def count(self, collection: str, filters: Dict[str, Any]) -> int:
+        if not self.collection_exists(collection):
+            return 0
+        return self.client.count(collection_name=collection, count_filter=self._filter(filters), exact=True).count
+
+    def scroll(
+        self, collection: str, filters: Dict[str, Any], limit: int, offset: Optional[Any] = None
+    ) -> Tuple[List[VectorPoint], Optional[Any]]:
+        points, offset = self.client.scroll(
+            collection_name=collection,
+            scroll_filter=self._filter(filters),
+            limit=limit,
+            offset=offset,
+            with_payload=True,
+            with_vectors=[self.vector_name],
+        )
+        return [
+            VectorPoint(str(point.id), point.vector[self.vector_name], point.payload or {}) for point in points
+        ], offset
+
+    def set_payload(self, collection: str, filters: Dict[str, Any], payload: Dict[str, Any]) -> None:
+        if not self.collection_exists(collection):
+            return
+        self.client.set_payload(collection_name=collection, payload=payload, points=self._filter(filters))
+
+    def delete(self, collection: str, filters: Dict[str, Any]) -> None:
+        if not self.collection_exists(collection):
+            return
+        self.client.delete(collection_name=collection, points_selector=self._filter(filters))
+
+
+class _Collection:
+    """Normalized vectors in one growing array, with ids, payloads and an index of FILTER_FIELDS."""
+
+    def __init__(self, size: int):
+        import numpy as np
+
+        self.vectors = np.zeros((0, size), dtype=np.float32)
+        self.ids: List[str] = []
+        self.payloads: List[Dict[str, Any]] = []
+        self.rows: Dict[str, int] = {}
+        # (field, value) -> rows holding it
+        self.index: Dict[Tuple[str, Any], set] = {}
+
+    def _index_row(self, row: int, add: bool) -> None:
+        payload = self.payloads[row]
+        for field in FILTER_FIELDS:
+            if field in payload:
+                rows = self.index.setdefault((field, payload[field]), set())
+                if add:
+                    rows.add(row)
+                else:
+                    rows.discard(row)
+
+    def upsert(self, points: List[VectorPoint]) -> None:
+        import numpy as np
+
+        vectors = np.asarray([point.vector for point in points], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+        needed = len(self.ids) + len(points)
+        if needed > len(self.vectors):
+            grown = np.zeros((max(needed, 2 * len(self.vectors), 1024), self.vectors.shape[1]), dtype=np.float32)
+            grown[:len(self.ids)] = self.vectors[:len(self.ids)]
+            self.vectors = grown
+        for point, vector in zip(points, vectors):
+            row = self.rows.get(point.id)
+            if row is None:
+                row = len(self.ids)
+                self.rows[point.id] = row
+                self.ids.append(point.id)
+                self.payloads.append(point.payload)
+            else:
+                self._index_row(row, add=False)
+                self.payloads[row] = point.payload
+            self.vectors[row] = vector
+            self._index_row(row, add=True)
+
+    def match(self, filters: Dict[str, Any], ids: Optional[List[str]] = None) -> List[int]:
+        """Rows matching every filter, in insertion order."""
+        candidates = None
+        unindexed = {}
+        for field, value in filters.items():
+            if field in FILTER_FIELDS:
+                rows = self.index.get((field, value), set())
+                candidates = rows if candidates is None else candidates & rows
+            else:
+                unindexed[field] = value
+        if ids is not None:
+            rows = {self.rows[point_id] for point_id in ids if point_id in self.rows}
+            candidates = rows if candidates is None else candidates & rows
+        if candidates is None:
+            candidates = range(len(self.ids))
+        return sorted(
+            row for row in candidates
+            if all(self.payloads[row].get(field) == value for field, value in unindexed.items())
+        )
+
+    def update_payloads(self, rows: List[int], payload: Dict[str, Any]) -> None:
+        for row in rows:
+            self._index_row(row, add=False)
+            self.payloads[row] = {**self.payloads[row], **payload}
+            self._index_row(row, add=True)
+
+    def remove(self, rows: List[int]) -> None:
+        # Move the last point into each freed row, from the end so moved rows stay valid
+        for row in sorted(rows, reverse=True):
+            self._index_row(row, add=False)
+            del self.rows[self.ids[row]]
+            last = len(self.ids) - 1
+            if row != last:
+                self._index_row(last, add=False)
+                self.vectors[row] = self.vectors[last]
+                self.ids[row] = self.ids[last]
+                self.payloads[row] = self.payloads[last]
+                self.rows[self.ids[row]] = row
+                self._index_row(row, add=True)
+            self.ids.pop()
+            self.payloads.pop()
+
+
+class MemoryVectorStore(VectorStore):
+    """
+    Exact search over NumPy arrays in this process. Not persisted or shared between processes.
+
+    Vectors are kept as float32 in RAM; StorageOptions don't apply.
+    """
+
+    def __init__(self):
+        self._collections: Dict[str, _Collection] = {}
+        self._lock = threading.RLock()
+
+    def collection_exists(self, collection: str) -> bool:
+        return collection in self._collections
+
+    def ensure_collection(self, collection: str, size: int, multitenant: bool = False) -> None:
+        with self._lock:
+            if collection not in self._collections:
+                self._collections[collection] = _Collection(size)
+
+    def upsert(self, collection: str, points: List[VectorPoint]) -> None:
+        if points:
+            with self._lock:
+                self._collections[collection].upsert(points)
+
+    def search(self, collection: str, request: SearchRequest) -> List[ScoredPoint]:
+        import numpy as np
+
+        with self._lock:
+            store = self._collections.get(collection)
+            if store is None:
+                return []
+            rows = np.asarray(store.match(request.filters, request.ids), dtype=np.intp)
+            if not len(rows) or request.limit <= 0:
+                return []
+            query = np.asarray(request.vector, dtype=np.float32)
+            query /= np.linalg.norm(query) or 1
+            scores = store.vectors[rows] @ query
+            if len(rows) > request.limit:
+                top = np.argpartition(-scores, request.limit - 1)[:request.limit]
+            else:
+                top = np.arange(len(rows))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [
+                ScoredPoint(store.ids[rows[i]], float(scores[i]), store.payloads[rows[i]]) for i in top
+            ]
+
+    def count(self, collection: str, filters: Dict[str, Any]) -> int:
+        with self._lock:
+            store = self._collections.get(collection)
+            return len(store.match(filters)) if store else 0
+
+    def scroll(
+        self, collection: str, filters: Dict[str, Any], limit: int, offset: Optional[Any] = None
+    ) -> Tuple[List[VectorPoint], Optional[Any]]:
+        with self._lock:
+            store = self._collections.get(collection)
+            if store is None:
+                return [], None
+            # Offsets are positions among the matching points
+            start = offset or 0
+            rows = store.match(filters)
+            page = [
+                VectorPoint(store.ids[row], store.vectors[row].tolist(), store.payloads[row])
+                for row in rows[start:start + limit]
+            ]
+            return page, start + limit if start + limit < len(rows) else None
+
+    def set_payload(self, collection: str, filters: Dict[str, Any], payload: Dict[str, Any]) -> None:
+        with self._lock:
+            store = self._collections.get(collection)
+            if store is not None:
+                store.update_payloads(store.match(filters), payload)
+
+    def delete(self, collection: str, filters: Dict[str, Any]) -> None:
+        with self._lock:
+            store = self._collections.get(collection)
+            if store is not None:
+                store.remove(store.match(filters))
+
+
+def _create_store() -> VectorStore:
+    backend = settings.VECTOR_STORE_BACKEND
+    if backend == "memory":
+        return MemoryVectorStore()
+    if backend not in ("local", "qdrant"):
+        raise ValueError(f"Unknown vector store backend: {backend}")
+
+    from qdrant_client import QdrantClient
+
+    if backend == "local":
+        return QdrantVectorStore([QdrantClient(path=settings.VECTOR_DB_PATH)], indexed=False)
+    if settings.QDRANT_URL == ":memory:":
+        # An in-process Qdrant, e.g. for tests; every pooled client would get its own
+        return QdrantVectorStore([QdrantClient(location=":memory:")], indexed=False)
+    return QdrantVectorStore([
+        QdrantClient(
+            location=settings.QDRANT_URL,
+            api_key=settings.QDRANT_API_KEY,
+            prefer_grpc=settings.QDRANT_PREFER_GRPC,
+            grpc_port=settings.QDRANT_GRPC_PORT,
+            timeout=settings.QDRANT_TIMEOUT,
+            # Without it channels with the same target share one connection
+            grpc_options={"grpc.use_local_subchannel_pool": 1},
+        )
+        for _ in range(max(settings.QDRANT_POOL_SIZE, 1))
+    ], storage=StorageOptions.from_settings())
+
+
+_store: Optional[VectorStore] = None
+_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """The configured vector store, created on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _create_store()
+    return _store
@@ -0,0 +1,66 @@
+"""
+Warm-up of everything the API loads lazily, with its progress for readiness checks.
+
+LiteLLM, tokenizers, the vector store and the embedding model are loaded on
+first use so that importing the app stays fast. Serving processes call run()
+once at startup so the first requests don't pay for the loading; /health/ready
+reports whether it has finished.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+_status: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+
+
+def _warm_llm() -> None:
+    from app.services.model_registry import model_registry, preload_models
+
+    model_registry.warm_up(preload_models())
+
+
+def _warm_vector_store() -> None:
+    from app.services.vector_store import get_vector_store
+
+    # Also checks that a Qdrant server is reachable
+    get_vector_store().collection_exists("documents")
+
+
+def _warm_embedder() -> None:
+    from app.services.rag import embed_query
+
+    # Runs the model once, so its inference session is initialized too
+    embed_query("warm up")
+
+
+STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("llm", _warm_llm),
+    ("vector_store", _warm_vector_store),
+    ("embedder", _warm_embedder),
+]
+
+
+def run() -> Dict[str, Any]:
+    """Load every component, recording how long each took or why it failed. Returns status()."""
+    with _lock:
+        for name, _ in STEPS:
+            _status.setdefault(name, {"status": "pending"})
+    for name, step in STEPS:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            _status[name] = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+        else:
+            _status[name] = {"status": "ready", "seconds": round(time.perf_counter() - start, 3)}
+    return status()
+
+
+def status() -> Dict[str, Any]:
+    """Whether warm-up has completed, and each component's state; not_started before run()."""
+    components = {name: _status.get(name, {"status": "not_started"}) for name, _ in STEPS}
+    return {
+        "ready": all(component["status"] == "ready" for component in components.values()),
+        "components": components,
+    }
@@ -0,0 +1,70 @@
+"""
+Requests/sec for a trivial authenticated endpoint with and without the principal cache.
+
+Registers a user, then calls GET /api/v1/auth/me repeatedly in-process with the
+cache disabled and enabled, counting database queries per request. The
+default scratch SQLite database makes the user lookup unrealistically cheap;
+point DATABASE_URL at a scratch PostgreSQL database to include the round trip.
+
+    python -m benchmarks.bench_auth --requests 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+_scratch = tempfile.mkdtemp(prefix="bench_auth_")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_scratch}/bench.db")
+os.environ.setdefault("VECTOR_DB_PATH", os.path.join(_scratch, "vector_db"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import Base, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+def _run(client: TestClient, headers: dict, requests: int, cache_size: int) -> None:
+    settings.AUTH_CACHE_SIZE = cache_size
+    queries = 0
+
+    def count(*args):
+        nonlocal queries
+        queries += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = client.get("/api/v1/auth/me", headers=headers)
+            response.raise_for_status()
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    label = "cached" if cache_size else "uncached"
+    print(f"{label:<10} {requests / elapsed:>12,.0f} {queries / requests:>15.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    client = TestClient(app)
+    credentials = {"email": "bench@example.com", "password": "benchmark"}
+    client.post("/api/v1/auth/register", json=credentials)
+    token = client.post("/api/v1/auth/login/json", json=credentials).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    cache_size = settings.AUTH_CACHE_SIZE or 10000
+    print(f"{'mode':<10} {'requests/sec':>12} {'queries/request':>15}")
+    _run(client, headers, args.requests, cache_size=0)
+    _run(client, headers, args.requests, cache_size=cache_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Per-turn context build cost as a conversation grows.
+
+Simulates chat turns on a conversation of up to 10k messages and times
+load_history + build_context with persisted token counts (steady state)
+against re-tokenizing every message on every turn (the old behaviour).
+
+    python -m benchmarks.bench_context --model gpt-3.5-turbo
+"""
+import argparse
+import os
+import random
+import string
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.models.models import Message  # noqa: E402
+from app.services import llm  # noqa: E402
+from app.services.context import build_context_with_usage, context_token_budget, load_history  # noqa: E402
+
+
+def _random_text(rng: random.Random, words: int) -> str:
+    return " ".join(
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+        for _ in range(words)
+    )
+
+
+def _turn(history, model, cached: bool) -> float:
+    start = time.perf_counter()
+    if cached:
+        raw, counts = load_history(history, model=model, token_budget=context_token_budget(model))
+    else:
+        raw = [{"role": m.role, "content": m.content} for m in history]
+        counts = [llm.count_tokens([m], model=model) for m in raw]
+    build_context_with_usage(raw, system_prompt="You are helpful.", model=model, token_counts=counts)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument("--sizes", default="100,1000,2500,5000,10000")
+    parser.add_argument("--turns", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    sizes = [int(s) for s in args.sizes.split(",")]
+    history = []
+
+    print(f"{'messages':>10} {'cached ms/turn':>16} {'uncached ms/turn':>18}")
+    for size in sizes:
+        while len(history) < size:
+            role = "user" if len(history) % 2 == 0 else "assistant"
+            history.append(Message(role=role, content=_random_text(rng, rng.randint(10, 120)), token_counts={}))
+        # First pass persists counts for any new messages, as a real turn would
+        load_history(history, model=args.model)
+
+        cached = min(_turn(history, args.model, cached=True) for _ in range(args.turns))
+        uncached = _turn(history, args.model, cached=False)
+        print(f"{size:>10} {cached * 1000:>16.2f} {uncached * 1000:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Sync vs async database stack under concurrent requests.
+
+Serves the same conversation page read twice, from a sync route on the
+threadpool with a Session and from an async route on the event loop with an
+AsyncSession, then hits each with a fixed number of concurrent clients.
+Reports requests/sec, latency percentiles and the server's peak threadpool
+occupancy. The sync route needs a worker per in-flight request, so it
+plateaus at the threadpool size; the async route only holds pool connections.
+The default scratch SQLite database serializes reads behind one file; point
+DATABASE_URL at a scratch PostgreSQL database for realistic numbers.
+
+    python -m benchmarks.bench_db_stacks --requests 5000 --concurrency 10,100,500
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+_scratch = tempfile.mkdtemp(prefix="bench_db_stacks_")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_scratch}/bench.db")
+os.environ.setdefault("VECTOR_DB_PATH", os.path.join(_scratch, "vector_db"))
+
+import anyio.to_thread  # noqa: E402
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app import crud  # noqa: E402
+from app.api.deps import get_db, get_sync_db  # noqa: E402
+from app.core.database import Base, engine  # noqa: E402
+from app.models.models import Conversation, User  # noqa: E402
+
+USER_ID = 1
+
+
+def _app() -> FastAPI:
+    peak = {"borrowed": 0}
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        limiter = anyio.to_thread.current_default_thread_limiter()
+
+        async def sample():
+            while True:
+                peak["borrowed"] = max(peak["borrowed"], limiter.borrowed_tokens)
+                await asyncio.sleep(0.01)
+
+        sampler = asyncio.create_task(sample())
+        yield
+        sampler.cancel()
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.get("/sync")
+    def sync_page(db: Session = Depends(get_sync_db)):
+        return len(crud.conversation.get_page_by_user(db, user_id=USER_ID, limit=20)["items"])
+
+    @app.get("/async")
+    async def async_page(db: AsyncSession = Depends(get_db)):
+        return len((await crud.async_conversation.get_page_by_user(db, user_id=USER_ID, limit=20))["items"])
+
+    @app.post("/threadpool")
+    async def threadpool():
+        """Peak occupancy since the last call, and the pool size."""
+        borrowed, peak["borrowed"] = peak["borrowed"], 0
+        return [borrowed, anyio.to_thread.current_default_thread_limiter().total_tokens]
+
+    return app
+
+
+def _serve(port: int) -> None:
+    uvicorn.run(_app(), host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+def _seed(conversations: int) -> None:
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": USER_ID, "email": "bench@example.com"}])
+        conn.execute(insert(Conversation), [
+            {"user_id": USER_ID, "title": f"conversation {i}"} for i in range(conversations)
+        ])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _load(url: str, requests: int, concurrency: int) -> tuple:
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                start = time.perf_counter()
+                try:
+                    (await client.get(url)).raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", default="10,100,500")
+    parser.add_argument("--conversations", type=int, default=200)
+    args = parser.parse_args()
+
+    _seed(args.conversations)
+    # The server gets its own process so the load generator doesn't share its GIL
+    port = _free_port()
+    server = multiprocessing.Process(target=_serve, args=(port,), daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{port}"
+    while True:
+        try:
+            httpx.post(f"{base_url}/threadpool").raise_for_status()
+            break
+        except httpx.HTTPError:
+            time.sleep(0.1)
+
+    print(f"{'stack':<6} {'clients':>7} {'requests/sec':>12} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6} {'peak threadpool':>15}")
+    try:
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            for stack in ("sync", "async"):
+                latencies, errors, elapsed = asyncio.run(
+                    _load(f"{base_url}/{stack}", args.requests, concurrency)
+                )
+                borrowed, threads = httpx.post(f"{base_url}/threadpool").json()
+                cuts = statistics.quantiles(latencies, n=100)
+                print(
+                    f"{stack:<6} {concurrency:>7} {args.requests / elapsed:>12,.0f} "
+                    f"{cuts[49] * 1000:>8.1f} {cuts[98] * 1000:>8.1f} {errors:>6} "
+                    f"{borrowed:>11}/{threads}"
+                )
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == "__main__":
+    main()
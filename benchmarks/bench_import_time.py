@@ -0,0 +1,78 @@
+"""
+Cold import time of the app's entry points.
+
+Imports each entry point in a fresh interpreter, as a worker, CLI or test run
+would, and reports the wall time, the slowest packages it pulls in (from
+python -X importtime), and whether any of the packages that should only load
+on first use (LiteLLM, qdrant_client, FastEmbed, ONNX Runtime) came along. Exits non-zero if one did, so a stray top-level import is caught.
+
+    python -m benchmarks.bench_import_time --top 5
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+ENTRY_POINTS = ["app.main", "app.services.tasks", "app.services.rag", "app.services.llm"]
+DEFERRED = ["litellm", "qdrant_client", "fastembed", "onnxruntime"]
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+loaded = [name for name in {deferred!r} if name in sys.modules]
+print("RESULT", elapsed, ",".join(loaded))
+"""
+
+
+def _import(module: str, env: dict) -> tuple:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, deferred=DEFERRED)],
+        capture_output=True, text=True, env=env,
+    )
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    _, elapsed, loaded = next(line for line in result.stdout.splitlines() if line.startswith("RESULT")).split(" ")
+    # "import time: self [us] | cumulative [us] | imported package"; keep whole packages
+    packages = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s+(\w+)$", line)
+        if match and match.group(2) != module.split(".")[0]:
+            packages.append((int(match.group(1)), match.group(2)))
+    return float(elapsed), [name for name in loaded.split(",") if name], sorted(packages, reverse=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="bench_import_time_")
+    env = {
+        **os.environ,
+        "SECRET_KEY": os.environ.get("SECRET_KEY", "benchmark"),
+        "DATABASE_URL": os.environ.get("DATABASE_URL", f"sqlite:///{scratch}/import.db"),
+        "VECTOR_DB_PATH": os.path.join(scratch, "vector_db"),
+    }
+
+    failures = 0
+    for module in args.modules:
+        try:
+            elapsed, loaded, packages = _import(module, env)
+        except RuntimeError as e:
+            failures += 1
+            print(f"{module:<24} import failed: {e}")
+            continue
+        failures += bool(loaded)
+        print(f"{module:<24} {elapsed * 1000:>8.0f} ms   deferred loaded: {', '.join(loaded) or 'none'}")
+        for cumulative, name in packages[:args.top]:
+            print(f"    {name:<32} {cumulative / 1000:>8.0f} ms")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Embedding ingestion throughput on a synthetic corpus.
+
+Indexes the same corpus into a throwaway vector store once per document with
+add_document (the old per-file path) and then in bulk with add_documents at
+each batch size, reporting chunks/sec. Pass --parallel to embed on FastEmbed
+worker processes (0 for all cores).
+
+    python -m benchmarks.bench_ingest --docs 200 --words 2000 --batch-sizes 32,256,1024
+"""
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+
+_scratch = tempfile.mkdtemp(prefix="bench_ingest_")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("VECTOR_DB_PATH", os.path.join(_scratch, "vector_db"))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_scratch}/bench.db")
+
+from app.core.database import Base, engine  # noqa: E402
+from app.services import rag  # noqa: E402
+
+
+def _corpus(docs: int, words: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    vocab = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10)))
+        for _ in range(5000)
+    ]
+    return [
+        {"text": " ".join(rng.choices(vocab, k=words)), "file_id": i, "user_id": 1}
+        for i in range(docs)
+    ]
+
+
+def _run(name: str, index) -> None:
+    start = time.perf_counter()
+    chunks = index()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {chunks:>8} {elapsed:>9.2f} {chunks / elapsed:>12,.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--words", type=int, default=2000)
+    parser.add_argument("--batch-sizes", default="32,256,1024")
+    parser.add_argument("--parallel", type=int, default=None)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    corpus = _corpus(args.docs, args.words)
+
+    # Load the model before timing anything
+    rag.add_document(text="warm up", file_id=-1, user_id=0, collection_name="warmup")
+
+    print(f"{'mode':<28} {'chunks':>8} {'seconds':>9} {'chunks/sec':>12}")
+    _run(
+        "per document",
+        lambda: sum(rag.add_document(collection_name="per_document", **doc) for doc in corpus),
+    )
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        _run(
+            f"bulk batch={batch_size} parallel={args.parallel}",
+            lambda: sum(rag.add_documents(
+                corpus,
+                collection_name=f"bulk_{batch_size}",
+                batch_size=batch_size,
+                parallel=args.parallel,
+            )),
+        )
+
+
+if __name__ == "__main__":
+    main()
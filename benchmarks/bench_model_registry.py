@@ -0,0 +1,82 @@
+"""
+First-request cost of model lookups and token counting.
+
+Each scenario runs in a fresh interpreter, as a new worker would. Compares
+the first token count of a process with and without ModelRegistry.warm_up
+against the steady state, and per-call model lookups through
+litellm.get_model_info against the registry.
+
+    python -m benchmarks.bench_model_registry --model gpt-3.5-turbo
+"""
+import argparse
+import multiprocessing
+import os
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+
+def _first_count(model: str, warm: bool, queue) -> None:
+    from app.services import llm
+    from app.services.model_registry import model_registry
+
+    if warm:
+        model_registry.warm_up([model])
+    messages = [{"role": "user", "content": "How do I reset my password? " * 20}]
+    timings = []
+    for _ in range(200):
+        start = time.perf_counter()
+        llm.count_tokens(messages, model=model)
+        timings.append(time.perf_counter() - start)
+    steady = sorted(timings[1:])[len(timings) // 2]
+    queue.put((timings[0], steady))
+
+
+def _lookups(model: str, calls: int, queue) -> None:
+    import litellm
+    from app.services.model_registry import model_registry
+
+    results = []
+    for lookup in (litellm.get_model_info, model_registry.get):
+        start = time.perf_counter()
+        lookup(model)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(calls):
+            lookup(model)
+        results.append((first, (time.perf_counter() - start) / calls))
+    queue.put(results)
+
+
+def _in_fresh_process(target, *args):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=target, args=(*args, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument("--calls", type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{'token count':<28} {'first ms':>10} {'steady ms':>10}")
+    for warm in (False, True):
+        first, steady = _in_fresh_process(_first_count, args.model, warm)
+        name = "after warm_up" if warm else "cold"
+        print(f"{name:<28} {first * 1000:>10.2f} {steady * 1000:>10.3f}")
+
+    print(f"\n{'model lookup':<28} {'first ms':>10} {'us/call':>10}")
+    for name, (first, per_call) in zip(
+        ("litellm.get_model_info", "model_registry.get"),
+        _in_fresh_process(_lookups, args.model, args.calls),
+    ):
+        print(f"{name:<28} {first * 1000:>10.3f} {per_call * 1e6:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
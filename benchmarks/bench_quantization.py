@@ -0,0 +1,242 @@
+"""
+Memory, latency and recall of the documents collection under each storage setting.
+
+Loads --points vectors into a collection per setting:
+
+- float32: original vectors and payloads in RAM (the default)
+- float32-disk: originals and payloads memory-mapped (VECTOR_ON_DISK, VECTOR_PAYLOAD_ON_DISK)
+- scalar / binary: int8 or 1-bit copies searched alone (VECTOR_QUANTIZATION,
+  VECTOR_QUANTIZATION_RESCORE=false)
+- scalar-rescore / binary-rescore: quantized copies in RAM, originals on disk
+  and read to rescore --oversampling candidates per result
+
+and reports, scaled to a million chunks, the RAM the layout needs by
+estimate and as measured by the server, with p50/p95 latency and recall@k
+against exact search. It also reports what chunk text costs per million
+chunks in the payload and in document_chunks, using --corpus files cut into
+--chunk-chars pieces.
+
+The vectors are synthetic clusters and queries are perturbed points, so
+nearest neighbours are well separated, as with real embeddings; pass
+--vectors with an .npy file of real ones for representative recall.
+Quantization and on-disk storage only apply on a Qdrant server:
+
+    QDRANT_URL=http://localhost:6333 python -m benchmarks.bench_quantization --points 1000000
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import time
+import urllib.request
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("VECTOR_STORE_BACKEND", "qdrant")
+
+import numpy as np  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.services.vector_store import (  # noqa: E402
+    QdrantVectorStore,
+    SearchRequest,
+    StorageOptions,
+    VectorPoint,
+    get_vector_store,
+)
+
+PREFIX = "bench_quantization"
+HNSW_M = 16  # Qdrant's default
+
+
+def _settings(oversampling: float) -> dict:
+    return {
+        "float32": StorageOptions(),
+        "float32-disk": StorageOptions(on_disk=True, payload_on_disk=True),
+        "scalar": StorageOptions(quantization="scalar", rescore=False),
+        "scalar-rescore": StorageOptions(
+            quantization="scalar", oversampling=oversampling, on_disk=True, payload_on_disk=True
+        ),
+        "binary": StorageOptions(quantization="binary", rescore=False),
+        "binary-rescore": StorageOptions(
+            quantization="binary", oversampling=oversampling, on_disk=True, payload_on_disk=True
+        ),
+    }
+
+
+def _dataset(points: int, dim: int, clusters: int, path: str) -> np.ndarray:
+    if path:
+        vectors = np.load(path).astype(np.float32)[:points]
+    else:
+        rng = np.random.default_rng(0)
+        centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+        vectors = centers[rng.integers(0, clusters, size=points)]
+        vectors += 0.5 * rng.standard_normal((points, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def _queries(vectors: np.ndarray, queries: int, k: int) -> tuple:
+    rng = np.random.default_rng(1)
+    picked = vectors[rng.integers(0, len(vectors), size=queries)]
+    picked = picked + 0.3 * rng.standard_normal(picked.shape, dtype=np.float32) / math.sqrt(vectors.shape[1])
+    picked /= np.linalg.norm(picked, axis=1, keepdims=True)
+    exact = []
+    for query in picked:
+        scores = vectors @ query
+        exact.append({str(uuid.UUID(int=int(row) + 1)) for row in np.argpartition(-scores, k)[:k]})
+    return picked, exact
+
+
+def _payload(row: int) -> dict:
+    # The fields rag.add_documents writes, without the text
+    return {
+        "file_id": row // 50, "user_id": row % 1000, "blob_id": row // 50, "chunk_index": row % 50,
+        "char_start": (row % 50) * 1000, "char_end": (row % 50 + 1) * 1000, "page": None,
+    }
+
+
+def _chunks(patterns: str, chunk_chars: int) -> list:
+    chunks = []
+    for pattern in patterns.split(","):
+        for path in glob.glob(pattern, recursive=True):
+            with open(path, encoding="utf-8", errors="ignore") as f:
+                text = f.read()
+            chunks.extend(text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def _server_memory() -> float:
+    """Bytes the Qdrant server has allocated, from its /metrics, or NaN."""
+    url = settings.QDRANT_URL.rstrip("/")
+    if not url.startswith("http"):
+        return math.nan
+    request = urllib.request.Request(f"{url}/metrics")
+    if settings.QDRANT_API_KEY:
+        request.add_header("api-key", settings.QDRANT_API_KEY)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            for line in response.read().decode().splitlines():
+                if line.startswith("memory_allocated_bytes "):
+                    return float(line.split()[1])
+    except OSError:
+        pass
+    return math.nan
+
+
+def _estimate(storage: StorageOptions, dim: int, payload_bytes: float) -> float:
+    """Bytes of RAM per point: what the search reads has to stay resident."""
+    ram = HNSW_M * 2 * 4  # level-0 links of the graph
+    if storage.quantization == "scalar":
+        ram += dim
+    elif storage.quantization == "binary":
+        ram += math.ceil(dim / 8)
+    if not storage.on_disk:
+        ram += dim * 4
+    if not storage.payload_on_disk:
+        ram += payload_bytes
+    return ram
+
+
+def _load(store, collection: str, vectors: np.ndarray, workers: int, batch_size: int = 1000) -> float:
+    start = time.perf_counter()
+    store.ensure_collection(collection, vectors.shape[1])
+
+    def upsert(first: int):
+        rows = range(first, min(first + batch_size, len(vectors)))
+        store.upsert(collection, [
+            VectorPoint(str(uuid.UUID(int=row + 1)), vectors[row].tolist(), _payload(row)) for row in rows
+        ])
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(upsert, range(0, len(vectors), batch_size)))
+    from qdrant_client.models import CollectionStatus
+
+    # Wait for the HNSW index and quantized copies to be built
+    while store.client.get_collection(collection).status != CollectionStatus.GREEN:
+        time.sleep(1)
+    return time.perf_counter() - start
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def _measure(store, collection: str, queries: np.ndarray, exact: list, k: int) -> tuple:
+    latencies = []
+    recall = 0.0
+    for query, expected in zip(queries, exact):
+        start = time.perf_counter()
+        found = store.search(collection, SearchRequest(query.tolist(), k, {}))
+        latencies.append(time.perf_counter() - start)
+        recall += len(expected & {point.id for point in found}) / k
+    return _percentile(latencies, 0.5), _percentile(latencies, 0.95), recall / len(queries)
+
+
+def _text_costs(chunks: list) -> None:
+    # Bytes per chunk are MB per million chunks
+    def average(sizes) -> float:
+        return sum(sizes) / len(chunks)
+
+    # Points written with VECTOR_PAYLOAD_TEXT held the text twice, as "document" and "content"
+    with_text = average(len(json.dumps({"document": c, "content": c, **_payload(0)}).encode()) for c in chunks)
+    raw = average(len(chunk.encode()) for chunk in chunks)
+    compressed = average(len(zlib.compress(chunk.encode(), 1)) for chunk in chunks)
+    print(f"chunk text, from {len(chunks):,} chunks; MB per million chunks")
+    print(f"    payload with text      {with_text:>8.0f}")
+    print(f"    payload without text   {len(json.dumps(_payload(0)).encode()):>8.0f}")
+    print(f"    document_chunks text   {raw:>8.0f} raw, about {compressed:.0f} compressed"
+          " (zlib level 1; lz4 gets a little less)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--vectors", default="", help=".npy file of real embeddings to use instead")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--oversampling", type=float, default=3.0)
+    parser.add_argument("--settings", default="float32,float32-disk,scalar,scalar-rescore,binary,binary-rescore")
+    parser.add_argument("--corpus", default="README.md,app/**/*.py")
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    args = parser.parse_args()
+
+    chunks = _chunks(args.corpus, args.chunk_chars)
+    if chunks:
+        _text_costs(chunks)
+    payload_bytes = len(json.dumps(_payload(0)).encode())
+
+    store = get_vector_store()
+    if not (isinstance(store, QdrantVectorStore) and store.indexed):
+        print("Quantization and on-disk storage need a Qdrant server (VECTOR_STORE_BACKEND=qdrant, QDRANT_URL)")
+        return
+    vectors = _dataset(args.points, args.dim, args.clusters, args.vectors)
+    queries, exact = _queries(vectors, args.queries, args.k)
+    scale = 1_000_000 / len(vectors)
+    options = _settings(args.oversampling)
+
+    print(f"{len(vectors):,} vectors of {vectors.shape[1]} dimensions; RAM per million points")
+    print(f"{'setting':<15} {'estimate MB':>12} {'server MB':>10} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{f'recall@{args.k}':>10} {'load s':>7}")
+    for name in args.settings.split(","):
+        collection = f"{PREFIX}_{name.replace('-', '_')}"
+        layout_store = QdrantVectorStore([store.client], indexed=True, storage=options[name])
+        layout_store.client.delete_collection(collection)
+        before = _server_memory()
+        seconds = _load(layout_store, collection, vectors, workers=4)
+        used = (_server_memory() - before) * scale / 1e6
+        p50, p95, recall = _measure(layout_store, collection, queries, exact, args.k)
+        estimate = _estimate(options[name], vectors.shape[1], payload_bytes) * 1_000_000 / 1e6
+        print(f"{name:<15} {estimate:>12.0f} {used:>10.0f} {p50 * 1000:>8.2f} {p95 * 1000:>8.2f} "
+              f"{recall:>10.1%} {seconds:>7.0f}")
+        layout_store.client.delete_collection(collection)
+
+
+if __name__ == "__main__":
+    main()
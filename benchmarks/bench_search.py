@@ -0,0 +1,92 @@
+"""
+Search latency for vector and hybrid retrieval.
+
+Indexes a synthetic corpus in which some chunks mention unique identifiers,
+then runs identifier and free-text queries in each mode, reporting p50/p95
+latency and how often the chunk holding the identifier comes back in the top
+results. The result and embedding caches are bypassed so each query pays for
+a full search. Point DATABASE_URL at a scratch PostgreSQL database to
+measure the full-text index; the default SQLite database uses the substring
+fallback.
+
+    python -m benchmarks.bench_search --docs 2000 --queries 200
+"""
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+
+_scratch = tempfile.mkdtemp(prefix="bench_search_")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("VECTOR_DB_PATH", os.path.join(_scratch, "vector_db"))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_scratch}/bench.db")
+os.environ["RAG_RESULT_CACHE_SIZE"] = "0"
+
+from app.core.database import Base, engine  # noqa: E402
+from app.services import rag  # noqa: E402
+
+COLLECTION = "bench_search"
+
+
+def _corpus(rng: random.Random, docs: int) -> tuple:
+    vocab = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(3000)]
+    documents = []
+    identifiers = {}
+    for i in range(docs):
+        text = " ".join(rng.choices(vocab, k=rng.randint(40, 120))) + "."
+        if i % 10 == 0:
+            code = f"ERR_{rng.randint(10000, 99999)}"
+            identifiers[code] = i
+            text = f"{text} The job failed with {code} while syncing."
+        documents.append({"text": text, "file_id": i, "user_id": 1})
+    return documents, identifiers, vocab
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--n-results", type=int, default=5)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    rng = random.Random(0)
+    documents, identifiers, vocab = _corpus(rng, args.docs)
+    rag.add_documents(documents, collection_name=COLLECTION)
+
+    codes = list(identifiers)
+    queries = [
+        rng.choice(codes) if i % 2 == 0 else " ".join(rng.choices(vocab, k=6))
+        for i in range(args.queries)
+    ]
+
+    print(f"{'mode':<8} {'p50 ms':>8} {'p95 ms':>8} {'identifier recall':>18}")
+    for mode in ("vector", "hybrid"):
+        latencies = []
+        found = 0
+        for query in queries:
+            rag._embedding_cache.clear()
+            start = time.perf_counter()
+            results = rag.query(
+                query, user_id=1, n_results=args.n_results, collection_name=COLLECTION, mode=mode
+            )
+            latencies.append(time.perf_counter() - start)
+            if query in identifiers:
+                found += any(r["metadata"]["file_id"] == identifiers[query] for r in results)
+        identifier_queries = sum(1 for query in queries if query in identifiers)
+        print(
+            f"{mode:<8} {_percentile(latencies, 0.5) * 1000:>8.2f} "
+            f"{_percentile(latencies, 0.95) * 1000:>8.2f} "
+            f"{found / max(identifier_queries, 1):>18.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Query plan regression check for the CRUD layer.
+
+Seeds a scratch database, runs every CRUD query path while recording the SQL
+it issues, then EXPLAINs each statement and fails if any plan scans a whole
+table or sorts rows instead of reading them from an index in order.
+
+The default scratch SQLite database exercises the same indexes as production.
+Point DATABASE_URL at an empty scratch PostgreSQL database to check the real
+planner; sequential scans are disabled there so that the small seed data
+can't hide a missing index behind a cheap scan.
+
+    python -m benchmarks.check_query_plans --users 50
+
+tests/test_query_plans.py runs the same check against SQLite with the test suite.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+_scratch = tempfile.mkdtemp(prefix="check_query_plans_")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_scratch}/plans.db")
+os.environ.setdefault("VECTOR_DB_PATH", os.path.join(_scratch, "vector_db"))
+
+from sqlalchemy import event, insert  # noqa: E402
+
+from app import crud  # noqa: E402
+from app.core.database import Base, SessionLocal, engine  # noqa: E402
+from app.models.models import (  # noqa: E402
+    Blob,
+    Branch,
+    Conversation,
+    ConversationConfig,
+    DocumentChunk,
+    File,
+    FileStatus,
+    Message,
+    MessageFile,
+    User,
+)
+
+# The thread CTE is ordered after it is built; it is bounded by the thread
+# length, not the table size.
+ALLOW_SORT = {"message.get_threads"}
+# Ranking full-text matches needs the rank, which no index can supply.
+ALLOW_SORT_POSTGRES = {"chunk.search"}
+
+
+def seed(users: int, per_user: int) -> None:
+    base = datetime(2026, 1, 1)
+    rows = {table: [] for table in (
+        User, Conversation, ConversationConfig, Branch, Message, Blob, File, MessageFile, DocumentChunk,
+    )}
+    conversation_id = message_id = file_id = 0
+    for u in range(1, users + 1):
+        rows[User].append({
+            "id": u, "email": f"user{u}@example.com", "username": f"user{u}",
+            "oauth_provider": "github", "oauth_id": str(u), "created_at": base,
+        })
+        for c in range(per_user):
+            conversation_id += 1
+            rows[Conversation].append({
+                "id": conversation_id, "user_id": u, "title": f"conversation {c}",
+                "created_at": base, "updated_at": base + timedelta(minutes=c),
+            })
+            rows[ConversationConfig].append({"conversation_id": conversation_id, "model": "gpt-4"})
+            rows[Branch].append({"id": conversation_id, "conversation_id": conversation_id, "name": "main"})
+            parent = None
+            for m in range(per_user):
+                message_id += 1
+                rows[Message].append({
+                    "id": message_id, "conversation_id": conversation_id, "branch_id": conversation_id,
+                    "parent_message_id": parent, "role": "user" if m % 2 == 0 else "assistant",
+                    "content": f"message {m}", "created_at": base + timedelta(seconds=m),
+                })
+                parent = message_id
+        for f in range(per_user):
+            file_id += 1
+            rows[Blob].append({
+                "id": file_id, "content_hash": f"{file_id:064x}", "file_path": f"/blobs/{file_id}",
+                "file_size": 1, "ref_count": 1,
+            })
+            rows[File].append({
+                "id": file_id, "user_id": u, "filename": f"{file_id}.txt", "original_filename": f"{f}.txt",
+                "file_path": f"/files/{file_id}", "file_size": 1, "mime_type": "text/plain",
+                "blob_id": file_id, "created_at": base + timedelta(seconds=f),
+                "status": FileStatus.PENDING if f % 10 == 0 else FileStatus.COMPLETED,
+            })
+            rows[MessageFile].append({"message_id": message_id - f, "file_id": file_id})
+            for i in range(5):
+                rows[DocumentChunk].append({
+                    "id": f"{file_id}-{i}", "collection_name": "documents", "user_id": u,
+                    "file_id": file_id, "blob_id": file_id, "chunk_index": i,
+                    "content": f"chunk {i} of file {file_id} error E{file_id % 97}",
+                })
+
+    with engine.begin() as conn:
+        for model, table_rows in rows.items():
+            conn.execute(insert(model), table_rows)
+        conn.exec_driver_sql("ANALYZE")
+
+
+def _cases(db) -> list:
+    """(name, call) for every read path, plus writes that only touch missing rows."""
+    user_id, conversation_id, message_id = 2, 21, 420
+    first_page = crud.conversation.get_page_by_user(db, user_id=user_id, limit=5)
+    tail = crud.message.get_page_by_conversation(db, conversation_id=conversation_id, limit=5)
+    files_page = crud.file.get_page_by_user(db, user_id=user_id, limit=5)
+    return [
+        ("user.get", lambda: crud.user.get(db, id=user_id)),
+        ("user.get_by_email", lambda: crud.user.get_by_email(db, email="user2@example.com")),
+        ("user.get_by_username", lambda: crud.user.get_by_username(db, username="user2")),
+        ("user.get_by_oauth", lambda: crud.user.get_by_oauth(db, provider="github", oauth_id="2")),
+        ("conversation.get_page_by_user", lambda: crud.conversation.get_page_by_user(db, user_id=user_id, limit=5)),
+        ("conversation.get_page_by_user (next)", lambda: crud.conversation.get_page_by_user(
+            db, user_id=user_id, cursor=first_page["next_cursor"], limit=5)),
+        ("conversation.get_with_messages", lambda: crud.conversation.get_with_messages(db, id=conversation_id)),
+        ("conversation.get_with_branches", lambda: crud.conversation.get_with_branches(db, id=conversation_id)),
+        ("config.get_by_conversation", lambda: crud.config.get_by_conversation(db, conversation_id=conversation_id)),
+        ("message.get_recent", lambda: crud.message.get_recent(db, conversation_id=conversation_id, limit=5)),
+        ("message.get_page_by_conversation (prev)", lambda: crud.message.get_page_by_conversation(
+            db, conversation_id=conversation_id, cursor=tail["prev_cursor"], limit=5)),
+        ("message.get_page_by_branch", lambda: crud.message.get_page_by_branch(db, branch_id=conversation_id, limit=5)),
+        ("message.get_threads", lambda: crud.message.get_threads(db, message_ids=[message_id], max_depth=10)),
+        ("file.get_page_by_user", lambda: crud.file.get_page_by_user(db, user_id=user_id, limit=5)),
+        ("file.get_page_by_user (next)", lambda: crud.file.get_page_by_user(
+            db, user_id=user_id, cursor=files_page["next_cursor"], limit=5)),
+        ("file.get_pending", lambda: crud.file.get_pending(db, limit=10)),
+        ("file.get_other_user_blob_file", lambda: crud.file.get_other_user_blob_file(
+            db, user_id=user_id, blob_id=25, exclude_id=-1)),
+        ("file.get_indexed_by_blob", lambda: crud.file.get_indexed_by_blob(db, blob_id=25, exclude_user_id=1)),
+        ("file.get_indexed_by_blob (own)", lambda: crud.file.get_indexed_by_blob(db, blob_id=25, user_id=user_id)),
+        ("blob.get_by_hash", lambda: crud.blob.get_by_hash(db, content_hash=f"{25:064x}")),
+        ("blob.release", lambda: crud.blob.release(db, blob_id=-1)),
+        ("chunk.search", lambda: crud.chunk.search(db, user_id=user_id, query="error E25", limit=10)),
+        ("chunk.remove_where (file)", lambda: crud.chunk.remove_where(
+            db, collection_name="documents", file_id=-1, user_id=user_id)),
+        ("chunk.remove_where (blob)", lambda: crud.chunk.remove_where(
+            db, collection_name="documents", user_id=user_id, blob_id=-1)),
+    ]
+
+
+def _record(call) -> list:
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and re.match(r"\s*(SELECT|UPDATE|DELETE|WITH)\b", statement, re.I):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return statements
+
+
+def _partial_indexes() -> set:
+    return {
+        index.name
+        for table in Base.metadata.tables.values()
+        for index in table.indexes
+        if index.dialect_options["sqlite"].get("where") is not None
+    }
+
+
+def _problems_sqlite(conn, statement, parameters, tables) -> list:
+    partial = _partial_indexes()
+    problems = []
+    for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters):
+        detail = row[-1]
+        # Walking a partial index whole only reads the rows it was built for
+        scan = re.match(r"SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?", detail)
+        if scan and scan.group(1) in tables and scan.group(2) not in partial:
+            problems.append(("scan", detail))
+        elif "AUTOMATIC" in detail:
+            problems.append(("scan", detail))
+        elif detail.startswith("USE TEMP B-TREE"):
+            problems.append(("sort", detail))
+    return problems
+
+
+def _problems_postgres(conn, statement, parameters, tables) -> list:
+    (plan,) = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    problems = []
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get("Plans", []))
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in tables:
+            problems.append(("scan", f"Seq Scan on {node['Relation Name']}"))
+        elif node["Node Type"] in ("Sort", "Incremental Sort"):
+            problems.append(("sort", f"{node['Node Type']} by {', '.join(node.get('Sort Key', []))}"))
+    return problems
+
+
+def find_problems(db, verbose: bool = False) -> dict:
+    """
+    Plan problems of every query path by name, as (kind, detail) pairs.
+
+    Needs the seed data. Paths that can't be checked on this database are
+    left out.
+    """
+    dialect = engine.dialect.name
+    tables = set(Base.metadata.tables)
+    explain = _problems_postgres if dialect == "postgresql" else _problems_sqlite
+    allow_sort = ALLOW_SORT | (ALLOW_SORT_POSTGRES if dialect == "postgresql" else set())
+
+    results = {}
+    for name, call in _cases(db):
+        if name == "chunk.search" and dialect != "postgresql":
+            # The substring fallback has no index
+            continue
+        problems = []
+        statements = _record(call)
+        with engine.connect() as conn:
+            if dialect == "postgresql":
+                conn.exec_driver_sql("SET enable_seqscan = off")
+            for statement, parameters in statements:
+                problems += [
+                    (kind, detail)
+                    for kind, detail in explain(conn, statement, parameters, tables)
+                    if not (kind == "sort" and name in allow_sort)
+                ]
+                if verbose:
+                    print(statement, parameters, sep="\n", end="\n\n")
+        results[name] = problems
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--per-user", type=int, default=20)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    seed(args.users, args.per_user)
+
+    db = SessionLocal()
+    try:
+        results = find_problems(db, verbose=args.verbose)
+    finally:
+        db.close()
+
+    for name, problems in results.items():
+        print(f"{'FAIL' if problems else 'ok':<5} {name}")
+        for kind, detail in problems:
+            print(f"        {kind}: {detail}")
+    failures = sum(bool(problems) for problems in results.values())
+    print(f"\n{failures} failing query path(s) on {engine.dialect.name}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Concurrent streaming load test against a local fake LLM server.
+
+Starts an OpenAI-compatible server that streams tokens with a fixed delay,
+ending with a usage chunk when asked for one as OpenAI does, then opens many concurrent streams through achat_completion_stream. Reports
+throughput and threadpool occupancy. Streams run on the event loop, so the
+mean occupancy stays near zero; LiteLLM only borrows a worker briefly when a
+stream finishes to assemble its usage, which shows up in the peak.
+
+    python -m benchmarks.load_chat_streams --streams 2000 --tokens 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+import anyio.to_thread  # noqa: E402
+import uvicorn  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import StreamingResponse  # noqa: E402
+
+from app.services.llm import achat_completion_stream  # noqa: E402
+
+
+def _fake_llm_app(tokens: int, delay: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+
+        async def stream():
+            for i in range(tokens):
+                chunk = {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": f"tok{i} "}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(delay)
+            if body.get("stream_options", {}).get("include_usage"):
+                usage = {"prompt_tokens": 1, "completion_tokens": tokens, "total_tokens": tokens + 1}
+                yield f"data: {json.dumps({**chunk, 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _run(streams: int, api_base: str) -> None:
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    samples = []
+    done = asyncio.Event()
+
+    async def sample():
+        while not done.is_set():
+            samples.append(limiter.borrowed_tokens)
+            await asyncio.sleep(0.01)
+
+    async def one_stream():
+        chunks = 0
+        async for _ in achat_completion_stream(
+            messages=[{"role": "user", "content": "hello"}],
+            model="openai/fake-model",
+            api_base=api_base,
+            api_key="fake",
+        ):
+            chunks += 1
+        return chunks
+
+    sampler = asyncio.create_task(sample())
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one_stream() for _ in range(streams)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    done.set()
+    await sampler
+
+    errors = [r for r in results if isinstance(r, Exception)]
+    chunks = sum(r for r in results if not isinstance(r, Exception))
+    print(f"streams:            {streams}")
+    print(f"errors:             {len(errors)}")
+    print(f"elapsed:            {elapsed:.2f}s")
+    print(f"chunks/sec:         {chunks / elapsed:,.0f}")
+    print(f"mean threadpool:    {sum(samples) / max(len(samples), 1):.2f}/{limiter.total_tokens}")
+    print(f"peak threadpool:    {max(samples, default=0)}/{limiter.total_tokens}")
+    if errors:
+        print(f"first error:        {errors[0]!r}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streams", type=int, default=2000)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    port = _free_port()
+    config = uvicorn.Config(
+        _fake_llm_app(args.tokens, args.delay),
+        host="127.0.0.1",
+        port=port,
+        log_level="warning",
+        backlog=args.streams,
+    )
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    try:
+        asyncio.run(_run(args.streams, f"http://127.0.0.1:{port}/v1"))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
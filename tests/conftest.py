@@ -0,0 +1,69 @@
+import os
+import tempfile
+import zlib
+
+_scratch = tempfile.mkdtemp(prefix="conduit-tests-")
+os.environ.update({
+    "SECRET_KEY": "test",
+    "DATABASE_URL": f"sqlite:///{_scratch}/test.db",
+    "UPLOAD_DIR": os.path.join(_scratch, "uploads"),
+    "VECTOR_STORE_BACKEND": "memory",
+    # The token chunker downloads the embedding model's tokenizer
+    "CHUNKER": "words",
+    "WARM_UP_ON_STARTUP": "false",
+    "CELERY_TASK_ALWAYS_EAGER": "true",
+    "CELERY_BROKER_URL": "memory://",
+    "CELERY_RESULT_BACKEND": "cache+memory://",
+    "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+})
+
+import numpy as np  # noqa: E402
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.core.database import Base, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import rag, vector_store  # noqa: E402
+
+
+class HashEmbedder:
+    """Deterministic stand-in for the FastEmbed model, so tests don't download it."""
+
+    dim = 32
+
+    def _vector(self, text: str) -> np.ndarray:
+        return np.random.default_rng(zlib.crc32(text.encode())).standard_normal(self.dim)
+
+    def passage_embed(self, texts, **kwargs):
+        return (self._vector(text) for text in texts)
+
+    def query_embed(self, text, **kwargs):
+        yield self._vector(text)
+
+
+@pytest.fixture(autouse=True)
+def database():
+    Base.metadata.create_all(engine)
+    yield
+    Base.metadata.drop_all(engine)
+
+
+@pytest.fixture(autouse=True)
+def embedder(monkeypatch):
+    monkeypatch.setattr(rag, "_embedder", HashEmbedder())
+    # A fresh in-memory vector store and result cache per test
+    monkeypatch.setattr(vector_store, "_store", None)
+    rag._invalidate_results()
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def auth_headers(client):
+    credentials = {"email": "user@example.com", "password": "password"}
+    client.post("/api/v1/auth/register", json=credentials)
+    token = client.post("/api/v1/auth/login/json", json=credentials).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,65 @@
+import os
+
+from app.core.database import SessionLocal
+from app.crud import blob as crud_blob
+from app.crud import file as crud_file
+
+CONTENT = b"The quarterly report covers revenue, churn and hiring plans. " * 20
+
+
+def _upload(client, auth_headers, name: str) -> int:
+    response = client.post(
+        "/api/v1/files/", files={"upload": (name, CONTENT, "text/plain")}, headers=auth_headers
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def _search(client, auth_headers):
+    response = client.post(
+        "/api/v1/search/rag", json={"query": "quarterly report revenue", "n_results": 5}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def _blob_path(file_id: int) -> str:
+    with SessionLocal() as db:
+        return crud_file.get(db, id=file_id).blob.file_path
+
+
+def test_identical_uploads_share_one_blob(client, auth_headers):
+    first = _upload(client, auth_headers, "a.txt")
+    second = _upload(client, auth_headers, "b.txt")
+
+    assert _blob_path(first) == _blob_path(second)
+    assert {result["metadata"]["file_id"] for result in _search(client, auth_headers)} == {first}
+
+
+def test_deleting_first_copy_hands_chunks_to_the_other(client, auth_headers):
+    first = _upload(client, auth_headers, "a.txt")
+    second = _upload(client, auth_headers, "b.txt")
+    path = _blob_path(first)
+
+    assert client.delete(f"/api/v1/files/{first}", headers=auth_headers).status_code == 204
+
+    results = _search(client, auth_headers)
+    assert results
+    assert {result["metadata"]["file_id"] for result in results} == {second}
+    assert os.path.exists(path)
+
+
+def test_deleting_last_copy_removes_chunks_and_bytes(client, auth_headers):
+    first = _upload(client, auth_headers, "a.txt")
+    second = _upload(client, auth_headers, "b.txt")
+    path = _blob_path(first)
+    with SessionLocal() as db:
+        blob_id = crud_file.get(db, id=first).blob_id
+
+    client.delete(f"/api/v1/files/{second}", headers=auth_headers)
+    client.delete(f"/api/v1/files/{first}", headers=auth_headers)
+
+    assert _search(client, auth_headers) == []
+    assert not os.path.exists(path)
+    with SessionLocal() as db:
+        assert crud_blob.get(db, id=blob_id) is None
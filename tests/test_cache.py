@@ -0,0 +1,23 @@
+from app.core.cache import Generations
+
+
+def test_generations_are_bounded():
+    generations = Generations(maxsize=2)
+    for user_id in range(100):
+        generations.bump(user_id)
+
+    assert len(generations) == 2
+
+
+def test_evicted_key_does_not_revive_stale_entries():
+    generations = Generations(maxsize=1)
+    cached_under = {user_id: generations.get(user_id) for user_id in (1, 2)}
+
+    generations.bump(1)
+    assert generations.get(1) != cached_under[1]
+    assert generations.get(2) == cached_under[2]
+
+    # Evicting user 1 must not hand back the generation its old entries carry
+    generations.bump(2)
+    assert generations.get(1) != cached_under[1]
+    assert generations.get(2) != cached_under[2]
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from app.api.v1 import chat
+from app.main import app
+
+
+def _conversation(client, auth_headers) -> int:
+    response = client.post("/api/v1/conversations/", json={"title": "Chat"}, headers=auth_headers)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def _messages(client, auth_headers, conversation_id: int):
+    response = client.get(f"/api/v1/conversations/{conversation_id}/messages", headers=auth_headers)
+    return response.json()["items"]
+
+
+def test_chat_saves_message_and_reply(client, auth_headers, monkeypatch):
+    async def completion(**kwargs):
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="Hi there"))],
+            usage=SimpleNamespace(prompt_tokens=12, completion_tokens=3),
+        )
+
+    monkeypatch.setattr(chat, "achat_completion", completion)
+    conversation_id = _conversation(client, auth_headers)
+
+    response = client.post(
+        "/api/v1/chat/", json={"conversation_id": conversation_id, "content": "Hello"}, headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    user_msg, reply = _messages(client, auth_headers, conversation_id)
+    assert (user_msg["role"], user_msg["content"], user_msg["prompt_tokens"]) == ("user", "Hello", 12)
+    assert (reply["role"], reply["content"], reply["completion_tokens"]) == ("assistant", "Hi there", 3)
+
+
+def test_chat_keeps_message_when_model_fails(client, auth_headers, monkeypatch):
+    async def completion(**kwargs):
+        raise RuntimeError("provider unavailable")
+
+    monkeypatch.setattr(chat, "achat_completion", completion)
+    conversation_id = _conversation(client, auth_headers)
+
+    response = TestClient(app, raise_server_exceptions=False).post(
+        "/api/v1/chat/", json={"conversation_id": conversation_id, "content": "Hello"}, headers=auth_headers
+    )
+
+    assert response.status_code == 500
+    assert [(m["role"], m["content"]) for m in _messages(client, auth_headers, conversation_id)] == [
+        ("user", "Hello")
+    ]
+
+
+def test_failed_stream_is_logged(monkeypatch, caplog):
+    async def completion_stream(**kwargs):
+        raise RuntimeError("provider unavailable")
+        yield
+
+    async def generate():
+        await chat.stream_buffer.create("stream-1", 1)
+        await chat._generate("stream-1", chat.ChatRequest(conversation_id=1, content="Hello"), None, [], 0)
+        return [event async for event in chat.stream_buffer.read("stream-1")]
+
+    monkeypatch.setattr(chat, "achat_completion_stream", completion_stream)
+    with caplog.at_level(logging.ERROR, logger=chat.__name__):
+        events = asyncio.run(generate())
+
+    assert [(event.event, event.data) for event in events] == [("error", "Generation failed")]
+    assert "stream stream-1 failed" in caplog.text
+    assert "provider unavailable" in caplog.text
@@ -0,0 +1,167 @@
+import pytest
+from fastapi.testclient import TestClient
+from kombu.exceptions import OperationalError
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.crud import file as crud_file
+from app.main import app
+from app.models.models import DocumentChunk, FileStatus
+from app.schemas.file import FileUpdate
+from app.services import rag, tasks
+from app.services.chunking import chunk_text
+from app.services.vector_store import get_vector_store
+
+LONG_TEXT = b" ".join(b"word%d" % i for i in range(5000))
+
+
+def _upload(client, auth_headers, content: bytes = b"hello world " * 100):
+    response = client.post(
+        "/api/v1/files/", files={"upload": ("notes.txt", content, "text/plain")}, headers=auth_headers
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def _set_status(file_id: int, status: FileStatus, task_id=None) -> None:
+    with SessionLocal() as db:
+        file = crud_file.get(db, id=file_id)
+        crud_file.update(db, db_obj=file, obj_in=FileUpdate(status=status, extra_metadata={"task_id": task_id}))
+
+
+def test_upload_is_processed_by_eager_worker(client, auth_headers):
+    file_id = _upload(client, auth_headers)
+
+    status = client.get(f"/api/v1/files/{file_id}/status", headers=auth_headers).json()
+    assert status["status"] == "completed"
+    assert status["task_state"] == "SUCCESS"
+    assert status["chunks_indexed"] >= 1
+
+
+def test_process_requeues_completed_file(client, auth_headers):
+    file_id = _upload(client, auth_headers)
+
+    response = client.post(f"/api/v1/files/{file_id}/process", headers=auth_headers)
+    assert response.status_code == 202
+    assert response.json()["status"] == "completed"
+
+
+def test_process_rejects_queued_file(client, auth_headers):
+    file_id = _upload(client, auth_headers)
+    _set_status(file_id, FileStatus.PENDING, task_id="queued-task")
+
+    response = client.post(f"/api/v1/files/{file_id}/process", headers=auth_headers)
+    assert response.status_code == 409
+
+
+def test_process_rejects_file_being_processed(client, auth_headers):
+    file_id = _upload(client, auth_headers)
+    _set_status(file_id, FileStatus.PROCESSING, task_id="running-task")
+
+    response = client.post(f"/api/v1/files/{file_id}/process", headers=auth_headers)
+    assert response.status_code == 409
+
+
+def test_process_queues_pending_file_never_sent(client, auth_headers):
+    file_id = _upload(client, auth_headers)
+    _set_status(file_id, FileStatus.PENDING)
+
+    response = client.post(f"/api/v1/files/{file_id}/process", headers=auth_headers)
+    assert response.status_code == 202
+    assert response.json()["status"] == "completed"
+
+
+def _broker_down(monkeypatch, task):
+    """Make sending task fail until the returned function is called."""
+    send = task.apply_async
+    down = [True]
+
+    def apply_async(*args, **kwargs):
+        if down:
+            raise OperationalError("broker unreachable")
+        return send(*args, **kwargs)
+
+    monkeypatch.setattr(task, "apply_async", apply_async)
+    return down.clear
+
+
+def test_file_is_requeueable_after_broker_send_fails(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "AUTO_PROCESS_UPLOADS", False)
+    file_id = _upload(client, auth_headers)
+    recover = _broker_down(monkeypatch, tasks.process_file_task)
+
+    response = TestClient(app, raise_server_exceptions=False).post(
+        f"/api/v1/files/{file_id}/process", headers=auth_headers
+    )
+    assert response.status_code == 500
+    with SessionLocal() as db:
+        file = crud_file.get(db, id=file_id)
+        assert file.status == FileStatus.PENDING
+        assert "task_id" not in (file.extra_metadata or {})
+
+    recover()
+    response = client.post(f"/api/v1/files/{file_id}/process", headers=auth_headers)
+    assert response.status_code == 202
+    assert response.json()["status"] == "completed"
+
+
+def test_sweep_requeues_batch_after_broker_send_fails(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "AUTO_PROCESS_UPLOADS", False)
+    file_id = _upload(client, auth_headers)
+    recover = _broker_down(monkeypatch, tasks.process_files_task)
+
+    with pytest.raises(OperationalError):
+        tasks.enqueue_pending_files_task()
+
+    recover()
+    assert tasks.enqueue_pending_files_task() == 1
+    assert client.get(f"/api/v1/files/{file_id}/status", headers=auth_headers).json()["status"] == "completed"
+
+
+def _fail_after_first_batch(monkeypatch):
+    """Make indexing fail once one batch of vectors is written; returns a function that undoes it."""
+    upsert = rag._upsert
+    calls = []
+
+    def flaky(batches):
+        calls.append(batches)
+        if len(calls) > 1:
+            raise RuntimeError("vector store unavailable")
+        upsert(batches)
+
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_SIZE", 2)
+    monkeypatch.setattr(rag, "_upsert", flaky)
+    return lambda: monkeypatch.setattr(rag, "_upsert", upsert)
+
+
+def _indexed(user_id: int = 1):
+    with SessionLocal() as db:
+        rows = db.query(DocumentChunk).filter(DocumentChunk.user_id == user_id).count()
+    return rows, get_vector_store().count("documents", {"user_id": user_id})
+
+
+def test_retry_after_partial_indexing_does_not_duplicate_chunks(client, auth_headers, monkeypatch):
+    recover = _fail_after_first_batch(monkeypatch)
+    file_id = _upload(client, auth_headers, LONG_TEXT)
+    assert client.get(f"/api/v1/files/{file_id}/status", headers=auth_headers).json()["status"] == "failed"
+    recover()
+
+    client.post(f"/api/v1/files/{file_id}/process", headers=auth_headers)
+
+    status = client.get(f"/api/v1/files/{file_id}/status", headers=auth_headers).json()
+    assert status["status"] == "completed"
+    assert _indexed() == (status["chunks_indexed"], status["chunks_indexed"])
+
+
+def test_partially_indexed_copy_is_not_reused(client, auth_headers, monkeypatch):
+    recover = _fail_after_first_batch(monkeypatch)
+    failed = _upload(client, auth_headers, LONG_TEXT)
+    assert client.get(f"/api/v1/files/{failed}/status", headers=auth_headers).json()["status"] == "failed"
+    recover()
+
+    file_id = _upload(client, auth_headers, LONG_TEXT)
+
+    status = client.get(f"/api/v1/files/{file_id}/status", headers=auth_headers).json()
+    assert status["status"] == "completed"
+    assert status["chunks_indexed"] == len(chunk_text(LONG_TEXT.decode()))
+    assert _indexed() == (status["chunks_indexed"], status["chunks_indexed"])
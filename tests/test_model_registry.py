@@ -0,0 +1,30 @@
+from app.services.llm import get_model_info
+from app.services.model_registry import ModelRegistry
+
+
+def test_model_info_keeps_max_tokens():
+    info = get_model_info("gpt-4o")
+
+    assert info["max_tokens"] == info["max_output_tokens"]
+    assert info["max_input_tokens"] > info["max_output_tokens"]
+
+
+def test_override_without_output_limit_reports_input_limit_as_max_tokens():
+    registry = ModelRegistry()
+    registry.load({"local/model": {"max_input_tokens": 8192}})
+
+    info = registry.get("local/model")
+    assert (info.known, info.max_input_tokens, info.max_output_tokens) == (True, 8192, None)
+    assert registry.tokenizer("local/model") is None
+
+
+def test_unknown_model_names_are_not_kept_in_the_registry(monkeypatch):
+    monkeypatch.setattr("app.services.model_registry.UNKNOWN_MODELS_CACHED", 2)
+    registry = ModelRegistry()
+    registry.load({})
+
+    infos = [registry.get(f"no-such-model-{i}") for i in range(5)]
+
+    assert not any(info.known for info in infos)
+    assert not any(f"no-such-model-{i}" in registry._models for i in range(5))
+    assert len(registry._unknown) == 2
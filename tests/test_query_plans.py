@@ -0,0 +1,12 @@
+from app.core.database import SessionLocal
+from benchmarks.check_query_plans import find_problems, seed
+
+
+def test_crud_queries_neither_scan_nor_sort():
+    seed(users=50, per_user=20)
+
+    with SessionLocal() as db:
+        results = find_problems(db)
+
+    assert "file.get_pending" in results
+    assert {name: problems for name, problems in results.items() if problems} == {}
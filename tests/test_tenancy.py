@@ -0,0 +1,83 @@
+import logging
+
+from app.core.config import settings
+from app.services import tenancy
+from app.services.vector_store import VectorPoint, get_vector_store
+
+
+def _index_points(user_id: int, count: int) -> None:
+    store = get_vector_store()
+    store.ensure_collection("documents", 2, multitenant=True)
+    store.upsert("documents", [
+        VectorPoint(f"00000000-0000-0000-0000-{user_id:06d}{i:06d}", [1.0, float(i)], {"user_id": user_id})
+        for i in range(count)
+    ])
+
+
+def _count_lookups(monkeypatch) -> list:
+    lookups = []
+    tenant = tenancy._tenant
+
+    def counted(collection_name, user_id):
+        lookups.append(user_id)
+        return tenant(collection_name, user_id)
+
+    monkeypatch.setattr(tenancy, "_tenant", counted)
+    return lookups
+
+
+def test_writes_for_promoted_user_are_routed_from_cache(monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_TENANCY", "promote")
+    monkeypatch.setattr(settings, "VECTOR_TENANT_PROMOTION_THRESHOLD", 3)
+    monkeypatch.setattr(tenancy, "_routes", tenancy.LRUCache(maxsize=100, ttl=60))
+    _index_points(user_id=7, count=3)
+    assert tenancy.maybe_promote("documents", [7]) == [7]
+    lookups = _count_lookups(monkeypatch)
+
+    for _ in range(3):
+        assert tenancy.write_collections("documents", 7) == ["documents_user_7"]
+        assert tenancy.maybe_promote("documents", [7]) == []
+
+    assert lookups == []
+
+
+def test_shared_tenancy_never_looks_up_tenants(monkeypatch):
+    lookups = _count_lookups(monkeypatch)
+
+    assert tenancy.write_collections("documents", 7) == ["documents"]
+    assert tenancy.search_collection("documents", 7) == "documents"
+    assert tenancy.delete_collections("documents", 7) == ["documents"]
+    assert tenancy.delete_collections("documents") == ["documents"]
+
+    assert lookups == []
+
+
+def test_unpromoted_user_writes_are_looked_up_every_time(monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_TENANCY", "promote")
+    monkeypatch.setattr(tenancy, "_routes", tenancy.LRUCache(maxsize=100, ttl=60))
+    lookups = _count_lookups(monkeypatch)
+
+    tenancy.write_collections("documents", 7)
+    tenancy.write_collections("documents", 7)
+
+    assert lookups == [7, 7]
+
+
+def test_failed_promotion_is_logged(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "VECTOR_TENANCY", "promote")
+    monkeypatch.setattr(settings, "VECTOR_TENANT_PROMOTION_THRESHOLD", 3)
+    _index_points(user_id=8, count=3)
+
+    def copy_points(*args, **kwargs):
+        raise RuntimeError("copy failed")
+
+    monkeypatch.setattr(tenancy, "_copy_points", copy_points)
+    failed = tenancy.vector_tenant_promotions_total.labels("failed")
+    before = failed._shards.total()[0]
+
+    with caplog.at_level(logging.ERROR, logger=tenancy.__name__):
+        assert tenancy.maybe_promote("documents", [8]) == []
+
+    assert "copy failed" in caplog.text
+    assert failed._shards.total()[0] == before + 1
+    assert tenancy._tenant("documents", 8) is None
@@ -0,0 +1,106 @@
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.api.v1.files import _save_upload
+from app.core.config import settings
+
+BOUNDARY = "conduit-test-boundary"
+
+
+def _multipart(content: bytes, filename: str = "notes.txt", content_type: str = "text/plain") -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="upload"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def _streamed_request(body: bytes, piece: int = 1024, content_length: bool = False):
+    """A request whose body arrives in pieces, counting how many were received."""
+    pieces = [body[i:i + piece] for i in range(0, len(body), piece)]
+    received = []
+
+    async def receive():
+        received.append(pieces[len(received)])
+        return {"type": "http.request", "body": received[-1], "more_body": len(received) < len(pieces)}
+
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    return Request({"type": "http", "method": "POST", "headers": headers}, receive), received, pieces
+
+
+def test_upload_streams_file_to_disk(client, auth_headers):
+    content = b"line of text\n" * 5000
+    response = client.post(
+        "/api/v1/files/", files={"upload": ("notes.txt", content, "text/plain")}, headers=auth_headers
+    )
+
+    assert response.status_code == 201
+    assert response.json()["file_size"] == len(content)
+
+
+def test_upload_stops_reading_at_size_limit(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 10_000)
+    request, received, pieces = _streamed_request(_multipart(b"x" * 100_000))
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_save_upload(request, user_id=1))
+
+    assert error.value.status_code == 400
+    assert len(received) < len(pieces) // 2
+    assert not any(name.endswith(".part") for name in os.listdir(os.path.join(settings.UPLOAD_DIR, "1")))
+
+
+def test_upload_rejected_by_content_length_before_reading(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 10_000)
+    request, received, _ = _streamed_request(_multipart(b"x" * 200_000), content_length=True)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_save_upload(request, user_id=1))
+
+    assert error.value.status_code == 400
+    assert received == []
+
+
+def test_upload_rejects_mime_type_before_reading_file():
+    request, received, pieces = _streamed_request(_multipart(b"x" * 100_000, content_type="application/x-evil"))
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_save_upload(request, user_id=1))
+
+    assert error.value.status_code == 400
+    assert len(received) == 1
+
+
+def test_upload_requires_file_field(client, auth_headers):
+    response = client.post("/api/v1/files/", files={"other": ("a.txt", b"hi", "text/plain")}, headers=auth_headers)
+    assert response.status_code == 400
+
+    response = client.post("/api/v1/files/", json={"upload": "hi"}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_resumable_upload(client, auth_headers):
+    content = b"resumable content " * 100
+    session = client.post(
+        "/api/v1/files/uploads",
+        json={"filename": "notes.txt", "mime_type": "text/plain", "size": len(content)},
+        headers=auth_headers,
+    ).json()
+    upload_url = f"/api/v1/files/uploads/{session['upload_id']}"
+
+    assert client.put(f"{upload_url}?offset=0", content=content[:1000], headers=auth_headers).json()["offset"] == 1000
+    assert client.put(f"{upload_url}?offset=0", content=content[1000:], headers=auth_headers).status_code == 409
+    too_long = client.put(f"{upload_url}?offset=1000", content=content[1000:] + b"extra", headers=auth_headers)
+    assert too_long.status_code == 400
+    assert client.get(upload_url, headers=auth_headers).json()["offset"] == 1000
+
+    client.put(f"{upload_url}?offset=1000", content=content[1000:], headers=auth_headers)
+    response = client.post(f"{upload_url}/complete", headers=auth_headers)
+    assert response.status_code == 201
+    assert response.json()["file_size"] == len(content)